@@ -1,18 +1,99 @@
 from django.contrib import admin
-from .models import Building, Classroom, Panorama, ClassroomPhoto, BuildingResource
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from .models import Building, Classroom, Panorama, ClassroomPhoto, BuildingResource, SearchEntry, Job
+from . import features, search
 from django import forms
+from django.forms.models import BaseInlineFormSet
+
+
+class FullTextSearchMixin:
+    """Admin search through the full-text index instead of icontains scans."""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search.object_ids(self.search_kind, search_term, queryset.db)), False
+
+
+# Postgres: COUNT(*) over a large table is a sequential scan.  Never ask for
+# the unfiltered total next to a filtered one, and estimate it from planner
+# statistics when the changelist is not filtered at all.
+LARGE_TABLE_ROWS = 10_000
+SHOW_FULL_COUNT = connection.vendor != "postgresql"
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if connection.vendor == "postgresql" and not qs.query.where:
+            with connection.cursor() as cur:
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                            [qs.model._meta.db_table])
+                row = cur.fetchone()
+            if row and row[0] > LARGE_TABLE_ROWS:
+                return row[0]
+        return super().count
+
+
+class BuildingListFilter(admin.SimpleListFilter):
+    """
+    Filter rooms by building without listing every building in the sidebar;
+    only the selected one is shown.  The "Classrooms" column on the Building
+    changelist links here with ?building=<pk>.
+    """
+    title = "building"
+    parameter_name = "building"
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not (value and value.isdigit()):
+            return []
+        return list(Building.objects.filter(pk=value).values_list("pk", "name"))
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(building_id=value)
+        return queryset
+
+
+# Inlines: media files are shown as links, never as images, and only the
+# first INLINE_ROWS rows of each kind get a form; a room with hundreds of
+# photos links to the photo changelist (filtered to the room) for the rest.
+INLINE_ROWS = 10
+
+
+class FirstRowsFormSet(BaseInlineFormSet):
+    def get_queryset(self):
+        if not hasattr(self, "_first_rows"):
+            self._first_rows = super().get_queryset()[:INLINE_ROWS]
+        return self._first_rows
+
 
 class PanoramaInline(admin.TabularInline):
     model = Panorama
+    formset = FirstRowsFormSet
     extra = 0
-    fields = ("image_file", "preview_file", "yaw", "pitch", "hfov")
-
+    fields = ("image_file", "preview_file", "yaw", "pitch", "hfov", "order")
+    show_change_link = True
+    classes = ("collapse",)
 
 
 class ClassroomPhotoInline(admin.TabularInline):
     model = ClassroomPhoto
+    formset = FirstRowsFormSet
     extra = 0
-    fields = ("image_file",)
+    fields = ("image_file", "caption", "order")
+    show_change_link = True
+    classes = ("collapse",)
 
 
 class ClassroomAdminForm(forms.ModelForm):
@@ -25,30 +106,61 @@ class ClassroomAdminForm(forms.ModelForm):
 
 
 @admin.register(Classroom)
-class ClassroomAdmin(admin.ModelAdmin):
+class ClassroomAdmin(FullTextSearchMixin, admin.ModelAdmin):
     form = ClassroomAdminForm
+    search_kind = SearchEntry.Kind.ROOM
 
     list_display = ("building", "room_number", "capacity", "is_published", "updated_at")
-    list_filter = ("building", "is_published",
-                   "voice_amplification", "class_capture", "assistive_listening_device") #"instructor_pc_equipped",
+    list_filter = (BuildingListFilter, "building__campus", "is_published", *features.ADMIN_FILTERS)
+    list_select_related = ("building",)
     search_fields = ("room_number", "summary", "building__name")
-    fields = (
-        "building","room_type", "room_number", "external_id", "is_published", "stage", "multilevel_podium",
-        "privacy_panel","windows","door_windows","lock",
-        "capacity", "summary","seating_type",
-        "preview_image_file",
-        "voice_amplification",
-        "podium_microhpone", "handheld_microphone","ceiling_microphone", "lavalier_microphone",
-        "web_conference_camera","ceiling_camera","document_camera",
-        
-        "wireless_presentation","instructor_monitor", "interactive_display", 'lecd',#"instructor_pc_equipped"
-        "class_capture","pc_type","touchscreen_presentation",
-        "env_light","assistive_listening_device","hdesk",
-        "chalk_board","whiteboards_count","projectors","projector_model","display_model",
-        "book_url"
+    autocomplete_fields = ("building",)
+    show_full_result_count = SHOW_FULL_COUNT
+    paginator = EstimatedCountPaginator
+    fieldsets = (
+        (None, {"fields": (
+            "building", "room_type", "room_number", "external_id", "is_published",
+            "capacity", "summary", "seating_type", "lock", "preview_image_file",
+        )}),
+        *((group, {"fields": tuple(f.name for f in features.FEATURES if f.group == group)})
+          for group in features.GROUP_NAMES),
+        ("Equipment models & booking", {"fields": ("projector_model", "display_model", "book_url")}),
+        ("Media", {"fields": ("all_media",)}),
     )
+    readonly_fields = ("all_media",)
     inlines = [PanoramaInline, ClassroomPhotoInline]
 
+    @admin.display(description="All media")
+    def all_media(self, obj):
+        if obj.pk is None:
+            return "-"
+        counts = Classroom.objects.filter(pk=obj.pk).aggregate(
+            photos=Count("photos", distinct=True), panoramas=Count("panoramas", distinct=True))
+        links = [
+            format_html('<a href="{}?classroom__id__exact={}">{} {}</a>',
+                        reverse(f"admin:classrooms_{model._meta.model_name}_changelist"), obj.pk,
+                        counts[related], model._meta.verbose_name_plural)
+            for model, related in ((ClassroomPhoto, "photos"), (Panorama, "panoramas"))
+        ]
+        return format_html("{} (the forms below show the first {} of each)",
+                           format_html_join(", ", "{}", ((link,) for link in links)), INLINE_ROWS)
+
+
+@admin.register(Panorama)
+class PanoramaAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "classroom", "order", "external_id")
+    list_select_related = ("classroom__building",)
+    autocomplete_fields = ("classroom",)
+    fields = ("classroom", "external_id", "name", "image_file", "preview_file", "yaw", "pitch", "hfov", "order")
+
+
+@admin.register(ClassroomPhoto)
+class ClassroomPhotoAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "caption", "order")
+    list_select_related = ("classroom__building",)
+    autocomplete_fields = ("classroom",)
+    fields = ("classroom", "image_file", "caption", "order")
+
 
 class BuildingResourceInline(admin.TabularInline):
     model = BuildingResource
@@ -57,10 +169,50 @@ class BuildingResourceInline(admin.TabularInline):
     show_change_link = True
 
 @admin.register(Building)
-class BuildingAdmin(admin.ModelAdmin):
-    list_display = ("name", "campus", "classrooms_count","tech_contact_name","tech_contact","tech_contact_email","more_info_url")
+class BuildingAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = SearchEntry.Kind.BUILDING
+    list_display = ("name", "campus", "published_rooms","tech_contact_name","tech_contact","tech_contact_email","more_info_url")
     list_filter = ("campus",)
     search_fields = ("name",)
     prepopulated_fields = {"slug": ("name",)}
     inlines = [BuildingResourceInline]  # ← add this
+    show_full_result_count = SHOW_FULL_COUNT
+
+    def get_queryset(self, request):
+        # instead of Building.classrooms_count per row: a correlated count,
+        # evaluated only for the rows on the page (a JOIN + GROUP BY would
+        # aggregate every room in the catalog before LIMIT applies)
+        rooms = (Classroom.objects.filter(building=OuterRef("pk"), is_published=True)
+                 .order_by().values("building").annotate(n=Count("pk")).values("n"))
+        return super().get_queryset(request).annotate(
+            published_room_count=Subquery(rooms, output_field=IntegerField())
+        )
+
+    @admin.display(description="Classrooms", ordering="published_room_count")
+    def published_rooms(self, obj):
+        url = reverse("admin:classrooms_classroom_changelist")
+        return format_html('<a href="{}?building={}">{}</a>', url, obj.pk, obj.published_room_count or 0)
+
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "status", "attempts", "run_after", "created_at", "error")
+    list_filter = ("status", "task")
+    search_fields = ("key",)
+    readonly_fields = [f.name for f in Job._meta.fields]
+    actions = ("retry",)
+
+    def has_add_permission(self, request):
+        return False  # jobs come from jobs.enqueue()
+
+    @admin.display(description="Last error")
+    def error(self, obj):
+        # the traceback's last line names the exception
+        return obj.last_error.strip().splitlines()[-1] if obj.last_error.strip() else ""
 
+    @admin.action(description="Retry selected jobs now")
+    def retry(self, request, queryset):
+        n = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.PENDING, attempts=0, run_after=timezone.now(), finished_at=None)
+        self.message_user(request, f"{n} job(s) queued again.")
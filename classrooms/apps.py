@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ClassroomsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'classrooms'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects cache invalidation receivers)
+        from . import metrics  # noqa: F401  (counts SQL on each connection as it opens)
+        from . import checks  # noqa: F401  (registers the system checks)
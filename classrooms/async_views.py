@@ -0,0 +1,76 @@
+# classrooms/async_views.py
+"""
+``async def`` versions of the public catalog pages, for ASGI deployments.
+
+Same URLs, templates, page cache and ETags as ``views.py`` (they share its
+querysets and context builders); the rows are fetched with the async ORM
+and the cache calls awaited, so under an ASGI server a request waiting on
+the database, the cache or a slow client holds a coroutine rather than a
+whole worker.  Everything a template touches is loaded before ``render()``:
+lazy relation access would raise SynchronousOnlyOperation here.  Like the
+sync views they are ``@read_only`` (Django cannot wrap async views in
+ATOMIC_REQUESTS anyway).
+
+``core/urls.py`` routes the public pages here when ``settings.ASYNC_VIEWS``
+is on (the default under ``core.asgi``).  The API, search and export views
+stay synchronous; Django runs those in a thread.
+"""
+from django.core.paginator import Paginator
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+
+from . import views
+from .cache import building_scope, catalog_scope, conditional_page, room_scope, versioned_cache_page
+from .filters import RoomFilters
+from .models import Building, Classroom
+from .replicas import read_only
+
+
+async def _index_stamps():
+    return views._index_row(await Building.objects.aaggregate(**views._index_aggregates()))
+
+
+async def _list_stamps(slug):
+    return views._list_row(await Building.objects.filter(slug=slug).aaggregate(**views._list_aggregates()))
+
+
+async def _detail_stamps(slug, room_number):
+    return await views._detail_stamps_query(slug, room_number).afirst()
+
+
+@read_only
+@conditional_page(_index_stamps)
+@versioned_cache_page(lambda: [catalog_scope()])
+async def buildings_index(request):
+    buildings = [b async for b in views._buildings()]
+    return render(request, "classrooms/buildings.html", {"buildings": buildings})
+
+
+@read_only
+@conditional_page(_list_stamps)
+@versioned_cache_page(lambda slug: [building_scope(slug)], variant=views._list_variant)
+async def classroom_list_by_building(request, slug):
+    building = await aget_object_or_404(Building, slug=slug)
+    filters = RoomFilters.from_query(request.GET)
+    rooms = views._rooms(building, filters)
+    # Paginator only needs the count to number the pages; the rows are fetched below
+    page = Paginator(range(await rooms.acount()), views.ROOMS_PER_PAGE).get_page(views._list_page(request))
+    offset = (page.number - 1) * views.ROOMS_PER_PAGE
+    page.object_list = [r async for r in rooms[offset:offset + views.ROOMS_PER_PAGE]]
+    resources = [r async for r in building.resources.filter(published=True)]
+    return views._render_list(request, building, filters, page, resources)
+
+
+@read_only
+@conditional_page(_detail_stamps)
+@versioned_cache_page(lambda slug, room_number: [room_scope(slug, room_number)])
+async def classroom_detail(request, slug, room_number):
+    room = await aget_object_or_404(views._detail_room(), building__slug=slug, room_number=room_number,
+                                    is_published=True)
+    return render(request, "classrooms/detail.html", views._detail_context(room))
+
+
+@read_only
+async def classroom_detail_pk(request, pk):
+    room = await aget_object_or_404(Classroom.objects.select_related("building"), pk=pk, is_published=True)
+    return redirect(reverse("classroom_detail", args=[room.building.slug, room.room_number]), permanent=True)
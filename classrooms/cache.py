@@ -0,0 +1,285 @@
+# classrooms/cache.py
+"""
+Version-stamped page cache for the public catalog views.
+
+Every cached page is keyed on one or more "scopes" (the whole catalog, a
+building, a single room).  Each scope has a version stamp stored in the
+default cache; signals in ``classrooms/signals.py`` replace the stamp when a
+row in that scope changes, so pages can be cached with no TTL and are still
+correct right after an admin edit.
+
+Stamps are random tokens rather than counters: if the cache evicts a stamp
+(LocMem culls, Redis maxmemory) a fresh token is minted and the old pages
+simply become unreachable instead of being served again.
+
+Both decorators also wrap ``async def`` views (``async_views.py``): the
+stamps, cache reads and validator query are then awaited.
+"""
+import hashlib
+import uuid
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import metrics
+
+VERSION_PREFIX = "cphc:ver:"
+PAGE_PREFIX = "cphc:page:"
+
+
+# --- scopes ----------------------------------------------------------------
+def catalog_scope():
+    return "catalog"
+
+
+def building_scope(slug):
+    return f"building:{slug}"
+
+
+def room_scope(slug, room_number):
+    return f"room:{slug}:{room_number}"
+
+
+def memory_scope():
+    """Bumped with every other scope: the in-process catalog (classrooms/memory.py) is all of them."""
+    return "memory"
+
+
+def all_scopes(using="default"):
+    """Every scope in the catalog, for bulk jobs that bypass the signals."""
+    from .models import Building, Classroom
+
+    rooms = Classroom.objects.using(using).values_list("building__slug", "room_number")
+    return [catalog_scope(),
+            *(building_scope(s) for s in Building.objects.using(using).values_list("slug", flat=True)),
+            *(room_scope(s, n) for s, n in rooms.iterator())]
+
+
+def touch(buildings=(), rooms=(), using="default"):
+    """
+    Move ``updated_at`` on the given buildings and rooms (pks), for bulk jobs
+    that rewrite what their pages show with ``.update()``: the ETags,
+    Last-Modified and the snapshot's change stamps are all read from those
+    columns.  Returns the scopes of the pages showing them, for ``bump()``.
+    """
+    from django.utils import timezone
+
+    from .models import Building, Classroom
+
+    now = timezone.now()
+    buildings = Building.objects.using(using).filter(pk__in=buildings)
+    rooms = Classroom.objects.using(using).filter(pk__in=rooms)
+    buildings.update(updated_at=now)
+    rooms.update(updated_at=now)
+    # a building's image is on the index and its room list, a room's on its list and page
+    slugs = list(buildings.values_list("slug", flat=True))
+    scopes = {catalog_scope(), *(building_scope(s) for s in slugs)} if slugs else set()
+    for slug, number in rooms.values_list("building__slug", "room_number").iterator():
+        scopes.update((building_scope(slug), room_scope(slug, number)))
+    return scopes
+
+
+def is_shared():
+    """
+    Whether the default cache is one every process reads (Redis, Memcached).
+    LocMem is per process: a stamp bumped or a page warmed by ``run_worker``
+    would only ever be seen by the worker itself.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+# --- version stamps ----------------------------------------------------------
+def _new_stamp():
+    return uuid.uuid4().hex[:16]
+
+
+def get_versions(*scopes):
+    """Return the current stamp for each scope, minting missing ones."""
+    keys = [VERSION_PREFIX + s for s in scopes]
+    found = cache.get_many(keys)
+    stamps = []
+    for key in keys:
+        stamp = found.get(key)
+        if stamp is None:
+            # add() keeps whichever stamp won a concurrent race; ours if the
+            # winner was culled again in between
+            stamp = _new_stamp()
+            if not cache.add(key, stamp, None):
+                stamp = cache.get(key) or stamp
+        stamps.append(stamp)
+    return tuple(stamps)
+
+
+async def aget_versions(*scopes):
+    keys = [VERSION_PREFIX + s for s in scopes]
+    found = await cache.aget_many(keys)
+    stamps = []
+    for key in keys:
+        stamp = found.get(key)
+        if stamp is None:
+            stamp = _new_stamp()
+            if not await cache.aadd(key, stamp, None):
+                stamp = await cache.aget(key) or stamp
+        stamps.append(stamp)
+    return tuple(stamps)
+
+
+def bump(*scopes):
+    """Invalidate every page cached under any of ``scopes``, and the in-memory catalog."""
+    if scopes:
+        cache.set_many({VERSION_PREFIX + s: _new_stamp() for s in {*scopes, memory_scope()}}, None)
+
+
+# --- view decorator ----------------------------------------------------------
+def _page_key(request, view_name, variant, stamps):
+    # Under conditional_page the key also carries the ETag of the rows the
+    # page is rendered from: a page built from a lagging read replica right
+    # after a bump is not reused once the replica catches up.
+    validator = getattr(request, "_catalog_validator", None)
+    raw = "|".join((view_name, variant, *stamps, validator[0] if validator else ""))
+    return PAGE_PREFIX + hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def versioned_cache_page(scopes, variant=None):
+    """
+    Cache a view's 200 responses forever under the stamps of ``scopes``.
+
+    ``scopes`` is called with the view's URL kwargs and returns the scope
+    names the page depends on.  ``variant(request)`` distinguishes responses
+    of one URL pattern (default: the path; the query string is ignored, so
+    arbitrary parameters cannot fill the cache).  Views that read the query
+    string pass a variant built from the parameters they accept.  Sets
+    ``X-Page-Cache: hit|miss`` so the hit rate is visible from the outside.
+    """
+    variant = variant or (lambda request: request.path)
+
+    def hit(cached):
+        metrics.record_cache(cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Page-Cache"] = "hit"
+            return response
+
+    def storable(response):
+        # never store errors, redirects, streams, anything setting cookies or marked no-store
+        return (response.status_code == 200 and not response.streaming and not response.cookies
+                and "no-store" not in response.get("Cache-Control", ""))
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def awrapped(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD") or not settings.CLASSROOMS_PAGE_CACHE:
+                    return await view(request, *args, **kwargs)
+
+                stamps = await aget_versions(*scopes(*args, **kwargs))
+                key = _page_key(request, view.__name__, variant(request), stamps)
+                response = hit(await cache.aget(key))
+                if response is not None:
+                    return response
+
+                response = await view(request, *args, **kwargs)
+                if storable(response):
+                    await cache.aset(key, (response.content, response["Content-Type"]), None)
+                response["X-Page-Cache"] = "miss"
+                return response
+            return awrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or not settings.CLASSROOMS_PAGE_CACHE:
+                return view(request, *args, **kwargs)
+
+            stamps = get_versions(*scopes(*args, **kwargs))
+            key = _page_key(request, view.__name__, variant(request), stamps)
+            response = hit(cache.get(key))
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if storable(response):
+                cache.set(key, (response.content, response["Content-Type"]), None)
+            response["X-Page-Cache"] = "miss"
+            return response
+        return wrapped
+    return decorator
+
+
+# --- conditional GET ---------------------------------------------------------
+def _validators(stamps):
+    """(etag, last_modified) for a tuple of change stamps, or None."""
+    if stamps is None or stamps[0] is None:
+        return None
+    etag = hashlib.md5(repr(stamps).encode()).hexdigest()
+    return etag, max(s for s in stamps if isinstance(s, datetime))
+
+
+# Each page gets one aggregate query; condition() calls the etag and
+# last-modified functions separately, so the result is memoized on the request.
+def _validator(compute):
+    def memoized(request, *args, **kwargs):
+        if not hasattr(request, "_catalog_validator"):
+            request._catalog_validator = _validators(compute(*args, **kwargs))
+        return request._catalog_validator
+    return memoized
+
+
+def _acondition(compute, view):
+    """condition() for async views: it would call ``compute`` synchronously."""
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        request._catalog_validator = _validators(await compute(*args, **kwargs))
+        etag, last_modified = request._catalog_validator or (None, None)
+        etag = etag and quote_etag(etag)
+        last_modified = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ("GET", "HEAD"):
+            if last_modified and not response.has_header("Last-Modified"):
+                response.headers["Last-Modified"] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault("ETag", etag)
+        return response
+    return inner
+
+
+def conditional_page(compute):
+    """
+    ETag / Last-Modified support for a catalog view.
+
+    ``compute`` takes the view's URL kwargs and returns a tuple of change
+    stamps (timestamps and row counts) from a single query, or ``None`` when
+    the page would 404; for an async view it is a coroutine function too.
+    Matching requests get a 304 before the page cache or template is touched.
+    """
+    validator = _validator(compute)
+
+    def etag(request, *args, **kwargs):
+        v = validator(request, *args, **kwargs)
+        return v and v[0]
+
+    def last_modified(request, *args, **kwargs):
+        v = validator(request, *args, **kwargs)
+        return v and v[1]
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            view = _acondition(compute, view)
+        else:
+            view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+        # let browsers and TUportal iframes keep a copy but always revalidate
+        return cache_control(no_cache=True)(view)
+    return decorator
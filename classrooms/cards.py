@@ -0,0 +1,100 @@
+# classrooms/cards.py
+"""
+The image on a room's tile in the building list.
+
+A tile shows the room's own preview, else its first photo, else its first
+panorama (preview, then the equirectangular).  Deciding that in the
+template meant prefetching every photo and panorama of every room on the
+page, so the choice is made at write time instead and denormalized onto
+``Classroom.card_image``, with copies of the source's renditions and
+placeholder entries filed under ``"card_image"`` in the room's own
+manifests: everything ``{% picture r "card_image" %}`` needs is on the room
+row.
+
+Signals refresh a room's card when its preview, photos or panoramas change,
+and queued jobs do when they finish those images' renditions;
+``manage.py build_cards`` rebuilds every room.
+"""
+from django.db.models import Prefetch, Q
+
+from .models import Classroom, ClassroomPhoto, Panorama
+
+FIELD = "card_image"
+BATCH_SIZE = 500
+
+_ROOM_FIELDS = ("pk", FIELD, "preview_image_file", "renditions", "placeholders")
+
+
+def _photos():
+    return (ClassroomPhoto.objects.exclude(image_file="").exclude(image_file__isnull=True)
+            .only("classroom_id", "image_file", "renditions", "placeholders"))
+
+
+def _panoramas():
+    has_image = (~Q(preview_file="") & Q(preview_file__isnull=False)) | (~Q(image_file="") & Q(image_file__isnull=False))
+    return (Panorama.objects.filter(has_image)
+            .only("classroom_id", "image_file", "preview_file", "renditions", "placeholders"))
+
+
+def resolve(room, photos=(), panoramas=()):
+    """(file name, renditions entry, placeholder entry) of the card; photos/panoramas in display order."""
+    candidates = [(room, "preview_image_file")]
+    candidates += [(photo, "image_file") for photo in photos]
+    candidates += [(pano, name) for pano in panoramas for name in ("preview_file", "image_file")]
+    for obj, name in candidates:
+        fieldfile = getattr(obj, name)
+        if fieldfile:
+            return fieldfile.name, (obj.renditions or {}).get(name), (obj.placeholders or {}).get(name)
+    return "", None, None
+
+
+def _apply(room, card):
+    """Put ``card`` on ``room`` in memory; returns True if anything changed."""
+    name, rendition, placeholder = card
+    current = (room.card_image.name or "", (room.renditions or {}).get(FIELD), (room.placeholders or {}).get(FIELD))
+    if current == card:
+        return False
+    room.card_image = name or None
+    for attr, entry in (("renditions", rendition), ("placeholders", placeholder)):
+        manifest = {k: v for k, v in (getattr(room, attr) or {}).items() if k != FIELD}
+        if entry:
+            manifest[FIELD] = entry
+        setattr(room, attr, manifest)
+    return True
+
+
+def refresh(room):
+    """Recompute ``room``'s card and store it with a plain UPDATE; returns True if it changed."""
+    if room.preview_image_file:
+        card = resolve(room)  # nothing else can win: no queries
+    else:
+        card = resolve(room, _photos().filter(classroom_id=room.pk)[:1],
+                        _panoramas().filter(classroom_id=room.pk)[:1])
+    if not _apply(room, card):
+        return False
+    Classroom.objects.filter(pk=room.pk).update(
+        card_image=room.card_image, renditions=room.renditions, placeholders=room.placeholders)
+    return True
+
+
+def refresh_room(classroom_id):
+    room = Classroom.objects.filter(pk=classroom_id).only(*_ROOM_FIELDS).first()
+    return room is not None and refresh(room)
+
+
+def rebuild(rooms=None, batch_size=BATCH_SIZE):
+    """Recompute the cards of ``rooms`` (a Classroom queryset, default all); returns the pks that changed."""
+    rooms = (Classroom.objects.all() if rooms is None else rooms).only(*_ROOM_FIELDS).order_by("pk")
+    rooms = rooms.prefetch_related(Prefetch("photos", _photos()), Prefetch("panoramas", _panoramas()))
+    changed, batch = [], []
+    for room in rooms.iterator(chunk_size=batch_size):
+        if _apply(room, resolve(room, room.photos.all(), room.panoramas.all())):
+            batch.append(room)
+        if len(batch) >= batch_size:
+            Classroom.objects.bulk_update(batch, [FIELD, "renditions", "placeholders"])
+            changed += [r.pk for r in batch]
+            batch = []
+    if batch:
+        Classroom.objects.bulk_update(batch, [FIELD, "renditions", "placeholders"])
+        changed += [r.pk for r in batch]
+    return changed
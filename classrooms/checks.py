@@ -0,0 +1,24 @@
+# classrooms/checks.py
+"""System checks for settings that only work together (``manage.py check``)."""
+from django.conf import settings
+from django.core import checks
+
+from . import cache as page_cache
+
+
+@checks.register(checks.Tags.caches)
+def catalog_in_memory_cache(app_configs, **kwargs):
+    """
+    Each worker rebuilds its in-memory catalog when the ``memory`` scope's
+    stamp moves.  With a per-process cache the bumps made by another web
+    worker or by ``run_worker`` never reach it, and it keeps serving (and
+    confirming the ETags of) its old catalog until restarted.
+    """
+    if not settings.CATALOG_IN_MEMORY or page_cache.is_shared():
+        return []
+    msg = "CATALOG_IN_MEMORY needs a cache shared by every process; the default cache is per process."
+    hint = "Set DJANGO_USE_REDIS=true."
+    if settings.DEBUG:
+        # runserver is a single process, which sees its own bumps
+        return [checks.Warning(msg, hint=hint, id="classrooms.W001")]
+    return [checks.Error(msg, hint=hint, id="classrooms.E001")]
@@ -0,0 +1,186 @@
+# classrooms/exports.py
+"""
+Streaming export of the published catalog (JSON, JSON Lines, CSV).
+
+Every kind is read with ``values().iterator(chunk_size=...)`` and written
+row by row, so memory stays constant however large the catalog is; the
+output is produced as a generator of text chunks that a management
+command writes to a file and ``StreamingHttpResponse`` sends as-is.
+``gzip_chunks()`` compresses the same stream on the fly.
+
+Only public data is exported: published rooms (and their photos and
+panoramas), published resources, and the room fields the detail page
+shows.  Classroom records use the ``import_classrooms`` format
+(``building_slug`` + field names), so an export can be re-imported.
+"""
+import csv
+import io
+import json
+import zlib
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from . import features
+from .models import Building, BuildingResource, Classroom, ClassroomPhoto, Panorama
+
+CHUNK_SIZE = 2000
+FORMATS = ("json", "jsonl", "csv")
+CONTENT_TYPES = {
+    "json": "application/json",
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+_ROOM_FIELDS = (
+    "external_id", "room_number", "room_type", "capacity", "summary",
+    "seating_type", "wireless_presentation", "pc_type",
+    *(f.name for f in features.FEATURES
+      if f.public and f.name not in ("wireless_presentation", "pc_type")),
+    "book_url",
+)
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else ""
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _buildings():
+    qs = Building.objects.order_by("pk").values(
+        "slug", "name", "campus", "description", "tech_contact_name", "tech_contact",
+        "tech_contact_email", "more_info_url", "preview_file", "updated_at",
+    )
+    for b in qs.iterator(chunk_size=CHUNK_SIZE):
+        b["url"] = reverse("classroom_list_by_building", args=[b["slug"]])
+        b["preview_url"] = _media_url(b.pop("preview_file"))
+        b["updated_at"] = _iso(b["updated_at"])
+        yield b
+
+
+def _classrooms():
+    qs = (Classroom.objects.filter(is_published=True).order_by("pk")
+          .values("building__slug", *_ROOM_FIELDS, "preview_image_file", "updated_at"))
+    for r in qs.iterator(chunk_size=CHUNK_SIZE):
+        slug = r.pop("building__slug")
+        row = {"external_id": r.pop("external_id"), "building_slug": slug}
+        for name in ("seating_type", "wireless_presentation", "pc_type"):
+            r[name] = list(r[name] or [])
+        row.update(r)
+        row["url"] = reverse("classroom_detail", args=[slug, r["room_number"]])
+        row["preview_url"] = _media_url(row.pop("preview_image_file"))
+        row["updated_at"] = _iso(row["updated_at"])
+        yield row
+
+
+def _photos():
+    qs = (ClassroomPhoto.objects.filter(classroom__is_published=True).order_by("pk")
+          .values("classroom__external_id", "image_file", "caption", "order"))
+    for p in qs.iterator(chunk_size=CHUNK_SIZE):
+        yield {"classroom": p["classroom__external_id"], "url": _media_url(p["image_file"]),
+               "caption": p["caption"], "order": p["order"]}
+
+
+def _panoramas():
+    qs = (Panorama.objects.filter(classroom__is_published=True).order_by("pk")
+          .values("external_id", "classroom__external_id", "name", "image_file", "preview_file",
+                  "yaw", "pitch", "hfov", "order"))
+    for p in qs.iterator(chunk_size=CHUNK_SIZE):
+        p["classroom"] = p.pop("classroom__external_id")
+        p["url"] = _media_url(p.pop("image_file"))
+        p["preview_url"] = _media_url(p.pop("preview_file"))
+        yield p
+
+
+def _resources():
+    qs = (BuildingResource.objects.filter(published=True).order_by("building_id", "order", "pk")
+          .values("building__slug", "kind", "title", "url", "thumbnail_url", "summary", "order"))
+    for r in qs.iterator(chunk_size=CHUNK_SIZE):
+        r["building_slug"] = r.pop("building__slug")
+        yield r
+
+
+KINDS = {
+    "buildings": _buildings,
+    "classrooms": _classrooms,
+    "photos": _photos,
+    "panoramas": _panoramas,
+    "resources": _resources,
+}
+
+
+# --- encoders -------------------------------------------------------------------
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _json(kinds):
+    yield "{"
+    for i, kind in enumerate(kinds):
+        yield ("," if i else "") + f"\n{_dumps(kind)}:["
+        for n, row in enumerate(KINDS[kind]()):
+            yield ("," if n else "") + "\n" + _dumps(row)
+        yield "\n]"
+    yield "\n}\n"
+
+
+def _jsonl(kinds):
+    for kind in kinds:
+        for row in KINDS[kind]():
+            yield _dumps({"type": kind[:-1], **row}) + "\n"
+
+
+def _csv(kinds):
+    buf = io.StringIO()
+    writer = None
+    for row in KINDS[kinds[0]]():
+        if writer is None:
+            writer = csv.DictWriter(buf, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow({k: ",".join(v) if isinstance(v, list) else v for k, v in row.items()})
+        if buf.tell() > 1 << 16:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def export_chunks(fmt="jsonl", kinds=None):
+    """Text chunks of the export; ``kinds`` defaults to everything (classrooms for CSV)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    kinds = list(kinds or (["classrooms"] if fmt == "csv" else KINDS))
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ValueError(f"unknown kinds: {', '.join(sorted(unknown))}")
+    encoder = {"json": _json, "jsonl": _jsonl, "csv": _csv}[fmt]
+    if fmt == "csv" and len(kinds) != 1:
+        raise ValueError("CSV exports one kind at a time")
+    return encoder(kinds)
+
+
+def encode_chunks(chunks, min_size=1 << 16):
+    """UTF-8 encode text chunks, coalescing them into writes of at least ``min_size``."""
+    pending, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= min_size:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks on the fly."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip header + trailer
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
@@ -0,0 +1,130 @@
+# classrooms/features.py
+"""
+Single registry of room features, compiled once at import time.
+
+Everything that used to re-derive feature metadata per request (detail
+page groups and highlights, admin fieldsets and filters, list-page pills,
+the ``attr_extras`` template tags) reads from here instead of calling
+``Classroom._meta.get_field()`` on every render.
+"""
+from typing import NamedTuple, Optional
+
+from .models import FEATURE_FLAGS, Classroom
+
+
+class Feature(NamedTuple):
+    name: str
+    group: str
+    verbose_name: str
+    internal_type: str
+    # label for the chips above the feature table; callable(room) -> label|None
+    highlight: Optional[object] = None
+    # offered as a pill on the building room list (label) / as an admin filter
+    pill: Optional[str] = None
+    admin_filter: bool = False
+    # shown in the detail page feature table
+    public: bool = True
+
+    @property
+    def filterable(self):
+        return self.name in FEATURE_FLAGS
+
+    def display(self, room):
+        value = getattr(room, self.name)
+        if self.name == "wireless_presentation":
+            return room.get_wireless_presentation_display() or "None"
+        if self.internal_type == "BooleanField":
+            return "Yes" if value else "No"
+        return value
+
+    def highlight_for(self, room):
+        if self.highlight is None:
+            return None
+        if callable(self.highlight):
+            return self.highlight(room)
+        return self.highlight if getattr(room, self.name) else None
+
+
+def _wireless_highlight(room):
+    if room.wireless_presentation:
+        return "Wireless: " + room.get_wireless_presentation_display()
+    return None
+
+
+ACCESSIBILITY = "Accessibility & Environment"
+AUDIO = "Audio"
+VIDEO = "Video"
+PRESENTATION = "Presentation"
+BOARDS = "Boards"
+
+# (name, group, extra) in display order; verbose names and types come from the model
+_SPEC = [
+    ("assistive_listening_device", ACCESSIBILITY, dict(admin_filter=True)),
+    ("env_light", ACCESSIBILITY, {}),
+    ("hdesk", ACCESSIBILITY, {}),
+    ("stage", ACCESSIBILITY, {}),
+    ("privacy_panel", ACCESSIBILITY, {}),
+    ("windows", ACCESSIBILITY, {}),
+    ("door_windows", ACCESSIBILITY, {}),
+    ("multilevel_podium", ACCESSIBILITY, dict(public=False)),
+
+    ("voice_amplification", AUDIO, dict(admin_filter=True)),
+    ("podium_microhpone", AUDIO, {}),
+    ("handheld_microphone", AUDIO, {}),
+    ("ceiling_microphone", AUDIO, {}),
+    ("lavalier_microphone", AUDIO, {}),
+
+    ("web_conference_camera", VIDEO, dict(highlight="Web conferencing", pill="Zoom Camera")),
+    ("ceiling_camera", VIDEO, {}),
+    ("document_camera", VIDEO, {}),
+    ("projectors", VIDEO, {}),
+    ("lecd", VIDEO, {}),
+
+    ("wireless_presentation", PRESENTATION, dict(highlight=_wireless_highlight)),
+    ("interactive_display", PRESENTATION, dict(highlight="Interactive display", pill="Interactive display")),
+    ("instructor_monitor", PRESENTATION, {}),
+    ("class_capture", PRESENTATION, dict(highlight="Panopto capture", admin_filter=True)),
+    ("pc_type", PRESENTATION, {}),
+    ("touchscreen_presentation", PRESENTATION, dict(pill="Touchscreen Presentation")),
+
+    ("chalk_board", BOARDS, {}),
+    ("whiteboards_count", BOARDS, {}),
+]
+
+# chips and pills appear in this order, independent of table order
+_HIGHLIGHT_ORDER = ["class_capture", "web_conference_camera", "interactive_display", "wireless_presentation"]
+_PILL_ORDER = ["touchscreen_presentation", "web_conference_camera", "interactive_display"]
+
+
+def _build():
+    features = []
+    for name, group, extra in _SPEC:
+        field = Classroom._meta.get_field(name)
+        features.append(Feature(name=name, group=group, verbose_name=str(field.verbose_name),
+                                internal_type=field.get_internal_type(), **extra))
+    return tuple(features)
+
+
+FEATURES = _build()
+BY_NAME = {f.name: f for f in FEATURES}
+GROUP_NAMES = tuple(dict.fromkeys(f.group for f in FEATURES))
+GROUPS = tuple(
+    (group, tuple(f for f in FEATURES if f.group == group and f.public))
+    for group in GROUP_NAMES
+)
+HIGHLIGHTS = tuple(BY_NAME[n] for n in _HIGHLIGHT_ORDER)
+FILTERABLE_FLAGS = tuple(f.name for f in FEATURES if f.filterable)
+PILLS = tuple((n, BY_NAME[n].pill) for n in _PILL_ORDER)
+ADMIN_FILTERS = tuple(f.name for f in FEATURES if f.admin_filter)
+
+assert set(FEATURE_FLAGS) <= set(BY_NAME), "every FEATURE_FLAGS bit needs a registry entry"
+assert {n for n, _ in PILLS} == {f.name for f in FEATURES if f.pill}
+
+
+def highlights(room):
+    return [label for label in (f.highlight_for(room) for f in HIGHLIGHTS) if label]
+
+
+def feature_table(room):
+    """[(group, [(verbose_name, display_value), ...]), ...] for the detail page."""
+    return [(group, [(f.verbose_name, f.display(room)) for f in feats]) for group, feats in GROUPS]
@@ -0,0 +1,195 @@
+# classrooms/filters.py
+"""
+Query-string filters for room listings.
+
+``RoomFilters.from_query(request.GET)`` normalizes the parameters (unknown
+or malformed values are dropped, never raised) and ``apply()`` turns them
+into SQL, so only matching rooms are fetched and rendered.
+
+    ?wireless=kramer&feature=class_capture&min_capacity=30&sort=cap-desc
+
+Multi-valued room attributes (wireless, seating, pc_type, feature) must
+all match; campus matches any of the given values.
+"""
+from dataclasses import dataclass, replace
+from operator import attrgetter
+from urllib.parse import urlencode
+
+from django.db.models import Count, Q
+
+from . import features
+from .models import Building, Classroom, feature_mask_for
+
+WIRELESS_VALUES = tuple(value for value, _ in Classroom.WIRELESS_CHOICES)
+SEATING_VALUES = tuple(value for value, _ in Classroom.SEATING_CHOICES)
+PC_TYPE_VALUES = tuple(value for value, _ in Classroom.PC_TYPE)
+CAMPUS_VALUES = tuple(Building.Campus.values)
+
+FILTERABLE_FLAGS = features.FILTERABLE_FLAGS
+
+SORTS = {
+    "": ("room_number",),
+    "room-asc": ("room_number",),
+    "cap-asc": ("capacity", "room_number"),
+    "cap-desc": ("-capacity", "room_number"),
+}
+
+# pills shown above the room grid: (param, value, label); the feature pills
+# and their labels come from the registry
+PILLS = [
+    *(("wireless", value, label) for value, label in Classroom.WIRELESS_CHOICES),
+    *(("feature", name, label) for name, label in features.PILLS),
+]
+
+
+def _int_or_none(raw):
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def _choices(params, name, allowed):
+    return tuple(sorted({v for v in params.getlist(name) if v in allowed}))
+
+
+@dataclass(frozen=True)
+class RoomFilters:
+    wireless: tuple = ()
+    features: tuple = ()
+    min_capacity: int = None
+    max_capacity: int = None
+    sort: str = ""
+    campus: tuple = ()
+    seating: tuple = ()
+    pc_type: tuple = ()
+
+    @classmethod
+    def from_query(cls, params):
+        return cls(
+            wireless=_choices(params, "wireless", WIRELESS_VALUES),
+            features=_choices(params, "feature", FILTERABLE_FLAGS),
+            campus=_choices(params, "campus", CAMPUS_VALUES),
+            seating=_choices(params, "seating", SEATING_VALUES),
+            pc_type=_choices(params, "pc_type", PC_TYPE_VALUES),
+            min_capacity=_int_or_none(params.get("min_capacity")),
+            max_capacity=_int_or_none(params.get("max_capacity")),
+            sort=params.get("sort", "") if params.get("sort", "") in SORTS else "",
+        )
+
+    @property
+    def is_active(self):
+        return bool(self.wireless or self.features or self.campus or self.seating or self.pc_type
+                    or self.min_capacity is not None or self.max_capacity is not None)
+
+    def apply(self, qs):
+        # MultiSelectFields are stored comma-joined and no choice value is a
+        # substring of another in the same field, so contains is exact enough
+        for w in self.wireless:
+            qs = qs.filter(wireless_presentation__contains=w)
+        for s in self.seating:
+            qs = qs.filter(seating_type__contains=s)
+        for p in self.pc_type:
+            qs = qs.filter(pc_type__contains=p)
+        if self.campus:
+            qs = qs.filter(building__campus__in=self.campus)
+        qs = qs.with_features(*self.features)
+        if self.min_capacity is not None:
+            qs = qs.filter(capacity__gte=self.min_capacity)
+        if self.max_capacity is not None:
+            qs = qs.filter(capacity__lte=self.max_capacity)
+        return qs.order_by(*SORTS[self.sort])
+
+    def select(self, rooms):
+        """
+        ``apply()`` over in-memory room records (classrooms/memory.py).
+        ``rooms`` must already be in the database's room_number order, so
+        the stable sorts below break ties exactly as ORDER BY does.
+        """
+        mask = feature_mask_for(*self.features)
+        picked = [
+            r for r in rooms
+            if all(w in (r.wireless_presentation or ()) for w in self.wireless)
+            and all(s in (r.seating_type or ()) for s in self.seating)
+            and all(p in (r.pc_type or ()) for p in self.pc_type)
+            and (not self.campus or r.building.campus in self.campus)
+            and r.feature_mask & mask == mask
+            and (self.min_capacity is None or r.capacity >= self.min_capacity)
+            and (self.max_capacity is None or r.capacity <= self.max_capacity)
+        ]
+        for key in reversed(SORTS[self.sort]):
+            if key != "room_number":
+                picked.sort(key=attrgetter(key.lstrip("-")), reverse=key.startswith("-"))
+        return picked
+
+    # --- links -------------------------------------------------------------
+    def query_items(self):
+        items = [("campus", c) for c in self.campus]
+        items += [("wireless", w) for w in self.wireless]
+        items += [("seating", s) for s in self.seating]
+        items += [("pc_type", p) for p in self.pc_type]
+        items += [("feature", f) for f in self.features]
+        if self.min_capacity is not None:
+            items.append(("min_capacity", self.min_capacity))
+        if self.max_capacity is not None:
+            items.append(("max_capacity", self.max_capacity))
+        if self.sort:
+            items.append(("sort", self.sort))
+        return items
+
+    def querystring(self, **extra):
+        items = self.query_items() + [(k, v) for k, v in extra.items() if v is not None]
+        return "?" + urlencode(items) if items else "?"
+
+    def toggle(self, param, value):
+        field = "wireless" if param == "wireless" else "features"
+        current = getattr(self, field)
+        values = [v for v in current if v != value] if value in current else [*current, value]
+        return replace(self, **{field: tuple(sorted(values))})
+
+    def pills(self):
+        """[{label, url, active}] for the filter bar; each link toggles one value."""
+        active = {("wireless", w) for w in self.wireless} | {("feature", f) for f in self.features}
+        return [
+            {"label": label, "active": (param, value) in active,
+             "url": self.toggle(param, value).querystring()}
+            for param, value, label in PILLS
+        ]
+
+
+# --- facets -------------------------------------------------------------------
+CAPACITY_BUCKETS = [(0, 24), (25, 49), (50, 99), (100, 199), (200, None)]
+
+
+def _bucket_label(lo, hi):
+    return f"{lo}+" if hi is None else f"{lo}-{hi}"
+
+
+def facet_counts(qs):
+    """
+    Counts for every filter dimension over ``qs`` in ONE grouped aggregate:
+    each facet value is a ``COUNT(*) FILTER (WHERE ...)`` column.
+    """
+    aggs = {"total": Count("id")}
+    dims = {
+        "campus": [(c, Q(building__campus=c)) for c in CAMPUS_VALUES],
+        "wireless": [(w, Q(wireless_presentation__contains=w)) for w in WIRELESS_VALUES],
+        "seating": [(s, Q(seating_type__contains=s)) for s in SEATING_VALUES],
+        "pc_type": [(p, Q(pc_type__contains=p)) for p in PC_TYPE_VALUES],
+        "feature": [(f, Q(**{f: True})) for f in FILTERABLE_FLAGS],
+        "capacity": [
+            (_bucket_label(lo, hi), Q(capacity__gte=lo) & (Q() if hi is None else Q(capacity__lte=hi)))
+            for lo, hi in CAPACITY_BUCKETS
+        ],
+    }
+    for dim, values in dims.items():
+        for i, (_, cond) in enumerate(values):
+            aggs[f"f_{dim}_{i}"] = Count("id", filter=cond)
+
+    row = qs.order_by().aggregate(**aggs)
+    facets = {
+        dim: {value: row[f"f_{dim}_{i}"] for i, (value, _) in enumerate(values)}
+        for dim, values in dims.items()
+    }
+    return row["total"], facets
@@ -0,0 +1,247 @@
+# classrooms/jobs.py
+"""
+Background jobs without a broker.
+
+Work that should not hold up an admin save (image renditions, panorama
+tiles, re-rendering the cached pages that show them) is queued as ``Job``
+rows in the main database and run by ``manage.py run_worker``:
+
+    from classrooms import jobs, tasks
+    jobs.enqueue(tasks.tile_panorama, pk=pano.pk, key=f"tiles:{pano.pk}")
+
+``enqueue()`` inserts the row inside the caller's transaction, like an
+outbox: if the save rolls back the job goes with it, and a worker cannot
+pick it up before the rows it refers to are committed.  Workers claim jobs
+with a conditional UPDATE (``status = pending`` -> ``running``), which only
+one of them can win on SQLite and PostgreSQL alike, so any number of threads
+or processes may poll the same table.  A failing job is retried with
+exponential backoff and marked ``failed`` after ``max_attempts``; jobs left
+``running`` by a killed worker are put back after ``STALE_AFTER``.  The
+admin lists pending and failed jobs and can retry them.
+
+With ``settings.JOBS_EAGER`` (on by default when DEBUG) ``enqueue()`` runs
+the task inline instead, so development and tests need no worker.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10       # seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 3600
+STALE_AFTER = 1800      # a job running this long lost its worker
+KEEP_DONE = timedelta(days=7)
+POLL_SECONDS = 1.0
+HOUSEKEEPING_SECONDS = 60
+CLAIM_BATCH = 10
+
+TASKS = {}  # "module.function" -> callable
+
+
+def task(func):
+    """Register ``func`` as a job; it is called with the JSON kwargs given to ``enqueue()``."""
+    func.task_name = f"{func.__module__}.{func.__qualname__}"
+    TASKS[func.task_name] = func
+    return func
+
+
+def _resolve(name):
+    if name not in TASKS:
+        import_string(name)  # importing the module registers its tasks
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise LookupError(f"{name} is not a registered task") from None
+
+
+def enqueue(func, *, delay=0, key="", max_attempts=MAX_ATTEMPTS, **kwargs):
+    """
+    Queue ``func(**kwargs)``; returns the Job, or None if it ran inline
+    (JOBS_EAGER) or a pending job with the same ``key`` already covers it.
+    """
+    name = func if isinstance(func, str) else func.task_name
+    if settings.JOBS_EAGER:
+        _resolve(name)(**kwargs)
+        return None
+    run_after = timezone.now() + timedelta(seconds=delay)
+    # An UPDATE rather than exists(): it locks the pending row until this
+    # transaction commits, so a worker cannot claim it in between and run
+    # against data that predates our change.
+    if key and Job.objects.filter(key=key, status=Job.Status.PENDING).update(run_after=run_after):
+        return None
+    return Job.objects.create(task=name, kwargs=kwargs, key=key,
+                              max_attempts=max_attempts, run_after=run_after)
+
+
+def backoff(attempt):
+    """Seconds to wait before retrying after failed attempt number ``attempt``."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay * random.uniform(0.75, 1.25)  # jitter: retries of one burst spread out
+
+
+# --- worker side -------------------------------------------------------------------
+def worker_name(index=None):
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return name if index is None else f"{name}:{index}"
+
+
+def claim(worker):
+    """Mark the next due job as running for ``worker`` and return it (or None)."""
+    now = timezone.now()
+    due = (Job.objects.filter(status=Job.Status.PENDING, run_after__lte=now)
+           .order_by("run_after", "pk").values_list("pk", flat=True)[:CLAIM_BATCH])
+    for pk in list(due):
+        won = Job.objects.filter(pk=pk, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1)
+        if won:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; returns True on success."""
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            _resolve(job.task)(**job.kwargs)
+    except Exception:
+        now = timezone.now()
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error("job %s failed for good after %d attempts", job, job.attempts, exc_info=True)
+            mine.update(status=Job.Status.FAILED, finished_at=now, locked_by="", locked_at=None,
+                        last_error=error)
+        else:
+            logger.warning("job %s failed (attempt %d of %d)", job, job.attempts, job.max_attempts,
+                           exc_info=True)
+            mine.update(status=Job.Status.PENDING, run_after=now + timedelta(seconds=backoff(job.attempts)),
+                        locked_by="", locked_at=None, last_error=error)
+        return False
+    mine.update(status=Job.Status.DONE, finished_at=timezone.now(), locked_by="", locked_at=None,
+                last_error="")
+    return True
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Put back jobs whose worker died mid-run; returns how many were touched."""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.Status.RUNNING,
+                               locked_at__lt=now - timedelta(seconds=older_than))
+    lost = "worker stopped responding"
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED, finished_at=now, locked_by="", locked_at=None, last_error=lost)
+    return failed + stale.update(status=Job.Status.PENDING, run_after=now, locked_by="",
+                                 locked_at=None, last_error=lost)
+
+
+def purge(keep=KEEP_DONE):
+    """Delete finished jobs older than ``keep``; failed ones stay for the admin."""
+    return Job.objects.filter(status=Job.Status.DONE, finished_at__lt=timezone.now() - keep).delete()[0]
+
+
+def work(name=None, *, burst=False, poll=POLL_SECONDS, stop=None):
+    """
+    Claim and run jobs until ``stop`` is set, or with ``burst`` until nothing
+    is due.  Returns ``(done, failed)``.
+    """
+    name = name or worker_name()
+    stop = stop or threading.Event()
+    done = failed = 0
+    housekeeping = 0.0
+    while not stop.is_set():
+        try:
+            if time.monotonic() >= housekeeping:
+                requeue_stale()
+                purge()
+                housekeeping = time.monotonic() + HOUSEKEEPING_SECONDS
+            job = claim(name)
+        except OperationalError:
+            # SQLite: another connection is writing; try again shortly
+            logger.debug("queue busy", exc_info=True)
+            stop.wait(poll)
+            continue
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll)
+            continue
+        if run_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def _thread_main(name, burst, poll, stop):
+    try:
+        return work(name, burst=burst, poll=poll, stop=stop)
+    finally:
+        connection.close()  # this thread's own connection
+
+
+_stop = threading.Event()  # per worker process; run() replaces it with one shared by the pool
+
+
+def _init_process(shutdown):
+    import django
+
+    global _stop
+    django.setup()
+    _stop = shutdown
+    # finish the current job on Ctrl-C / SIGTERM instead of dying mid-way
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *args: _stop.set())
+
+
+def _process_main(index, burst, poll):
+    return work(worker_name(index), burst=burst, poll=poll, stop=_stop)
+
+
+def run(concurrency=1, mode="threads", *, burst=False, poll=POLL_SECONDS, stop=None):
+    """
+    Run ``concurrency`` workers as threads (I/O-bound jobs, one process) or
+    processes (CPU-bound jobs such as tiling).  Returns ``(done, failed)``
+    summed over all workers.  Setting ``stop`` lets every worker finish its
+    current job and return, in either mode.
+    """
+    stop = stop or threading.Event()
+    if concurrency == 1:
+        return work(worker_name(), burst=burst, poll=poll, stop=stop)
+    if mode == "processes":
+        connections.close_all()  # never share a DB socket with forked workers
+        # the children only see signals sent to them; a SIGTERM to the parent
+        # alone (systemd, docker stop) reaches them through this event
+        shutdown = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process,
+                                 initargs=(shutdown,)) as pool:
+            futures = [pool.submit(_process_main, i, burst, poll) for i in range(concurrency)]
+            while wait(futures, timeout=poll).not_done:
+                if stop.is_set():
+                    shutdown.set()
+            results = [f.result() for f in futures]
+    elif mode == "threads":
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job-worker") as pool:
+            futures = [pool.submit(_thread_main, worker_name(i), burst, poll, stop)
+                       for i in range(concurrency)]
+            results = [f.result() for f in futures]
+    else:
+        raise ValueError("mode must be 'threads' or 'processes'")
+    return tuple(sum(r[i] for r in results) for i in range(2))
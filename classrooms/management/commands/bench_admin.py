@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from classrooms import synthetic
+from classrooms.models import Building, Classroom
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Time the Building/Classroom admin changelists and change form as a synthetic "
+            "catalog grows (created inside a transaction and rolled back)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,50000",
+                            help="comma-separated total room counts to measure at")
+        parser.add_argument("--rooms-per-building", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=10, help="requests per page and size")
+
+    def handle(self, *args, **opts):
+        sizes = sorted(int(s) for s in opts["sizes"].split(","))
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                client = Client()
+                client.force_login(get_user_model().objects.create_superuser(
+                    "bench-admin", "bench@example.edu", None))
+                self.stdout.write(f"{'rooms':>7}  {'page':<26} {'median':>9} {'p95':>9}  queries")
+                for step, size in enumerate(sizes):
+                    self._grow(step, size, opts["rooms_per_building"])
+                    for label, url in self._pages():
+                        self._time(client, size, label, url, opts["requests"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _grow(self, step, target, per_building):
+        missing = target - Classroom.objects.count()
+        if missing <= 0:
+            return
+        campuses = list(Building.Campus.values)
+        per_campus = max(1, -(-missing // (per_building * len(campuses))))
+        synthetic.generate(prefix=f"bench{step}", buildings_per_campus=per_campus,
+                           rooms_per_building=per_building, photos_per_room=2,
+                           panoramas_per_room=1, images=False)
+
+    def _pages(self):
+        room = Classroom.objects.order_by("pk").first()
+        return [
+            ("building changelist", reverse("admin:classrooms_building_changelist")),
+            ("classroom changelist", reverse("admin:classrooms_classroom_changelist")),
+            ("classroom by building", reverse("admin:classrooms_classroom_changelist")
+             + f"?building={room.building_id}"),
+            ("classroom filtered", reverse("admin:classrooms_classroom_changelist")
+             + "?is_published__exact=1&class_capture__exact=1"),
+            ("classroom change form", reverse("admin:classrooms_classroom_change", args=[room.pk])),
+            ("building autocomplete", reverse("admin:autocomplete")
+             + "?app_label=classrooms&model_name=classroom&field_name=building&term=hall"),
+        ]
+
+    def _time(self, client, size, label, url, n):
+        timings = []
+        for _ in range(n):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                self.stderr.write(self.style.ERROR(f"{label}: HTTP {response.status_code}"))
+                return
+        queries = sum(1 for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"])
+        p95 = statistics.quantiles(timings, n=20)[18] if n > 1 else timings[0]
+        self.stdout.write(f"{size:>7}  {label:<26} {statistics.median(timings):7.1f}ms "
+                          f"{p95:7.1f}ms  {queries}")
@@ -0,0 +1,87 @@
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch, Q
+from django.test.utils import CaptureQueriesContext
+
+from classrooms import memory
+from classrooms.models import Building, BuildingResource, Classroom
+
+from .bench_views import _git_rev
+
+
+def _measure(load):
+    """(result, bytes still allocated after ``load()``, peak bytes, seconds, queries)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            result = load()
+            elapsed = time.perf_counter() - started
+        ctx.captured_queries.clear()  # the query log is not part of the result
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, retained, peak, elapsed, len(ctx)
+
+
+def _mb(n):
+    return f"{n / 2 ** 20:7.1f} MB"
+
+
+def _as_models():
+    # what the database views load for the same pages, kept as model instances
+    published = Q(is_published=True)
+    return list(Building.objects.prefetch_related(
+        Prefetch("classrooms", Classroom.objects.filter(published).prefetch_related("photos", "panoramas")),
+        Prefetch("resources", BuildingResource.objects.filter(published=True)),
+    ))
+
+
+class Command(BaseCommand):
+    help = ("Build the in-memory catalog (classrooms/memory.py) and report its size, build time and "
+            "queries, scaled to 10k rooms, next to the same rows held as model instances")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="write results to this JSON file")
+
+    def handle(self, *args, **opts):
+        catalog, retained, peak, elapsed, queries = _measure(lambda: memory.build("bench"))
+        rooms = len(catalog.rooms)
+        if not rooms:
+            raise CommandError("no published rooms; run generate_catalog first")
+        del catalog
+        _, model_bytes, _, model_seconds, model_queries = _measure(_as_models)
+
+        def per_10k(n):
+            return round(n / rooms * 10_000)
+
+        report = {
+            "meta": {
+                "git": _git_rev(),
+                "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "vendor": connection.vendor,
+                "buildings": Building.objects.count(),
+                "rooms": rooms,
+            },
+            "catalog": {"bytes": retained, "bytes_per_10k_rooms": per_10k(retained), "peak_bytes": peak,
+                        "build_seconds": round(elapsed, 3), "queries": queries},
+            "models": {"bytes": model_bytes, "bytes_per_10k_rooms": per_10k(model_bytes),
+                       "load_seconds": round(model_seconds, 3), "queries": model_queries},
+        }
+        self.stdout.write(f"{rooms} published rooms in {report['meta']['buildings']} buildings")
+        self.stdout.write(f"  in-memory catalog  {_mb(retained)}  ({_mb(per_10k(retained))} per 10k rooms, "
+                          f"peak {_mb(peak).strip()} while building)  {queries} queries  {elapsed:.3f}s")
+        self.stdout.write(f"  as model instances {_mb(model_bytes)}  ({_mb(per_10k(model_bytes))} per 10k rooms)"
+                          f"  {model_queries} queries  {model_seconds:.3f}s")
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"wrote {opts['output']}")
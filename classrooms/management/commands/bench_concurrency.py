@@ -0,0 +1,239 @@
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import cycle, islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from classrooms.models import Classroom
+
+from .bench_views import _git_rev, _percentiles
+
+LEVELS = (1, 50, 500)
+SERVERS = {
+    # same worker count for both: one process per CPU by default
+    "wsgi": lambda bind, workers: [sys.executable, "-m", "gunicorn", "core.wsgi:application",
+                                   "--bind", bind, "--workers", str(workers), "--worker-class", "sync",
+                                   "--backlog", "2048", "--log-level", "warning"],
+    "asgi": lambda bind, workers: [sys.executable, "-m", "uvicorn", "core.asgi:application",
+                                   "--host", bind.split(":")[0], "--port", bind.split(":")[1],
+                                   "--workers", str(workers), "--backlog", "2048",
+                                   "--log-level", "warning", "--no-access-log"],
+}
+
+
+class _Level:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.connects = 0
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.x response; returns (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("server closed the connection")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    keep_alive = status_line.startswith(b"HTTP/1.1") and headers.get("connection") != "close"
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def _connection(host, port, requests, deadline, timeout, level):
+    """One client connection: request after request until ``deadline``, reconnecting when the server closes."""
+    reader = writer = None
+    for request in requests:
+        if time.monotonic() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                level.connects += 1
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), timeout)
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            level.errors += 1
+            keep_alive = False
+        else:
+            level.latencies.append((time.perf_counter() - started) * 1000)
+            level.statuses[str(status)] = level.statuses.get(str(status), 0) + 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _drive(host, port, requests, connections, seconds, timeout):
+    level = _Level()
+    deadline = time.monotonic() + seconds
+    # every connection walks the same mix from its own offset; the deadline ends the run
+    await asyncio.gather(*(
+        _connection(host, port, islice(cycle(requests), i, None), deadline, timeout, level)
+        for i in range(connections)))
+    return level
+
+
+class Command(BaseCommand):
+    help = ("Start gunicorn sync workers (core.wsgi) and uvicorn (core.asgi, async views) with the same "
+            "number of processes and load each with 1, 50 and 500 concurrent keep-alive connections; "
+            "reports throughput, p50/p95/p99 latency and errors per level")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", action="append", choices=sorted(SERVERS),
+                            help="only these servers (repeatable; default: all)")
+        parser.add_argument("--concurrency", action="append", type=int,
+                            help=f"concurrent connections (repeatable; default: {', '.join(map(str, LEVELS))})")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="server processes (default: one per CPU)")
+        parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per level")
+        parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each level")
+        parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request counts as an error")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="write results to this JSON file")
+
+    def handle(self, *args, **opts):
+        levels = opts["concurrency"] or list(LEVELS)
+        if min(levels) < 1:
+            raise CommandError("--concurrency must be at least 1")
+        paths = self._paths(random.Random(opts["seed"]))
+        host = next((h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")), "localhost")
+        # SECURE_SSL_REDIRECT would answer every plain-HTTP request with a redirect
+        proto = "X-Forwarded-Proto: https\r\n" if settings.SECURE_PROXY_SSL_HEADER else ""
+        requests = [f"GET {p} HTTP/1.1\r\nHost: {host}\r\n{proto}User-Agent: bench_concurrency\r\n\r\n".encode()
+                    for p in paths]
+
+        results = {}
+        for name in opts["server"] or sorted(SERVERS, reverse=True):
+            bind = f"127.0.0.1:{opts['port']}"
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {opts['workers']} workers on {bind}"))
+            with self._server(name, bind, opts["workers"]):
+                results[name] = {}
+                for n in levels:
+                    asyncio.run(_drive("127.0.0.1", opts["port"], requests, n, opts["warmup"], opts["timeout"]))
+                    level = asyncio.run(_drive("127.0.0.1", opts["port"], requests, n, opts["duration"],
+                                               opts["timeout"]))
+                    results[name][str(n)] = r = self._summary(level, opts["duration"])
+                    self._print(n, r)
+
+        if len(results) > 1:
+            self._compare(results)
+        if opts["output"]:
+            report = {
+                "meta": {
+                    "git": _git_rev(),
+                    "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "cpus": os.cpu_count(),
+                    "workers": opts["workers"],
+                    "duration": opts["duration"],
+                    "page_cache": settings.CLASSROOMS_PAGE_CACHE,
+                    "rooms": Classroom.objects.count(),
+                },
+                "results": results,
+            }
+            with open(opts["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"wrote {opts['output']}")
+
+    def _paths(self, rng):
+        rooms = list(Classroom.objects.filter(is_published=True).values_list("building__slug", "room_number"))
+        if not rooms:
+            raise CommandError("no published rooms; run generate_catalog first")
+        slugs = sorted({slug for slug, _ in rooms})
+        rng.shuffle(rooms)
+        # roughly what the site gets: mostly room pages, then lists, then the index
+        paths = [reverse("classroom_detail", args=room) for room in rooms[:300]]
+        paths += [reverse("classroom_list_by_building", args=[slug]) for slug in slugs[:100]]
+        paths += [reverse("buildings_index")] * max(1, len(paths) // 10)
+        rng.shuffle(paths)
+        return paths
+
+    @contextmanager
+    def _server(self, name, bind, workers):
+        env = {**os.environ, "ASYNC_VIEWS": str(name == "asgi").lower()}
+        proc = subprocess.Popen(SERVERS[name](bind, workers), cwd=settings.BASE_DIR, env=env)
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    socket.create_connection(tuple(bind.rsplit(":", 1)), timeout=1).close()
+                    break
+                except OSError:
+                    if proc.poll() is not None or time.monotonic() > deadline:
+                        raise CommandError(f"{name} server did not start") from None
+                    time.sleep(0.2)
+            yield proc
+        finally:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.wait()
+
+    def _summary(self, level, seconds):
+        lat = level.latencies or [0.0]
+        return {
+            "requests": len(level.latencies),
+            "rps": round(len(level.latencies) / seconds, 1),
+            "errors": level.errors,
+            "connects": level.connects,
+            "latency_ms": {**{k: round(v, 3) for k, v in _percentiles(lat).items()},
+                           "mean": round(statistics.fmean(lat), 3), "max": round(max(lat), 3)},
+            "status": level.statuses,
+        }
+
+    def _print(self, n, r):
+        lat = r["latency_ms"]
+        errors = self.style.ERROR(f"{r['errors']} errors") if r["errors"] else "0 errors"
+        self.stdout.write(
+            f"  {n:>5} conns  {r['rps']:8.1f} req/s  p50 {lat['p50']:8.1f} ms  p95 {lat['p95']:8.1f} ms  "
+            f"p99 {lat['p99']:8.1f} ms  {errors}  {r['connects']} connects  {r['status']}"
+        )
+
+    def _compare(self, results):
+        (a, ra), (b, rb) = list(results.items())[:2]
+        self.stdout.write(f"{b} vs {a}:")
+        for n, old in ra.items():
+            new = rb.get(n)
+            if not new:
+                continue
+            change = (new["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else 0
+            style = self.style.SUCCESS if change > 10 else self.style.ERROR if change < -10 else str
+            self.stdout.write(f"  {n:>5} conns  " + style(f"{old['rps']:8.1f} -> {new['rps']:8.1f} req/s "
+                                                          f"({change:+5.0f}%)")
+                              + f"  p99 {old['latency_ms']['p99']:8.1f} -> {new['latency_ms']['p99']:8.1f} ms")
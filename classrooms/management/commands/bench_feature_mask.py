@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from classrooms.models import FEATURE_FLAGS, Building, Classroom
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Benchmark Classroom.objects.with_features() against per-column boolean "
+            "filters on a synthetic table (created inside a transaction and rolled back)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=100_000)
+        parser.add_argument("--per-building", type=int, default=500)
+        parser.add_argument("--queries", type=int, default=50, help="random feature combos to time")
+        parser.add_argument("--features", type=int, default=3, help="features per combo")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        try:
+            with transaction.atomic():
+                self._seed(rng, opts["rooms"], opts["per_building"])
+                self._run(rng, opts["queries"], opts["features"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, rng, n_rooms, per_building):
+        started = time.perf_counter()
+        n_buildings = max(1, -(-n_rooms // per_building))
+        buildings = Building.objects.bulk_create(
+            [Building(name=f"bench-{i}", slug=f"bench-{i}") for i in range(n_buildings)]
+        )
+        # skewed distribution: some features common, most rare
+        odds = {f: rng.choice((0.05, 0.1, 0.3, 0.6)) for f in FEATURE_FLAGS}
+        batch = []
+        for i in range(n_rooms):
+            room = Classroom(
+                external_id=f"bench-{i}", building=buildings[i // per_building],
+                room_number=str(i % per_building), is_published=rng.random() < 0.9,
+                **{f: rng.random() < p for f, p in odds.items()},
+            )
+            room.feature_mask = room.compute_feature_mask()
+            batch.append(room)
+            if len(batch) == 5000:
+                Classroom.objects.bulk_create(batch)
+                batch = []
+        Classroom.objects.bulk_create(batch)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cur:
+                cur.execute("ANALYZE classrooms_classroom")
+        self.stdout.write(f"seeded {n_rooms} rooms in {n_buildings} buildings "
+                          f"({time.perf_counter() - started:.1f}s)")
+
+    def _time(self, make_qs, combos):
+        timings, counts = [], []
+        for combo in combos:
+            started = time.perf_counter()
+            counts.append(len(list(make_qs(combo).values_list("id", flat=True))))
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, counts
+
+    def _run(self, rng, n_queries, n_features):
+        combos = [rng.sample(FEATURE_FLAGS, n_features) for _ in range(n_queries)]
+        base = Classroom.objects.filter(is_published=True)
+        columns, col_counts = self._time(lambda c: base.filter(Q(**{f: True for f in c})), combos)
+        bitmask, mask_counts = self._time(lambda c: base.with_features(*c), combos)
+        if col_counts != mask_counts:
+            self.stderr.write(self.style.ERROR("result sets differ between strategies!"))
+
+        self.stdout.write(f"{n_queries} queries x {n_features} features on {connection.vendor}")
+        for label, ms in (("per-column", columns), ("bitmask", bitmask)):
+            q = statistics.quantiles(ms, n=20)
+            self.stdout.write(f"  {label:<11} median {statistics.median(ms):7.2f} ms   "
+                              f"p95 {q[18]:7.2f} ms   total {sum(ms):8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"speedup (median): {statistics.median(columns) / statistics.median(bitmask):.2f}x"
+        ))
@@ -0,0 +1,170 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from classrooms.models import Building, Classroom
+
+CACHE_MODES = ("warm", "cold", "off")
+
+
+def _percentiles(values):
+    if len(values) < 2:
+        return {p: values[0] if values else 0 for p in ("p50", "p95", "p99")}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": q[49], "p95": q[94], "p99": q[98]}
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Drive every public view through the test client and report p50/p95/p99 latency, "
+            "query counts and response sizes; --output saves JSON, --compare diffs against one")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+        parser.add_argument("--cache", choices=CACHE_MODES, default="warm",
+                            help="warm: page cache on; cold: cleared before every request; off: disabled")
+        parser.add_argument("--only", action="append", help="run only these scenarios (repeatable)")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="write results to this JSON file")
+        parser.add_argument("--compare", help="earlier --output file to compare against")
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        slugs = list(Building.objects.filter(classrooms__is_published=True)
+                     .values_list("slug", flat=True).distinct())
+        rooms = list(Classroom.objects.filter(is_published=True)
+                     .values_list("building__slug", "room_number"))
+        if not rooms:
+            raise CommandError("no published rooms; run generate_catalog first")
+        words = list(Building.objects.values_list("name", flat=True)[:200])
+
+        scenarios = self._scenarios(rng, slugs, rooms, words)
+        if opts["only"]:
+            unknown = set(opts["only"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = {k: v for k, v in scenarios.items() if k in opts["only"]}
+
+        client = Client()
+        overrides = {"ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"]}
+        if opts["cache"] == "off":
+            overrides["CLASSROOMS_PAGE_CACHE"] = False
+        results = {}
+        with override_settings(**overrides):
+            for name, make_url in scenarios.items():
+                results[name] = self._run(client, make_url, opts["requests"], opts["cache"])
+                self._print(name, results[name])
+
+        report = {
+            "meta": {
+                "git": _git_rev(),
+                "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "vendor": connection.vendor,
+                "cache": opts["cache"],
+                "requests": opts["requests"],
+                "buildings": Building.objects.count(),
+                "rooms": Classroom.objects.count(),
+            },
+            "results": results,
+        }
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"wrote {opts['output']}")
+        if opts["compare"]:
+            with open(opts["compare"]) as fh:
+                self._compare(json.load(fh), report)
+
+    def _scenarios(self, rng, slugs, rooms, words):
+        def room_url():
+            slug, number = rng.choice(rooms)
+            return reverse("classroom_detail", args=[slug, number])
+
+        def list_url(**params):
+            def make():
+                url = reverse("classroom_list_by_building", args=[rng.choice(slugs)])
+                return url + ("?" + urlencode(params) if params else "")
+            return make
+
+        def api_url(**params):
+            return lambda: reverse("api_rooms") + ("?" + urlencode(params) if params else "")
+
+        def term():
+            return rng.choice(rng.choice(words).split())
+
+        return {
+            "buildings_index": lambda: reverse("buildings_index"),
+            "room_list": list_url(),
+            "room_list_filtered": list_url(feature="class_capture", min_capacity=30, sort="cap-desc"),
+            "room_list_page_2": list_url(page=2),
+            "room_detail": room_url,
+            "api_rooms": api_url(),
+            "api_rooms_filtered": api_url(campus="MAIN", wireless="kramer", min_capacity=40),
+            "search": lambda: reverse("search") + "?" + urlencode({"q": term()}),
+            "search_suggest": lambda: reverse("search_suggest") + "?" + urlencode({"q": term()[:3]}),
+        }
+
+    def _run(self, client, make_url, n, cache_mode):
+        timings, queries, sizes, statuses = [], [], [], {}
+        for _ in range(n):
+            url = make_url()
+            if cache_mode == "cold":
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url, secure=True)
+                timings.append((time.perf_counter() - started) * 1000)
+            # ATOMIC_REQUESTS wraps every view in a savepoint; count real statements only
+            queries.append(sum(1 for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]))
+            sizes.append(len(response.content))
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        return {
+            "latency_ms": {**{k: round(v, 3) for k, v in _percentiles(timings).items()},
+                           "mean": round(statistics.fmean(timings), 3), "max": round(max(timings), 3)},
+            "queries": {"p50": statistics.median(queries), "max": max(queries)},
+            "bytes": {"p50": statistics.median(sizes), "max": max(sizes)},
+            "status": statuses,
+        }
+
+    def _print(self, name, r):
+        lat = r["latency_ms"]
+        self.stdout.write(
+            f"{name:<20} p50 {lat['p50']:8.2f} ms  p95 {lat['p95']:8.2f} ms  p99 {lat['p99']:8.2f} ms  "
+            f"queries {r['queries']['p50']:>4g} (max {r['queries']['max']})  "
+            f"{r['bytes']['p50'] / 1024:7.1f} KB  {r['status']}"
+        )
+
+    def _compare(self, before, after):
+        self.stdout.write(f"\nvs {before['meta'].get('git') or 'baseline'} "
+                          f"({before['meta']['rooms']} rooms, cache {before['meta']['cache']}):")
+        for name, new in after["results"].items():
+            old = before["results"].get(name)
+            if not old:
+                continue
+            cells = []
+            for p in ("p50", "p95", "p99"):
+                a, b = old["latency_ms"][p], new["latency_ms"][p]
+                change = (b - a) / a * 100 if a else 0
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                cells.append(style(f"{p} {a:7.2f} -> {b:7.2f} ms ({change:+5.0f}%)"))
+            dq = new["queries"]["p50"] - old["queries"]["p50"]
+            self.stdout.write(f"{name:<20} " + "  ".join(cells) + f"  queries {dq:+g}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from classrooms import cards
+from classrooms.cache import bump, touch
+
+
+class Command(BaseCommand):
+    help = ("Recompute every room's tile image (its preview, else first photo or panorama) "
+            "after fixtures, raw SQL or other writes that skip the signals")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=cards.BATCH_SIZE)
+
+    def handle(self, *args, **opts):
+        changed = cards.rebuild(batch_size=opts["batch_size"])
+        if changed:
+            bump(*touch(rooms=changed))  # building lists still show the old tiles
+        self.stdout.write(self.style.SUCCESS(f"Updated the card image of {len(changed)} rooms"))
@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from classrooms import tiles
+from classrooms.cache import bump, touch
+from classrooms.models import Panorama
+
+
+class Command(BaseCommand):
+    help = ("Cut panoramas into Pannellum multires cube tiles (and derive missing previews), "
+            "across a process pool")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--force", action="store_true", help="rebuild current tiles too")
+        parser.add_argument("--id", type=int, action="append", help="only these panorama ids (repeatable)")
+
+    def _progress(self, pano, built, failed):
+        self.stderr.write(f"  {built:>6} tiled  {failed:>4} failed  ({pano.image_file.name})")
+
+    def handle(self, *args, **opts):
+        if opts["workers"] < 1:
+            raise CommandError("--workers must be positive")
+        qs = Panorama.objects.exclude(image_file="").exclude(image_file__isnull=True).order_by("pk")
+        if opts["id"]:
+            qs = qs.filter(pk__in=opts["id"])
+        panos = [p for p in qs if opts["force"] or not tiles.is_current(p)]
+        built, failed = tiles.build_many(
+            panos, workers=opts["workers"],
+            progress=self._progress if opts["verbosity"] >= 2 else None,
+        )
+        if built:
+            # cached detail pages still embed the equirectangular config
+            bump(*touch(rooms={p.classroom_id for p in built}))
+        self.stdout.write(self.style.SUCCESS(
+            f"Tiled {len(built)} of {len(panos)} panoramas, {failed} failed "
+            f"(panoramas under {tiles.MIN_WIDTH}px wide stay a single image)"
+        ))
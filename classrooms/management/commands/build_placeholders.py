@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from classrooms import cards, placeholders
+from classrooms.cache import bump, touch
+from classrooms.models import Building, Classroom
+
+
+class Command(BaseCommand):
+    help = ("Record intrinsic sizes and inline blur-up placeholders for every previewed image "
+            "that has none or a stale one (after an upgrade, a restore or an import)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append",
+                            choices=[m.__name__.lower() for m in placeholders.IMAGE_FIELDS],
+                            help="only these models (repeatable)")
+        parser.add_argument("--force", action="store_true", help="recompute current entries too")
+
+    def handle(self, *args, **opts):
+        changed = 0
+        buildings, rooms = set(), set()
+        for model, fields in placeholders.IMAGE_FIELDS.items():
+            if opts["model"] and model.__name__.lower() not in opts["model"]:
+                continue
+            has_image = Q()
+            for name in fields:
+                has_image |= ~Q(**{name: ""}) & Q(**{f"{name}__isnull": False})
+            owner = "pk" if model in (Building, Classroom) else "classroom_id"
+            qs = model._base_manager.filter(has_image).only("pk", owner, "placeholders", *fields)
+            done = 0
+            for obj in qs.iterator(chunk_size=200):
+                if placeholders.refresh(obj, force=opts["force"]):
+                    done += 1
+                    (buildings if model is Building else rooms).add(getattr(obj, owner))
+            self.stdout.write(f"  {model.__name__:<16} {done:>6} updated")
+            changed += done
+        if changed:
+            cards.rebuild(Classroom.objects.filter(pk__in=rooms))  # room cards carry copies of these entries
+            # cached pages were rendered without sizes or placeholders
+            bump(*touch(buildings, rooms))
+        self.stdout.write(self.style.SUCCESS(f"Measured images for {changed} rows"))
@@ -0,0 +1,34 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from classrooms import snapshot
+
+
+class Command(BaseCommand):
+    help = ("Render the building index, room lists and room pages to static HTML (plus manifest.json); "
+            "only pages whose rows changed since the last build are re-rendered")
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", default=settings.CATALOG_SNAPSHOT_DIR or "snapshot",
+                            help="directory to build into (default: CATALOG_SNAPSHOT_DIR or ./snapshot)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="rendering processes (default: one per CPU)")
+        parser.add_argument("--force", action="store_true", help="re-render every page")
+
+    def handle(self, *args, **opts):
+        progress = None
+        if opts["verbosity"] >= 2:
+            def progress(path, stats):
+                self.stdout.write(f"  {path}")
+
+        stats = snapshot.build(opts["output"], workers=max(1, opts["workers"]),
+                               force=opts["force"], progress=progress)
+        summary = (f"Rendered {stats.rendered} pages ({filesizeformat(stats.bytes)}), "
+                   f"{stats.unchanged} unchanged, {stats.removed} removed in {stats.elapsed:.1f}s")
+        if stats.failed:
+            self.stderr.write(self.style.ERROR(f"{summary}; {stats.failed} failed (see the log)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
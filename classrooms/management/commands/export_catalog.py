@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from classrooms import exports
+
+
+class Command(BaseCommand):
+    help = ("Stream the published catalog as JSON, JSON Lines or CSV (optionally gzipped) "
+            "to a file or stdout, in constant memory")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=exports.FORMATS, default="jsonl")
+        parser.add_argument("--kind", action="append", choices=list(exports.KINDS),
+                            help="export only these kinds (repeatable; CSV takes exactly one, "
+                                 "default classrooms)")
+        parser.add_argument("--gzip", action="store_true", help="compress the output on the fly")
+        parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+
+    def handle(self, *args, **opts):
+        try:
+            chunks = exports.export_chunks(opts["format"], opts["kind"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        data = exports.encode_chunks(chunks)
+        if opts["gzip"]:
+            data = exports.gzip_chunks(data)
+
+        started = time.perf_counter()
+        out = open(opts["output"], "wb") if opts["output"] else sys.stdout.buffer
+        size = 0
+        try:
+            for block in data:
+                out.write(block)
+                size += len(block)
+        finally:
+            if opts["output"]:
+                out.close()
+            else:
+                out.flush()
+        if opts["output"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {size / 1024:,.0f} KB to {opts['output']} in {time.perf_counter() - started:.1f}s"
+            ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from classrooms import synthetic
+from classrooms.models import Building
+
+
+class Command(BaseCommand):
+    help = ("Generate a synthetic catalog (buildings, rooms, photos, panoramas, resources) "
+            "for load testing; rows are tagged with --prefix so --clear can remove them")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buildings-per-campus", type=int, default=100)
+        parser.add_argument("--rooms-per-building", type=int, default=100)
+        parser.add_argument("--photos-per-room", type=int, default=2)
+        parser.add_argument("--panoramas-per-room", type=int, default=1)
+        parser.add_argument("--resources-per-building", type=int, default=2)
+        parser.add_argument("--campus", action="append", choices=Building.Campus.values,
+                            help="limit to these campuses (repeatable; default: all)")
+        parser.add_argument("--prefix", default="synth")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--no-images", action="store_true", help="leave image fields empty")
+        parser.add_argument("--clear", action="store_true",
+                            help="delete the catalog previously generated with --prefix first")
+
+    def handle(self, *args, **opts):
+        if opts["clear"]:
+            started = time.perf_counter()
+            n = synthetic.clear(opts["prefix"])
+            self.stdout.write(f"removed {n} synthetic rooms ({time.perf_counter() - started:.1f}s)")
+        if not opts["buildings_per_campus"]:
+            return
+
+        started = time.perf_counter()
+        counts = synthetic.generate(
+            buildings_per_campus=opts["buildings_per_campus"],
+            rooms_per_building=opts["rooms_per_building"],
+            photos_per_room=opts["photos_per_room"],
+            panoramas_per_room=opts["panoramas_per_room"],
+            resources_per_building=opts["resources_per_building"],
+            campuses=opts["campus"],
+            prefix=opts["prefix"],
+            seed=opts["seed"],
+            images=not opts["no_images"],
+        )
+        summary = ", ".join(f"{v} {k}" for k, v in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary} ({time.perf_counter() - started:.1f}s)"))
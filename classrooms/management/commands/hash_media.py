@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from classrooms.storage import rehash_media
+
+
+class Command(BaseCommand):
+    help = ("Move uploaded images to content-addressed names (cas/<xx>/<sha256>.<ext>), "
+            "storing duplicates once, and report the bytes reclaimed")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="hash and report without writing")
+        parser.add_argument("--delete-originals", action="store_true",
+                            help="remove the old files once the rows point at their blobs")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def _progress(self, model, stats):
+        self.stderr.write(f"  {model._meta.label:<28} {stats.rows:>7} rows  {stats.files:>7} files")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        if opts["dry_run"] and opts["delete_originals"]:
+            raise CommandError("--dry-run and --delete-originals are mutually exclusive")
+        stats = rehash_media(
+            dry_run=opts["dry_run"], delete_originals=opts["delete_originals"],
+            batch_size=opts["batch_size"],
+            progress=self._progress if opts["verbosity"] >= 2 else None,
+        )
+        if stats.missing:
+            self.stderr.write(self.style.WARNING(f"{stats.missing} referenced files are missing; left as they are"))
+        verb = "Would rewrite" if opts["dry_run"] else "Rewrote"
+        reclaimed = filesizeformat(stats.reclaimed)
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats.rows} rows: {stats.files} files ({filesizeformat(stats.bytes_before)}) "
+            f"-> {filesizeformat(stats.bytes_stored)} of new blobs; "
+            + (f"{reclaimed} reclaimed, {stats.deleted} originals deleted" if opts["delete_originals"]
+               else f"{reclaimed} reclaimable with --delete-originals")
+        ))
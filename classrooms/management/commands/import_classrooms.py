@@ -1,19 +1,50 @@
-import json, pathlib
-from django.core.management.base import BaseCommand
-from classrooms.services import upsert_classroom_payload
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from classrooms.services import BATCH_SIZE, PRUNE_MODES, import_classrooms, iter_records
+
 
 class Command(BaseCommand):
-    help = "Import classrooms JSON (idempotent upsert)"
+    help = ("Import classrooms from JSON ({\"classrooms\": [...]} or [...]) or JSON Lines, "
+            "optionally gzipped (idempotent upsert on external_id, streamed in batches)")
 
     def add_arguments(self, parser):
         parser.add_argument("--path", required=True)
-        
+        parser.add_argument("--format", choices=("json", "jsonl"),
+                            help="default: from the file extension (.jsonl/.ndjson, optionally .gz)")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="validate and count, then roll everything back")
+        parser.add_argument("--no-create-buildings", action="store_true",
+                            help="reject rooms whose building does not exist yet")
+        parser.add_argument("--prune", choices=PRUNE_MODES,
+                            help="treat the file as a full snapshot: unpublish or delete rooms missing from it")
+
+    def _progress(self, stats):
+        self.stderr.write(f"  {stats.read:>9} read  {stats.inserted:>9} inserted  "
+                          f"{stats.updated:>9} updated  {stats.unchanged:>9} unchanged  "
+                          f"{stats.skipped:>6} skipped  ({stats.rate:,.0f}/s)")
+
     def handle(self, *args, **opts):
-        data = json.loads(pathlib.Path(opts["path"]).read_text())
-        n = 0
-        with transaction.atomic():
-            for item in data.get("classrooms", []):
-                upsert_classroom_payload(item)
-                n += 1
-        self.stdout.write(self.style.SUCCESS(f"Upserted {n} classrooms"))
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        try:
+            stats = import_classrooms(
+                iter_records(opts["path"], fmt=opts["format"]),
+                batch_size=opts["batch_size"],
+                dry_run=opts["dry_run"],
+                create_buildings=not opts["no_create_buildings"],
+                prune=opts["prune"],
+                progress=self._progress if opts["verbosity"] >= 1 else None,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"cannot read {opts['path']}: {exc}")
+
+        for err in stats.errors:
+            self.stderr.write(self.style.WARNING(err))
+        prefix = "[dry run] would have synced" if opts["dry_run"] else "Synced"
+        removed = "deleted" if opts["prune"] == "delete" else "unpublished"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {stats.read} classrooms: {stats.inserted} inserted, {stats.updated} updated, "
+            f"{stats.unchanged} unchanged, {stats.removed} {removed}, {stats.skipped} skipped, "
+            f"{stats.buildings_created} new buildings in {stats.elapsed:.1f}s"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from classrooms import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from buildings, rooms and resources"
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            n = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {n} entries"))
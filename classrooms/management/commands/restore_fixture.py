@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import IntegrityError
+
+from classrooms.restore import BATCH_SIZE, restore
+
+
+class Command(BaseCommand):
+    help = ("Restore dumpdata JSON snapshots (.json or .json.gz, UTF-8 or UTF-16) with "
+            "multi-row inserts in dependency order; a much faster loaddata for big fixtures")
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", nargs="+", help="paths to dumpdata JSON files")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("-e", "--exclude", action="append", default=[],
+                            help="app_label or app_label.Model to skip (repeatable)")
+        parser.add_argument("--database", default="default")
+
+    def _progress(self, label, stats):
+        self.stderr.write(f"  {stats.total:>9} rows  {label:<28} ({stats.rate:,.0f}/s)")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        try:
+            stats = restore(
+                opts["fixtures"],
+                batch_size=opts["batch_size"],
+                exclude=opts["exclude"],
+                using=opts["database"],
+                progress=self._progress if opts["verbosity"] >= 2 else None,
+            )
+        except LookupError as exc:
+            raise CommandError(f"unknown model in --exclude: {exc}")
+        except (OSError, ValueError, DeserializationError, IntegrityError) as exc:
+            raise CommandError(f"restore failed, nothing was written: {exc}")
+
+        if opts["verbosity"] >= 1:
+            for label, n in sorted(stats.counts.items()):
+                self.stdout.write(f"  {label:<32} {n:>9}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {stats.total} objects from {len(opts['fixtures'])} file(s) "
+            f"in {stats.elapsed:.1f}s ({stats.rate:,.0f} rows/s), {stats.skipped} excluded"
+        ))
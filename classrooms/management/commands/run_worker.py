@@ -0,0 +1,37 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from classrooms import jobs
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs (renditions, panorama tiles, cache warming) "
+            "from the database; no broker needed")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=1, help="number of workers (default 1)")
+        parser.add_argument("--mode", choices=("threads", "processes"), default="threads",
+                            help="processes for CPU-bound work such as tiling large panoramas")
+        parser.add_argument("--burst", action="store_true", help="exit once no job is due")
+        parser.add_argument("--poll", type=float, default=jobs.POLL_SECONDS,
+                            help="seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **opts):
+        if opts["concurrency"] < 1:
+            raise CommandError("--concurrency must be positive")
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stderr.write("Stopping after the current job(s)...")
+            stop.set()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, shutdown)
+
+        if opts["verbosity"] >= 1 and not opts["burst"]:
+            self.stdout.write(f"Worker {jobs.worker_name()} running {opts['concurrency']} "
+                              f"{opts['mode']}; Ctrl-C to stop")
+        done, failed = jobs.run(opts["concurrency"], opts["mode"], burst=opts["burst"],
+                                poll=opts["poll"], stop=stop)
+        self.stdout.write(self.style.SUCCESS(f"Ran {done + failed} jobs, {failed} failed"))
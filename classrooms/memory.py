@@ -0,0 +1,274 @@
+# classrooms/memory.py
+"""
+The published catalog held in process memory.
+
+Buildings, published rooms and their photos, panoramas and resources fit in
+a few megabytes, yet every page view read them from the database again.
+``build()`` loads all of it in nine queries into slotted records (no model
+instances, no per-object ``__dict__``):
+
+    Catalog.buildings                 BuildingRecord, ordered by name
+    Catalog.by_slug[slug]             BuildingRecord: .rooms, .resources
+    Catalog.rooms[(slug, room)]       RoomRecord: .photos, .panoramas
+    Catalog.by_pk[pk]                 RoomRecord
+
+together with the change stamps the views hash into their ETags, so
+``memory_views.py`` answers the building index, room lists, room pages and
+the ``/classrooms/<pk>/`` redirect without a single query.  The records
+expose the attributes the templates, ``features`` and the ``{% picture %}``
+tag read from the models; nothing else is loaded.
+
+Each worker keeps one catalog, stamped with the ``memory`` scope version
+(``cache.memory_scope()``), which every ``cache.bump()`` replaces.  The
+version is one cache read per request; when it moved, the next request
+builds a new catalog from the primary and swaps it in.  Meanwhile other
+threads keep serving the previous one, although the version stamps have
+already moved; ``memory_views`` check the version again before a page
+goes into the page cache and keep such pages out.  Catalogs are never
+modified once built.  The stamp has to live in a cache every process
+shares (Redis): with LocMem a worker never sees another's bumps, which the
+``classrooms.E001`` system check refuses.
+"""
+import contextvars
+import logging
+import threading
+import time
+from functools import wraps
+
+from . import features, views
+from .cache import get_versions, memory_scope
+from .models import Building, BuildingResource, Classroom, ClassroomPhoto, Panorama
+from .replicas import primary
+from .storage import content_addressed_storage
+
+logger = logging.getLogger(__name__)
+
+CAMPUS_LABELS = dict(Building.Campus.choices)
+
+
+# --- records ---------------------------------------------------------------------------
+class FileRecord:
+    """The parts of a FieldFile the templates use."""
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def url(self):
+        return content_addressed_storage.url(self.name)
+
+
+class Rows(tuple):
+    """A tuple that also answers ``.all()``, like the related managers it replaces."""
+    __slots__ = ()
+
+    def all(self):
+        return self
+
+
+NO_ROWS = Rows()
+
+
+class _Record:
+    __slots__ = ()
+    columns = ()  # loaded with values_list(), in this order
+    files = ()  # image fields: FileRecord or None; their renditions/placeholders entries are kept
+
+    def __init_subclass__(cls):
+        cls._kinds = tuple("file" if c in cls.files else "json" if c in ("renditions", "placeholders") else None
+                           for c in cls.columns)
+
+    @classmethod
+    def load(cls, row, shared):
+        # equal values are stored once: content-addressed images recur across
+        # rooms, and a room's card entries are copies of its photo's
+        obj = cls.__new__(cls)
+        for name, kind, value in zip(cls.columns, cls._kinds, row):
+            if kind is None:
+                if value.__class__ is list:  # MultiSelectField values
+                    value = shared.setdefault(("list", *value), value)
+            elif kind == "file":
+                value = shared.setdefault(("file", value), FileRecord(value)) if value else None
+            elif value:
+                value = _shared({f: _shared(value[f], shared) for f in cls.files if f in value}, shared)
+            else:
+                value = None
+            setattr(obj, name, value)
+        return obj
+
+
+def _shared(value, shared):
+    if not value:
+        return None
+    return shared.setdefault(("json", repr(value)), value)
+
+
+class BuildingRecord(_Record):
+    columns = ("pk", "name", "slug", "campus", "updated_at", "preview_file", "renditions", "placeholders",
+               "tech_contact_name", "tech_contact", "tech_contact_email", "more_info_url")
+    files = ("preview_file",)
+    __slots__ = (*columns, "published_room_count", "list_stamps", "rooms", "resources")
+
+    def __str__(self):
+        return self.name
+
+    def get_campus_display(self):
+        return CAMPUS_LABELS.get(self.campus, self.campus)
+
+
+class RoomRecord(_Record):
+    columns = tuple(dict.fromkeys((
+        "pk", "building_id", "room_number", "capacity", "updated_at", "card_image", "renditions",
+        "placeholders", "seating_type", "book_url", "feature_mask", *(f.name for f in features.FEATURES),
+    )))
+    files = ("card_image",)
+    __slots__ = (*columns, "building", "photos", "panoramas")
+
+    get_wireless_presentation_display = Classroom.get_wireless_presentation_display
+
+    def __str__(self):
+        return f"{self.building.name} {self.room_number}"
+
+
+class PhotoRecord(_Record):
+    columns = ("classroom_id", "image_file", "renditions", "placeholders", "caption")
+    files = ("image_file",)
+    __slots__ = columns
+
+
+class PanoramaRecord(_Record):
+    columns = ("classroom_id", "id", "image_file", "preview_file", "tiles", "yaw", "pitch", "hfov")
+    files = ("image_file", "preview_file")
+    __slots__ = columns
+
+
+class ResourceRecord(_Record):
+    columns = ("building_id", "kind", "title", "url", "thumbnail_url", "summary", "created_at")
+    __slots__ = columns
+
+    Kind = BuildingResource.Kind
+    youtube_id = BuildingResource.youtube_id
+    display_thumbnail = BuildingResource.display_thumbnail
+
+
+class Catalog:
+    __slots__ = ("version", "buildings", "by_slug", "rooms", "by_pk", "index_stamps")
+
+    def __init__(self, version, buildings, index_stamps):
+        self.version = version
+        self.buildings = tuple(buildings)
+        self.by_slug = {b.slug: b for b in self.buildings}
+        self.rooms = {(b.slug, r.room_number): r for b in self.buildings for r in b.rooms}
+        self.by_pk = {r.pk: r for r in self.rooms.values()}
+        self.index_stamps = index_stamps
+
+    def list_stamps(self, slug):
+        building = self.by_slug.get(slug)
+        return building and building.list_stamps
+
+    def detail_stamps(self, slug, room_number):
+        room = self.rooms.get((slug, room_number))
+        return room and (room.updated_at, room.building.updated_at)
+
+
+# --- building ------------------------------------------------------------------------
+def _grouped(records, key):
+    groups = {}
+    for record in records:
+        groups.setdefault(getattr(record, key), []).append(record)
+    return {k: Rows(v) for k, v in groups.items()}
+
+
+def _rows(qs, record, shared):
+    return [record.load(row, shared) for row in qs.values_list(*record.columns).iterator(chunk_size=2000)]
+
+
+def build(version=None):
+    """Load the published catalog from the primary; returns a Catalog."""
+    started = time.perf_counter()
+    shared = {}
+    with primary():  # a replica may lag behind the version this catalog is stamped with
+        index_stamps = views._index_stamps()
+        list_stamps = views._list_stamps_by_building()
+        buildings = _rows(Building.objects.order_by("name"), BuildingRecord, shared)
+        rooms = _rows(Classroom.objects.filter(is_published=True).order_by("building_id", "room_number"),
+                      RoomRecord, shared)
+        photos = _grouped(_rows(ClassroomPhoto.objects.filter(classroom__is_published=True)
+                                .order_by("classroom_id", "order", "id"), PhotoRecord, shared), "classroom_id")
+        panoramas = _grouped(_rows(Panorama.objects.filter(classroom__is_published=True)
+                                   .order_by("classroom_id", "order", "id"), PanoramaRecord, shared), "classroom_id")
+        resources = _grouped(_rows(BuildingResource.objects.filter(published=True)
+                                   .order_by("building_id", "order", "-created_at"), ResourceRecord, shared),
+                             "building_id")
+
+    by_pk = {b.pk: b for b in buildings}
+    for room in rooms:
+        room.building = by_pk.get(room.building_id)
+        room.photos = photos.get(room.pk, NO_ROWS)
+        room.panoramas = panoramas.get(room.pk, NO_ROWS)
+    rooms_of = _grouped((r for r in rooms if r.building is not None), "building_id")
+    for b in buildings:
+        b.rooms = rooms_of.get(b.pk, NO_ROWS)
+        b.resources = resources.get(b.pk, NO_ROWS)
+        b.list_stamps = list_stamps.get(b.slug)
+        b.published_room_count = len(b.rooms)
+
+    catalog = Catalog(version, buildings, index_stamps)
+    logger.info("in-memory catalog %s: %d buildings, %d rooms in %.3fs",
+                version, len(catalog.buildings), len(catalog.rooms), time.perf_counter() - started)
+    return catalog
+
+
+# --- the current catalog ------------------------------------------------------------
+_catalog = None
+_rebuilding = threading.Lock()
+_request_catalog = contextvars.ContextVar("cphc_catalog", default=None)
+
+
+def current():
+    """This worker's catalog, rebuilt first if the memory scope's version moved."""
+    version = get_versions(memory_scope())[0]
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    # one thread rebuilds; the others keep answering from the previous catalog
+    if not _rebuilding.acquire(blocking=catalog is None):
+        return catalog
+    try:
+        return _swap(version)
+    finally:
+        _rebuilding.release()
+
+
+def _swap(version):
+    global _catalog
+    if _catalog is None or _catalog.version != version:
+        _catalog = build(version)
+    return _catalog
+
+
+def catalog():
+    """The catalog pinned to the current request by ``@pinned``, else ``current()``."""
+    return _request_catalog.get() or current()
+
+
+def pinned(view):
+    """Serve one request (ETag, cache key and page) from one catalog, checking its version once."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        token = _request_catalog.set(current())
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _request_catalog.reset(token)
+    return wrapped
+
+
+def clear():
+    """Drop this worker's catalog (tests, benchmarks)."""
+    global _catalog
+    _catalog = None
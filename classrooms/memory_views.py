@@ -0,0 +1,87 @@
+# classrooms/memory_views.py
+"""
+The public catalog pages served from the in-process catalog (``memory.py``).
+
+Same URLs, templates, page cache and ETags as ``views.py``, but the rows,
+the filtering and sorting of room lists and the ETag stamps all come from
+memory: in the steady state a request costs the cache reads for the
+version stamps and no SQL at all.  The views are not ``@read_only``: there
+is nothing to read from a replica, and without a per-request transaction
+they never open a database connection.
+
+``core/urls.py`` routes the public pages here when ``settings.CATALOG_IN_MEMORY``
+is on.  They are synchronous; under ASGI Django runs them in a thread,
+which no longer waits on the database.
+"""
+from functools import wraps
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+from . import views
+from .cache import (
+    building_scope, catalog_scope, conditional_page, get_versions, memory_scope, room_scope, versioned_cache_page,
+)
+from .filters import RoomFilters
+from .memory import catalog, pinned
+
+
+def _fresh_only(view):
+    # The page-cache key holds the stamps read just now, but the pinned
+    # catalog may be older: another thread is still rebuilding, or a bump
+    # landed after the request pinned it.  Such a page is served, not stored.
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if catalog().version != get_versions(memory_scope())[0]:
+            patch_cache_control(response, no_store=True)
+        return response
+    return wrapped
+
+
+def _found(record):
+    if record is None:
+        raise Http404("No such page in the catalog.")
+    return record
+
+
+@transaction.non_atomic_requests
+@pinned
+@conditional_page(lambda: catalog().index_stamps)
+@versioned_cache_page(lambda: [catalog_scope()])
+@_fresh_only
+def buildings_index(request):
+    return render(request, "classrooms/buildings.html", {"buildings": catalog().buildings})
+
+
+@transaction.non_atomic_requests
+@pinned
+@conditional_page(lambda slug: catalog().list_stamps(slug))
+@versioned_cache_page(lambda slug: [building_scope(slug)], variant=views._list_variant)
+@_fresh_only
+def classroom_list_by_building(request, slug):
+    building = _found(catalog().by_slug.get(slug))
+    filters = RoomFilters.from_query(request.GET)
+    page = Paginator(filters.select(building.rooms), views.ROOMS_PER_PAGE).get_page(views._list_page(request))
+    return views._render_list(request, building, filters, page, building.resources)
+
+
+@transaction.non_atomic_requests
+@pinned
+@conditional_page(lambda slug, room_number: catalog().detail_stamps(slug, room_number))
+@versioned_cache_page(lambda slug, room_number: [room_scope(slug, room_number)])
+@_fresh_only
+def classroom_detail(request, slug, room_number):
+    room = _found(catalog().rooms.get((slug, room_number)))
+    return render(request, "classrooms/detail.html", views._detail_context(room))
+
+
+@transaction.non_atomic_requests
+@pinned
+def classroom_detail_pk(request, pk):
+    room = _found(catalog().by_pk.get(pk))
+    return redirect(reverse("classroom_detail", args=[room.building.slug, room.room_number]), permanent=True)
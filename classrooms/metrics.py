@@ -0,0 +1,279 @@
+# classrooms/metrics.py
+"""
+Per-request performance instrumentation.
+
+``MetricsMiddleware`` measures, for every request, the SQL query count and
+time, template render time, page-cache hits/misses and total latency.  It
+reports them to the client as a ``Server-Timing`` header and aggregates them
+per URL name (``classroom_detail``, ``classroom_list_by_building``, ...)
+into histograms served at ``/metrics`` in Prometheus text format.
+
+Gunicorn runs several worker processes, so each process periodically dumps
+its totals to ``METRICS_DIR/<pid>-<start>.json`` and ``/metrics`` sums every
+file it finds there.  Without ``METRICS_DIR`` only the answering process's
+numbers are reported (fine for runserver).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    # name: (help, buckets)
+    "cphc_request_duration_seconds": ("Total time spent in Django per request", LATENCY_BUCKETS),
+    "cphc_db_duration_seconds": ("SQL time per request", LATENCY_BUCKETS),
+    "cphc_db_queries": ("SQL queries per request", QUERY_BUCKETS),
+    "cphc_template_duration_seconds": ("Template render time per request", LATENCY_BUCKETS),
+}
+COUNTERS = {
+    "cphc_requests_total": "Requests by view and status code",
+    "cphc_page_cache_total": "Page cache lookups by view and result",
+}
+
+
+# --- per-request collection --------------------------------------------------
+class RequestStats:
+    __slots__ = ("queries", "sql_seconds", "template_seconds", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_current = contextvars.ContextVar("cphc_request_stats", default=None)
+
+
+def record_cache(hit):
+    """Called by the page cache; a no-op outside an instrumented request."""
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def _install_sql_wrapper(sender, connection, **kwargs):
+    # On every connection as it opens, in whichever thread: under ASGI the
+    # ORM runs in sync_to_async's thread, not on the event loop where the
+    # middleware runs.  The wrapper finds its request through _current.
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+def _install_template_timer():
+    # Views call render() directly, so there is no hook between "context
+    # built" and "HTML produced"; time the backend's Template.render instead.
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "_cphc_timed", False):
+        return
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        stats = _current.get()
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            if stats is not None:
+                stats.template_seconds += time.perf_counter() - started
+
+    render._cphc_timed = True
+    Template.render = render
+
+
+# --- process-wide aggregation -------------------------------------------------
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}   # (name, view) -> [bucket counts..., sum, count]
+        self.counters = {}     # (name, (label pairs)) -> value
+        self.started = int(time.time())
+        self.last_flush = 0.0
+
+    def observe(self, name, view, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            h = self.histograms.setdefault((name, view), [0] * len(buckets) + [0.0, 0])
+            for i, le in enumerate(buckets):
+                if value <= le:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def dump(self):
+        with self.lock:
+            return {
+                "histograms": [[n, v, list(h)] for (n, v), h in self.histograms.items()],
+                "counters": [[n, list(map(list, labels)), c] for (n, labels), c in self.counters.items()],
+            }
+
+    # multi-process: one JSON file per worker, summed at scrape time
+    def path(self):
+        return Path(settings.METRICS_DIR) / f"{os.getpid()}-{self.started}.json"
+
+    def flush(self, force=False):
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_SECONDS:
+            return
+        self.last_flush = now
+        path = self.path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.dump()))
+        os.replace(tmp, path)  # atomic: a scrape never sees half a file
+
+
+registry = Registry()
+
+
+def _merged_snapshots():
+    if not settings.METRICS_DIR:
+        return [registry.dump()]
+    registry.flush(force=True)
+    snapshots = []
+    for path in Path(settings.METRICS_DIR).glob("*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # worker replaced it mid-read; next scrape picks it up
+    return snapshots
+
+
+def _labels(pairs):
+    return ",".join(f'{k}="{v}"' for k, v in pairs)
+
+
+def render_prometheus():
+    histograms, counters = {}, {}
+    for snap in _merged_snapshots():
+        for name, view, h in snap["histograms"]:
+            acc = histograms.setdefault((name, view), [0] * len(h))
+            for i, v in enumerate(h):
+                acc[i] += v
+        for name, labels, c in snap["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + c
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (n, view), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            for le, count in zip(buckets, h):
+                lines.append(f'{name}_bucket{{view="{view}",le="{le}"}} {count}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {h[-1]}')
+            lines.append(f'{name}_sum{{view="{view}"}} {h[-2]:.6f}')
+            lines.append(f'{name}_count{{view="{view}"}} {h[-1]}')
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (n, labels), c in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{{{_labels(labels)}}} {c}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --- middleware -------------------------------------------------------------------
+@contextmanager
+def _measuring():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class MetricsMiddleware:
+    # async-capable so an ASGI stack stays async end to end; the stats live in
+    # a context variable, which the async ORM's worker thread inherits
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        _install_template_timer()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with _measuring() as stats:
+            response = self.get_response(request)
+        return self._report(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with _measuring() as stats:
+            response = await self.get_response(request)
+        return self._report(request, response, stats, time.perf_counter() - started)
+
+    def _report(self, request, response, stats, total):
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else "unmatched"
+        registry.observe("cphc_request_duration_seconds", view, total)
+        registry.observe("cphc_db_duration_seconds", view, stats.sql_seconds)
+        registry.observe("cphc_db_queries", view, stats.queries)
+        registry.observe("cphc_template_duration_seconds", view, stats.template_seconds)
+        registry.inc("cphc_requests_total", {"view": view, "status": str(response.status_code)})
+        if stats.cache_hits:
+            registry.inc("cphc_page_cache_total", {"view": view, "result": "hit"}, stats.cache_hits)
+        if stats.cache_misses:
+            registry.inc("cphc_page_cache_total", {"view": view, "result": "miss"}, stats.cache_misses)
+        registry.flush()
+
+        timing = [
+            f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries"',
+            f"tpl;dur={stats.template_seconds * 1000:.1f}",
+        ]
+        if stats.cache_hits or stats.cache_misses:
+            timing.append(f'cache;desc="{stats.cache_hits} hit/{stats.cache_misses} miss"')
+        timing.append(f"total;dur={total * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(timing)
+        return response
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0025_classroom_lecd'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Last Updated'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='buildingresource',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
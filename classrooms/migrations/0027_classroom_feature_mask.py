@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+# frozen copy of classrooms.models.FEATURE_FLAGS at the time of this migration
+FEATURE_FLAGS = (
+    "windows", "stage", "multilevel_podium", "privacy_panel", "env_light",
+    "assistive_listening_device", "hdesk", "door_windows",
+    "voice_amplification", "podium_microhpone", "handheld_microphone",
+    "ceiling_microphone", "lavalier_microphone",
+    "web_conference_camera", "ceiling_camera", "document_camera",
+    "touchscreen_presentation", "lecd",
+    "interactive_display", "instructor_monitor", "class_capture",
+)
+
+
+def backfill_feature_mask(apps, schema_editor):
+    Classroom = apps.get_model("classrooms", "Classroom")
+    batch = []
+    for row in Classroom.objects.only("id", *FEATURE_FLAGS).iterator(chunk_size=2000):
+        row.feature_mask = sum(1 << i for i, f in enumerate(FEATURE_FLAGS) if getattr(row, f))
+        batch.append(row)
+        if len(batch) >= 2000:
+            Classroom.objects.bulk_update(batch, ["feature_mask"])
+            batch = []
+    if batch:
+        Classroom.objects.bulk_update(batch, ["feature_mask"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0026_building_updated_at_buildingresource_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='feature_mask',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='classroom',
+            index=models.Index(fields=['is_published', 'feature_mask'], name='classrooms__is_publ_51d402_idx'),
+        ),
+        migrations.RunPython(backfill_feature_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+FTS_TABLE = "classrooms_searchentry_fts"
+PG_DOCUMENT = "to_tsvector('simple', title || ' ' || body)"
+
+SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body, content='classrooms_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    f"""CREATE TRIGGER classrooms_searchentry_ai AFTER INSERT ON classrooms_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER classrooms_searchentry_ad AFTER DELETE ON classrooms_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER classrooms_searchentry_au AFTER UPDATE ON classrooms_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS classrooms_searchentry_ai",
+    "DROP TRIGGER IF EXISTS classrooms_searchentry_ad",
+    "DROP TRIGGER IF EXISTS classrooms_searchentry_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+PG_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX classrooms_searchentry_tsv ON classrooms_searchentry USING gin ({PG_DOCUMENT})",
+    "CREATE INDEX classrooms_searchentry_trgm ON classrooms_searchentry USING gin (title gin_trgm_ops)",
+]
+PG_TEARDOWN = [
+    "DROP INDEX IF EXISTS classrooms_searchentry_tsv",
+    "DROP INDEX IF EXISTS classrooms_searchentry_trgm",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_SETUP)
+    elif vendor == "postgresql":
+        _run(schema_editor, PG_SETUP)
+
+    # backfill (same text layout as classrooms.search.index_*)
+    Building = apps.get_model("classrooms", "Building")
+    SearchEntry = apps.get_model("classrooms", "SearchEntry")
+    entries = []
+    for b in Building.objects.prefetch_related("classrooms", "resources"):
+        entries.append(SearchEntry(kind="building", object_id=b.pk, title=b.name,
+                                   body=b.description or "", url=f"/buildings/{b.slug}/"))
+        for c in b.classrooms.all():
+            entries.append(SearchEntry(
+                kind="room", object_id=c.pk, title=f"{b.name} {c.room_number}",
+                body=" ".join(filter(None, [c.summary, c.room_type])),
+                url=f"/buildings/{b.slug}/{c.room_number}/", published=c.is_published))
+        for r in b.resources.all():
+            entries.append(SearchEntry(
+                kind="resource", object_id=r.pk, title=r.title,
+                body=" ".join(filter(None, [r.summary, b.name])), url=r.url, published=r.published))
+    SearchEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_TEARDOWN)
+    elif vendor == "postgresql":
+        _run(schema_editor, PG_TEARDOWN)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0027_classroom_feature_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('building', 'Building'), ('room', 'Classroom'), ('resource', 'Resource')], max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('url', models.CharField(blank=True, max_length=600)),
+                ('published', models.BooleanField(default=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='uniq_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0028_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0029_classroom_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroom',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroomphoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='panorama',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
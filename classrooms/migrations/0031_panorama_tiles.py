@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0030_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='panorama',
+            name='tiles',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
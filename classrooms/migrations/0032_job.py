@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0031_panorama_tiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=200)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('key', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='classrooms__status_53776c_idx'), models.Index(fields=['key', 'status'], name='classrooms__key_e0f7e3_idx')],
+            },
+        ),
+    ]
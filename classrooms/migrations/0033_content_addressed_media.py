@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:18
+
+import classrooms.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0032_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='building',
+            name='preview_file',
+            field=models.ImageField(blank=True, null=True, storage=classrooms.storage.content_addressed, upload_to='buildings/previews/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='classroom',
+            name='preview_image_file',
+            field=models.ImageField(blank=True, null=True, storage=classrooms.storage.content_addressed, upload_to='classrooms/previews/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='classroomphoto',
+            name='image_file',
+            field=models.ImageField(blank=True, null=True, storage=classrooms.storage.content_addressed, upload_to='photos/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='panorama',
+            name='image_file',
+            field=models.ImageField(blank=True, null=True, storage=classrooms.storage.content_addressed, upload_to='panoramas/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='panorama',
+            name='preview_file',
+            field=models.ImageField(blank=True, null=True, storage=classrooms.storage.content_addressed, upload_to='panoramas/previews/%Y/%m/%d/'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0033_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroom',
+            name='placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroomphoto',
+            name='placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='panorama',
+            name='placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
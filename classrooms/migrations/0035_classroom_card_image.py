@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:23
+
+import classrooms.storage
+from django.db import migrations, models
+
+# frozen copy of classrooms.cards.rebuild() at the time of this migration
+
+
+def backfill_card_image(apps, schema_editor):
+    Classroom = apps.get_model("classrooms", "Classroom")
+    batch = []
+    rooms = Classroom.objects.prefetch_related("photos", "panoramas").order_by("pk")
+    for room in rooms.iterator(chunk_size=500):
+        candidates = [(room, "preview_image_file")]
+        candidates += [(p, "image_file") for p in sorted(room.photos.all(), key=lambda p: (p.order, p.pk))]
+        candidates += [(p, name) for p in sorted(room.panoramas.all(), key=lambda p: (p.order, p.pk))
+                       for name in ("preview_file", "image_file")]
+        for obj, name in candidates:
+            fieldfile = getattr(obj, name)
+            if fieldfile:
+                room.card_image = fieldfile.name
+                for attr in ("renditions", "placeholders"):
+                    entry = (getattr(obj, attr) or {}).get(name)
+                    if entry:
+                        getattr(room, attr)["card_image"] = entry
+                batch.append(room)
+                break
+        if len(batch) >= 500:
+            Classroom.objects.bulk_update(batch, ["card_image", "renditions", "placeholders"])
+            batch = []
+    if batch:
+        Classroom.objects.bulk_update(batch, ["card_image", "renditions", "placeholders"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrooms', '0034_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='card_image',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=classrooms.storage.content_addressed, upload_to=''),
+        ),
+        migrations.RunPython(backfill_card_image, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,34 @@
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import Exact
 from django.utils.text import slugify
+from django.utils import timezone
 from multiselectfield import MultiSelectField
 
+from .storage import content_addressed
+
+
+# Yes/no room features packed into Classroom.feature_mask, one bit each.
+# Bit positions are persisted: only ever APPEND to this tuple (and backfill).
+FEATURE_FLAGS = (
+    "windows", "stage", "multilevel_podium", "privacy_panel", "env_light",
+    "assistive_listening_device", "hdesk", "door_windows",
+    "voice_amplification", "podium_microhpone", "handheld_microphone",
+    "ceiling_microphone", "lavalier_microphone",
+    "web_conference_camera", "ceiling_camera", "document_camera",
+    "touchscreen_presentation", "lecd",
+    "interactive_display", "instructor_monitor", "class_capture",
+)
+FEATURE_BITS = {name: 1 << i for i, name in enumerate(FEATURE_FLAGS)}
+
+
+def feature_mask_for(*names):
+    """Bitmask for the given feature names; unknown names raise KeyError."""
+    mask = 0
+    for name in names:
+        mask |= FEATURE_BITS[name]
+    return mask
+
 class Building(models.Model):
     class Campus(models.TextChoices):
         MAIN = "MAIN", "Main Campus"
@@ -13,13 +40,17 @@ class Building(models.Model):
     name = models.CharField(max_length=120, unique=True)
     slug = models.SlugField(max_length=140, unique=True, blank=True)
     campus = models.CharField(max_length=32, choices=Campus.choices, default=Campus.MAIN)
-    preview_file = models.ImageField(upload_to="buildings/previews/%Y/%m/%d/", blank=True, null=True)
+    preview_file = models.ImageField(upload_to="buildings/previews/%Y/%m/%d/", storage=content_addressed, blank=True, null=True)
+    # resized WebP/JPEG copies of the image fields, see classrooms/renditions.py
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # intrinsic size + inline blur-up placeholder, see classrooms/placeholders.py
+    placeholders = models.JSONField(default=dict, blank=True, editable=False)
     tech_contact_name = models.CharField(max_length=120, blank = True)
     tech_contact = models.CharField(max_length=50, blank=True)
     tech_contact_email = models.CharField(max_length=120, blank=True)
     description = models.TextField(blank=True)
     more_info_url = models.CharField(max_length=500, blank=True)
-
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Last Updated")
 
 
     class Meta:
@@ -37,6 +68,23 @@ class Building(models.Model):
         return self.classrooms.filter(is_published=True).count()
 
 
+class ClassroomQuerySet(models.QuerySet):
+    def with_features(self, *names):
+        """
+        Rooms that have *all* of ``names``, as one bitwise predicate:
+        ``feature_mask & m = m`` instead of one WHERE column per feature.
+        """
+        mask = feature_mask_for(*names)
+        if not mask:
+            return self
+        return self.filter(Exact(F("feature_mask").bitand(mask), mask))
+
+    def update_feature_masks(self):
+        """Recompute feature_mask from the stored flag columns, in one UPDATE."""
+        bits = (Case(When(**{name: True}, then=Value(bit)), default=Value(0)) for name, bit in FEATURE_BITS.items())
+        return self.update(feature_mask=sum(bits, Value(0)))
+
+
 class Classroom(models.Model):
     
     WIRELESS_CHOICES = [
@@ -60,7 +108,12 @@ class Classroom(models.Model):
     
     
       # NEW: card preview image (optional)
-    preview_image_file = models.ImageField(upload_to="classrooms/previews/%Y/%m/%d/", blank=True, null=True)
+    preview_image_file = models.ImageField(upload_to="classrooms/previews/%Y/%m/%d/", storage=content_addressed, blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    placeholders = models.JSONField(default=dict, blank=True, editable=False)
+    # the building-list tile image: the preview, else the first photo or panorama;
+    # kept current by classrooms/cards.py (its entries live in the two manifests above)
+    card_image = models.ImageField(storage=content_addressed, blank=True, null=True, editable=False)
     room_type = models.CharField(max_length=10, blank=True, verbose_name = "Room type")
     capacity = models.PositiveIntegerField(default=0, verbose_name="Capacity")
     summary = models.CharField(max_length=200, blank=True, verbose_name="Summary")
@@ -123,10 +176,20 @@ class Classroom(models.Model):
     projector_model = models.CharField(max_length=100, verbose_name = "Projector Model", blank=True)
     display_model = models.CharField(max_length =100, blank=True, verbose_name="Display Model and size")
 
+    # denormalized FEATURE_FLAGS, kept in sync by save()
+    feature_mask = models.PositiveBigIntegerField(default=0, editable=False)
+    # digest of the last imported payload (classrooms/services.py); any other
+    # save() clears it so the next sync rewrites the row
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    objects = ClassroomQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["building", "room_number"]),
             models.Index(fields=["is_published"]),
+            # covers with_features() scans without touching the wide row
+            models.Index(fields=["is_published", "feature_mask"]),
         ]
         constraints = [
             models.UniqueConstraint(fields=["building", "room_number"], name="uniq_building_room_fk")
@@ -134,13 +197,31 @@ class Classroom(models.Model):
 
     def __str__(self): return f"{self.building.name} {self.room_number}"
 
+    def compute_feature_mask(self):
+        return feature_mask_for(*(f for f in FEATURE_FLAGS if getattr(self, f)))
+
+    def save(self, *args, **kwargs):
+        self.feature_mask = self.compute_feature_mask()
+        self.content_hash = ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            extra = {"content_hash"}
+            if set(update_fields) & set(FEATURE_FLAGS):
+                extra.add("feature_mask")
+            kwargs["update_fields"] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
 
 class Panorama(models.Model):
     external_id = models.CharField(max_length=120, unique=True)
     classroom = models.ForeignKey(Classroom, related_name="panoramas", on_delete=models.CASCADE)
     name = models.CharField(max_length=120, blank=True)
-    image_file = models.ImageField(upload_to="panoramas/%Y/%m/%d/", blank=True, null=True)
-    preview_file = models.ImageField(upload_to="panoramas/previews/%Y/%m/%d/", blank=True, null=True)
+    image_file = models.ImageField(upload_to="panoramas/%Y/%m/%d/", storage=content_addressed, blank=True, null=True)
+    preview_file = models.ImageField(upload_to="panoramas/previews/%Y/%m/%d/", storage=content_addressed, blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    placeholders = models.JSONField(default=dict, blank=True, editable=False)
+    # Pannellum multires cube tiles cut from image_file, see classrooms/tiles.py
+    tiles = models.JSONField(default=dict, blank=True, editable=False)
 
     yaw = models.FloatField(default=0)
     pitch = models.FloatField(default=0)
@@ -154,7 +235,9 @@ class Panorama(models.Model):
 # models.py (just this change)
 class ClassroomPhoto(models.Model):
     classroom = models.ForeignKey(Classroom, related_name="photos", on_delete=models.CASCADE)
-    image_file = models.ImageField(upload_to="photos/%Y/%m/%d/", blank=True, null=True)
+    image_file = models.ImageField(upload_to="photos/%Y/%m/%d/", storage=content_addressed, blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    placeholders = models.JSONField(default=dict, blank=True, editable=False)
 
     caption = models.CharField(max_length=140, blank=True)
     order = models.PositiveIntegerField(default=0)
@@ -182,6 +265,7 @@ class BuildingResource(models.Model):
     published = models.BooleanField(default=True)
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["order", "-created_at"]
@@ -214,3 +298,64 @@ class BuildingResource(models.Model):
             # fall back to standard YT thumbnail if not provided
             return f"https://img.youtube.com/vi/{vid}/hqdefault.jpg"
         return ""  # let template show a neutral placeholder
+
+
+# --- Search index (kept in sync by classrooms/signals.py) ---------------------
+class SearchEntry(models.Model):
+    """
+    One searchable document per building, room or resource.  The text lives
+    here; the backend-specific index (SQLite FTS5 table or Postgres GIN
+    indexes) is built on top of this table, see classrooms/search.py.
+    """
+    class Kind(models.TextChoices):
+        BUILDING = "building", "Building"
+        ROOM = "room", "Classroom"
+        RESOURCE = "resource", "Resource"
+
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=600, blank=True)
+    published = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="uniq_search_entry")
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+
+# --- Background jobs (classrooms/jobs.py; run with `manage.py run_worker`) ------
+class Job(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    task = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # a pending job with the same key is not enqueued twice
+    key = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["key", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
@@ -0,0 +1,88 @@
+# classrooms/placeholders.py
+"""
+Low-quality image placeholders.
+
+Lazy tiles used to be an empty box until their image arrived.  For the
+images the catalog pages show first (building, room and panorama previews
+and room photos) a save also records the intrinsic size and a ~16 px WebP
+of the image, inlined as a data URI, in a ``placeholders`` JSON column
+keyed by field name:
+
+    {"preview_file": {"src": "cas/3f/3f9a...c1.jpg", "width": 3024, "height": 1701,
+                      "lqip": "data:image/webp;base64,UklGR..."}}
+
+``{% picture %}`` writes ``width``/``height`` and paints the placeholder as
+the image's background, so the page has its final layout, and something to
+look at, without an extra request.  Unlike renditions this runs inline on
+save: a JPEG decodes at 1/8 scale, so even a panorama preview costs a few
+milliseconds.  ``src`` ties an entry to its file as in ``renditions.py``;
+``manage.py build_placeholders`` backfills.
+"""
+import base64
+import io
+import logging
+
+from django.core.files.storage import default_storage
+
+from . import renditions
+from .models import Building, Classroom, ClassroomPhoto, Panorama
+
+logger = logging.getLogger(__name__)
+
+SIZE = 16          # longest side of the placeholder, px
+QUALITY = 40
+
+IMAGE_FIELDS = {
+    Building: ("preview_file",),
+    Classroom: ("preview_image_file",),
+    ClassroomPhoto: ("image_file",),
+    Panorama: ("preview_file",),
+}
+
+
+def build(source, storage=None):
+    """Size and placeholder of storage file ``source``; returns its entry."""
+    img, width, height = renditions.load(source, storage or default_storage, width=SIZE)
+    img.thumbnail((SIZE, SIZE))
+    buf = io.BytesIO()
+    img.save(buf, "WEBP", quality=QUALITY, method=6)
+    return {"src": source, "width": width, "height": height,
+            "lqip": "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")}
+
+
+def needs_refresh(instance):
+    current = instance.placeholders or {}
+    for name in IMAGE_FIELDS[type(instance)]:
+        fieldfile = getattr(instance, name)
+        if (not renditions.is_current(current.get(name), fieldfile)) if fieldfile else name in current:
+            return True
+    return False
+
+
+def refresh(instance, force=False):
+    """
+    Recompute stale entries on ``instance`` and store them with a plain
+    UPDATE.  Returns True if anything changed; unreadable images are logged
+    and skipped.
+    """
+    current = instance.placeholders or {}
+    fields = IMAGE_FIELDS[type(instance)]
+    # other keys are not ours (cards.py files the room's card entries here)
+    placeholders = {k: v for k, v in current.items() if k not in fields}
+    for name in fields:
+        fieldfile = getattr(instance, name)
+        if not fieldfile:
+            continue
+        entry = current.get(name)
+        if not force and renditions.is_current(entry, fieldfile):
+            placeholders[name] = entry
+            continue
+        try:
+            placeholders[name] = build(fieldfile.name)
+        except Exception:  # Pillow raises a zoo of types for corrupt files
+            logger.warning("cannot read %s", fieldfile.name, exc_info=True)
+    if placeholders == current:
+        return False
+    instance.placeholders = placeholders
+    type(instance)._base_manager.filter(pk=instance.pk).update(placeholders=placeholders)
+    return True
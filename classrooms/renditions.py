@@ -0,0 +1,152 @@
+# classrooms/renditions.py
+"""
+Responsive image renditions.
+
+Every image field on Building, Classroom, ClassroomPhoto and Panorama gets
+downscaled copies at a few fixed widths, in WebP and JPEG, written through
+the default storage (local media or S3) under ``renditions/``.  What was
+generated is recorded on the row itself, in a ``renditions`` JSON column
+keyed by field name:
+
+    {"preview_file": {"src": "buildings/previews/2025/01/02/alter.jpg",
+                      "width": 3024, "height": 1701,
+                      "webp": [[320, "renditions/.../alter-320w.webp"], ...],
+                      "jpeg": [[320, "renditions/.../alter-320w.jpg"], ...]}}
+
+so templates build ``srcset`` without touching storage (see the
+``{% picture %}`` tag in ``templatetags/images.py``).  ``src`` ties an entry
+to the file it was made from; replacing the upload makes it stale and the
+tag falls back to the original until it is regenerated.  Saves regenerate
+stale entries (``signals.py``); ``manage.py build_renditions`` backfills.
+Like Django's own FileField, nothing deletes superseded files.
+"""
+import io
+import logging
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import Building, Classroom, ClassroomPhoto, Panorama
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 1280)
+# (key, extension, mime type, Pillow save options); browsers take the first
+# <source> they support, so the smaller format goes first
+FORMATS = (
+    ("webp", "webp", "image/webp", {"quality": 78, "method": 4}),
+    ("jpeg", "jpg", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+)
+PREFIX = "renditions"
+
+IMAGE_FIELDS = {
+    Building: ("preview_file",),
+    Classroom: ("preview_image_file",),
+    ClassroomPhoto: ("image_file",),
+    Panorama: ("image_file", "preview_file"),
+}
+
+
+def rendition_name(source, width, ext):
+    return f"{PREFIX}/{PurePosixPath(source).with_suffix('')}-{width}w.{ext}"
+
+
+def _widths(original):
+    # never upscale; a source narrower than the largest width is kept at its own size
+    widths = [w for w in WIDTHS if w < original]
+    if original < WIDTHS[-1]:
+        widths.append(original)
+    return widths
+
+
+def load(source, storage, width=WIDTHS[-1]):
+    """
+    Storage file ``source`` decoded at no less than ``width`` px (possibly
+    at a reduced scale), upright and RGB, with its full-size dimensions.
+    """
+    from PIL import ExifTags, Image, ImageOps
+
+    with storage.open(source, "rb") as fh:
+        img = Image.open(fh)
+        full = img.size
+        # JPEG can decode at 1/2..1/8 scale for free; panoramas are 8k+ wide
+        img.draft("RGB", (width, width * img.height // max(img.width, 1)))
+        img.load()
+    # EXIF orientations 5-8 are quarter turns: width and height swap
+    if img.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+        full = full[::-1]
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img, *full
+
+
+def build(source, storage=None):
+    """Render storage file ``source`` at every width/format; returns its manifest entry."""
+    from PIL import Image
+
+    storage = storage or default_storage
+    img, width, height = load(source, storage)
+
+    entry = {"src": source, "width": width, "height": height}
+    entry.update({key: [] for key, *_ in FORMATS})
+    # largest first, each step resized from the previous one
+    for w in sorted(_widths(width), reverse=True):
+        if img.width != w:
+            img = img.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+        for key, ext, _, options in FORMATS:
+            buf = io.BytesIO()
+            img.save(buf, key.upper(), **options)
+            name = rendition_name(source, w, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[key].insert(0, [w, storage.save(name, ContentFile(buf.getvalue()))])
+    return entry
+
+
+def is_current(entry, fieldfile):
+    return bool(entry) and bool(fieldfile) and entry.get("src") == fieldfile.name
+
+
+def needs_refresh(instance):
+    """True if ``refresh()`` has work to do; no storage access."""
+    current = instance.renditions or {}
+    for name in IMAGE_FIELDS[type(instance)]:
+        fieldfile = getattr(instance, name)
+        if (not is_current(current.get(name), fieldfile)) if fieldfile else name in current:
+            return True
+    return False
+
+
+def refresh(instance, force=False):
+    """
+    Regenerate stale entries on ``instance`` and store them with a plain
+    UPDATE (no signals).  Returns True if anything changed.  Unreadable
+    images are logged and skipped: pages fall back to the original file.
+    """
+    current = instance.renditions or {}
+    fields = IMAGE_FIELDS[type(instance)]
+    # other keys are not ours (cards.py files the room's card entries here)
+    renditions = {k: v for k, v in current.items() if k not in fields}
+    for name in fields:
+        fieldfile = getattr(instance, name)
+        if not fieldfile:
+            continue
+        entry = current.get(name)
+        if not force and is_current(entry, fieldfile):
+            renditions[name] = entry
+            continue
+        try:
+            renditions[name] = build(fieldfile.name)
+        except Exception:  # Pillow raises a zoo of types for corrupt files
+            logger.warning("cannot render %s", fieldfile.name, exc_info=True)
+    if renditions == (instance.renditions or {}):
+        return False
+    instance.renditions = renditions
+    type(instance)._base_manager.filter(pk=instance.pk).update(renditions=renditions)
+    return True
+
+
+def srcset(entry, key):
+    return ", ".join(f"{default_storage.url(name)} {w}w" for w, name in entry.get(key, ()))
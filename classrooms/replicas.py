@@ -0,0 +1,161 @@
+# classrooms/replicas.py
+"""
+Read replicas for anonymous catalog traffic.
+
+With ``DATABASE_REPLICA_URLS`` set, settings adds one ``replicaN`` alias per
+URL to DATABASES and lists them in ``settings.DATABASE_REPLICAS``.  Views
+decorated with ``@read_only`` (the public catalog pages, the room finder
+API and search):
+
+* run outside ATOMIC_REQUESTS: they only read, so the per-request
+  transaction (and its savepoint round trips) on the primary bought nothing;
+* read from a replica, picked round-robin per request so every query of
+  one page sees the same snapshot.  A replica that cannot be reached is
+  skipped for ``REPLICA_RETRY_SECONDS``, and a page that fails on its
+  replica mid-way is rendered again on the primary.
+
+Everything else reads from the primary, and so do read-only views for
+requests that carry a session cookie (staff in the admin) or the
+``cphc_primary`` cookie that ``PrimaryPinMiddleware`` sets for
+``DATABASE_PIN_SECONDS`` after any POST/PUT/PATCH/DELETE: an editor sees
+their change even while the replicas lag.  Writes always go to the primary.
+The catalog export is only ``non_atomic_requests`` and reads from the
+primary: it streams its rows after the view has returned.
+
+Replication lag must not end up in the page cache under a fresh version
+stamp: cached pages are also keyed on the ETag computed from the rows the
+page was rendered from (``cache.versioned_cache_page``), so a page rendered
+from a lagging replica is simply not reused once the replica catches up.
+"""
+import contextvars
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connections, transaction
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "cphc_primary"
+REPLICA_RETRY_SECONDS = 30
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+_read_db = contextvars.ContextVar("cphc_read_db", default=None)  # None: the primary
+_turn = itertools.count()
+_down = {}  # alias -> monotonic time it may be tried again
+
+
+# --- choosing a replica ----------------------------------------------------------------
+def mark_down(alias, exc=None):
+    _down[alias] = time.monotonic() + REPLICA_RETRY_SECONDS
+    logger.warning("replica %s unavailable, using others for %ss: %s", alias, REPLICA_RETRY_SECONDS, exc)
+
+
+def healthy(alias):
+    if _down.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()  # a no-op while connected
+    except (OperationalError, InterfaceError) as exc:
+        mark_down(alias, exc)
+        return False
+    _down.pop(alias, None)
+    return True
+
+
+def pick():
+    """The next healthy replica, round-robin; None (the primary) if none is."""
+    aliases = settings.DATABASE_REPLICAS
+    if not aliases:
+        return None
+    start = next(_turn)
+    for i in range(len(aliases)):
+        alias = aliases[(start + i) % len(aliases)]
+        if healthy(alias):
+            return alias
+    return None
+
+
+def wants_primary(request):
+    cookies = request.COOKIES
+    return (request.method not in SAFE_METHODS or PIN_COOKIE in cookies
+            or settings.SESSION_COOKIE_NAME in cookies)
+
+
+@contextmanager
+def reading_from(alias):
+    """Route reads inside the block to ``alias`` (None: the primary)."""
+    token = _read_db.set(alias)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def primary():
+    return reading_from(None)
+
+
+# --- views -----------------------------------------------------------------------------
+def read_only(view):
+    """
+    Mark a view that never writes: no per-request transaction, and reads
+    from a replica for anonymous requests (sync or async views).
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            alias = None if wants_primary(request) else await sync_to_async(pick)()
+            if alias is None:
+                return await view(request, *args, **kwargs)
+            try:
+                with reading_from(alias):
+                    return await view(request, *args, **kwargs)
+            except (OperationalError, InterfaceError) as exc:
+                mark_down(alias, exc)
+            with primary():
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            alias = None if wants_primary(request) else pick()
+            if alias is None:
+                return view(request, *args, **kwargs)
+            try:
+                with reading_from(alias):
+                    return view(request, *args, **kwargs)
+            except (OperationalError, InterfaceError) as exc:
+                mark_down(alias, exc)
+            with primary():
+                return view(request, *args, **kwargs)
+    return transaction.non_atomic_requests(wrapped)
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """After a write request, keep the client's reads on the primary for a while."""
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 500 and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, "1", max_age=settings.DATABASE_PIN_SECONDS,
+                                httponly=True, samesite="Lax", secure=request.is_secure())
+        return response
+
+
+# --- router ----------------------------------------------------------------------------
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_db.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the primary's data
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,195 @@
+# classrooms/restore.py
+"""
+Fast restore of ``dumpdata`` snapshots.
+
+``loaddata`` reads the whole fixture into memory and saves one object at a
+time (one INSERT or UPDATE+INSERT per row, plus signals).  ``restore()``
+streams the fixture instead (plain or gzipped, UTF-8 or the UTF-16 that
+PowerShell redirection produces), buffers deserialized objects per model
+and writes each buffer with one prepared INSERT (``executemany``), flushing models in
+dependency order so parents land before children.
+
+Like ``loaddata`` it replaces rows whose primary key already exists, skips
+fields the models no longer have, stores values raw (``updated_at`` is kept,
+not reset to now; only dumps that predate a timestamp column get one)
+and checks foreign keys once at the end.  Signals do not
+fire, so ``restore()`` does their work afterwards: feature masks, search
+index, room cards, page-cache stamps and, on PostgreSQL, sequence resets.
+"""
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import cards, search
+from .cache import all_scopes, bump
+from .models import Classroom
+from .services import iter_records
+
+BATCH_SIZE = 2000
+
+
+@dataclass
+class RestoreStats:
+    counts: dict = field(default_factory=dict)   # "app.Model" -> rows
+    skipped: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+
+def _label(model):
+    return model._meta.label
+
+
+def _excluded(model, exclude):
+    return model._meta.app_label in exclude or _label(model) in exclude
+
+
+class _Restorer:
+    def __init__(self, using, batch_size, stats, progress):
+        self.using = using
+        self.batch_size = batch_size
+        self.stats = stats
+        self.progress = progress
+        self.pending = defaultdict(list)   # model -> [instance]
+        self.links = defaultdict(list)     # auto-created m2m through model -> [row]
+        self.seen = []                     # models in first-seen order
+        self.empty = {}                    # model -> table was empty before the restore
+        self.stamped = {}                  # model -> auto_now(_add) fields
+
+    def add(self, obj):
+        instance = obj.object
+        model = type(instance)
+        if model not in self.empty:
+            self.seen.append(model)
+            self.empty[model] = not model._base_manager.using(self.using).exists()
+            self.stamped[model] = [f for f in model._meta.concrete_fields
+                                   if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+        if instance.pk is None or obj.deferred_fields:
+            # natural-key objects without a pk, or forward references that
+            # need resolving: rare enough that loaddata's path is fine
+            obj.save(using=self.using)
+            if obj.deferred_fields:
+                obj.save_deferred_fields(using=self.using)
+            self._count(model, 1, report=False)
+            return
+        for f in self.stamped[model]:
+            if getattr(instance, f.attname) is None:
+                f.pre_save(instance, True)  # older dumps predate the column
+        if model is Classroom:
+            instance.feature_mask = instance.compute_feature_mask()
+        self.pending[model].append(instance)
+        for name, values in (obj.m2m_data or {}).items():
+            f = model._meta.get_field(name)
+            through = f.remote_field.through
+            if through._meta.auto_created:
+                src, dst = f"{f.m2m_field_name()}_id", f"{f.m2m_reverse_field_name()}_id"
+                self.links[through] += [through(**{src: instance.pk, dst: v}) for v in values]
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        objs = self.pending.pop(model, [])
+        if not objs:
+            return
+        manager = model._base_manager.using(self.using)
+        if not self.empty[model]:
+            # loaddata semantics: the fixture wins over rows with the same pk
+            manager.filter(pk__in=[o.pk for o in objs])._raw_delete(using=self.using)
+        # One prepared INSERT executed for the whole batch.  Not bulk_create():
+        # it runs pre_save(), which would stamp auto_now fields with the
+        # current time, and compiling a multi-row VALUES list through the ORM
+        # costs more than the database spends executing it.
+        connection = connections[self.using]
+        fields = model._meta.concrete_fields
+        qn = connection.ops.quote_name
+        sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+            qn(model._meta.db_table),
+            ", ".join(qn(f.column) for f in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        rows = [[f.get_db_prep_save(getattr(o, f.attname), connection) for f in fields] for o in objs]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        self._count(model, len(objs))
+
+    def flush_all(self):
+        for model in _dependency_order(self.seen):
+            self.flush(model)
+        for through, rows in self.links.items():
+            through._base_manager.using(self.using).bulk_create(
+                rows, batch_size=self.batch_size, ignore_conflicts=True)
+        self.links.clear()
+
+    def _count(self, model, n, report=True):
+        self.stats.counts[_label(model)] = self.stats.counts.get(_label(model), 0) + n
+        if report and self.progress:
+            self.progress(_label(model), self.stats)
+
+
+def _dependency_order(models):
+    by_app = defaultdict(list)
+    for model in models:
+        by_app[model._meta.app_config].append(model)
+    return serializers.sort_dependencies(list(by_app.items()), allow_cycles=True)
+
+
+def _reset_sequences(connection, models):
+    sql = connection.ops.sequence_reset_sql(no_style(), models)
+    if sql:
+        with connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
+
+
+def restore(paths, *, batch_size=BATCH_SIZE, exclude=(), using=DEFAULT_DB_ALIAS, progress=None):
+    """Load ``dumpdata`` JSON files (``.json`` or ``.json.gz``); returns RestoreStats.
+
+    ``exclude`` takes ``app_label`` or ``app_label.Model`` entries, as loaddata does.
+    """
+    exclude = {e if "." not in e else apps.get_model(e)._meta.label for e in exclude}
+    stats = RestoreStats()
+    connection = connections[using]
+    restorer = _Restorer(using, batch_size, stats, progress)
+
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            for path in paths:
+                objects = serializers.deserialize(
+                    "python", iter_records(path, fmt="json"), using=using,
+                    ignorenonexistent=True, handle_forward_references=True,
+                )
+                for obj in objects:
+                    if _excluded(type(obj.object), exclude):
+                        stats.skipped += 1
+                        continue
+                    restorer.add(obj)
+            restorer.flush_all()
+
+        models = restorer.seen
+        # FKs were not enforced above (SQLite, MySQL) or are deferred to
+        # commit (PostgreSQL); fail here with a readable error instead
+        connection.check_constraints(table_names=[m._meta.db_table for m in models])
+        _reset_sequences(connection, models)
+
+        if any(m._meta.app_label == "classrooms" for m in models):
+            search.rebuild()
+            cards.rebuild()
+            scopes = all_scopes(using)
+            transaction.on_commit(lambda: bump(*scopes), using=using)
+    return stats
@@ -0,0 +1,14 @@
+# classrooms/s3.py
+"""S3 media backend (STORAGE_BACKEND=s3); imported only when configured."""
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from .storage import IMMUTABLE, is_hashed
+
+
+class S3Storage(S3Boto3Storage):
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if is_hashed(name):
+            # content-addressed blobs never change behind their URL
+            params["CacheControl"] = IMMUTABLE
+        return params
@@ -0,0 +1,205 @@
+# classrooms/search.py
+"""
+Full-text search over buildings, rooms and resources.
+
+``SearchEntry`` rows hold the text; the database indexes it:
+
+* SQLite  -- an external-content FTS5 table (``classrooms_searchentry_fts``)
+  kept in sync by triggers, queried with prefix terms and bm25 ranking.
+* Postgres -- a GIN index on ``to_tsvector('simple', title || ' ' || body)``
+  for search plus a pg_trgm index on ``title`` for autocomplete.
+* anything else -- plain ``icontains`` (correct, just not fast).
+
+Python only ever writes ``SearchEntry`` rows (``index_*`` below), so the
+index is updated incrementally in the same transaction as the edit.
+"""
+import itertools
+import re
+
+from django.db import connection, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import Building, BuildingResource, Classroom, SearchEntry
+
+FTS_TABLE = "classrooms_searchentry_fts"
+
+# must match the expression indexed by migration 0028 for Postgres to use it
+PG_DOCUMENT = "to_tsvector('simple', title || ' ' || body)"
+
+
+def _terms(q):
+    return re.findall(r"\w+", (q or "").lower())[:8]
+
+
+# --- querying ----------------------------------------------------------------
+def _filters(kinds, published_only, alias=""):
+    where, params = [], []
+    if kinds:
+        where.append(f"{alias}kind IN ({', '.join(['%s'] * len(kinds))})")
+        params += list(kinds)
+    if published_only:
+        where.append(f"{alias}published")
+    return "".join(" AND " + w for w in where), params
+
+
+def _match(terms, kinds, published_only, title_only, vendor):
+    """
+    (FROM ... WHERE ... clause, its params, ORDER BY expression, its params)
+    matching ``terms`` through ``vendor``'s index; None without one.
+    Entry columns are available as ``e.<column>``.
+    """
+    if vendor == "sqlite":
+        match = " ".join('"%s"*' % t for t in terms)
+        if title_only:
+            match = f"title : ({match})"
+        extra, extra_params = _filters(kinds, published_only, alias="e.")
+        return (f"{FTS_TABLE} JOIN classrooms_searchentry e ON e.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s{extra}", [match, *extra_params],
+                f"bm25({FTS_TABLE}, 10.0, 1.0)", [])
+    if vendor == "postgresql":
+        extra, extra_params = _filters(kinds, published_only)
+        if title_only:
+            # trigram similarity tolerates typos in the autocomplete box
+            phrase = " ".join(terms)
+            return (f"classrooms_searchentry e WHERE (title ILIKE %s OR title %% %s){extra}",
+                    [f"%{phrase}%", phrase, *extra_params], "similarity(title, %s) DESC", [phrase])
+        tsquery = " & ".join(f"{t}:*" for t in terms)
+        return (f"classrooms_searchentry e WHERE {PG_DOCUMENT} @@ to_tsquery('simple', %s){extra}",
+                [tsquery, *extra_params], f"ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s)) DESC", [tsquery])
+    return None
+
+
+def _scan(terms, kinds, published_only, title_only, using):
+    qs = SearchEntry.objects.using(using)
+    for t in terms:
+        qs = qs.filter(Q(title__icontains=t) if title_only
+                       else Q(title__icontains=t) | Q(body__icontains=t))
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+    if published_only:
+        qs = qs.filter(published=True)
+    return qs
+
+
+def _ranked_ids(q, kinds, limit, published_only, title_only):
+    terms = _terms(q)
+    if not terms:
+        return []
+    # through the router, so @read_only requests search on their replica
+    using = router.db_for_read(SearchEntry)
+    conn = connections[using]
+    found = _match(terms, kinds, published_only, title_only, conn.vendor)
+    if found is None:
+        return list(_scan(terms, kinds, published_only, title_only, using).values_list("id", flat=True)[:limit])
+    where, params, order, order_params = found
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT e.id FROM {where} ORDER BY {order} LIMIT %s", [*params, *order_params, limit])
+        return [row[0] for row in cur.fetchall()]
+
+
+def search(q, kinds=None, limit=50, published_only=True):
+    """Best matches for ``q`` as SearchEntry objects, best first."""
+    ids = _ranked_ids(q, kinds, limit, published_only, title_only=False)
+    by_id = SearchEntry.objects.in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def suggest(q, limit=8):
+    """Prefix / fuzzy title matches for an autocomplete box."""
+    ids = _ranked_ids(q, None, limit, True, title_only=True)
+    by_id = SearchEntry.objects.in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def object_ids(kind, q, using="default"):
+    """
+    Every primary key of ``kind`` objects matching ``q``, published or not,
+    as a subquery for ``pk__in`` on database ``using`` (admin).  Unranked
+    and unlimited: the changelist sorts and counts them itself.
+    """
+    terms = _terms(q)
+    if not terms:
+        return []
+    found = _match(terms, [kind], False, False, connections[using].vendor)
+    if found is None:
+        return _scan(terms, [kind], False, False, using).values("object_id")
+    where, params, _, _ = found
+    return RawSQL(f"SELECT e.object_id FROM {where}", params)
+
+
+# --- indexing ----------------------------------------------------------------
+def _put(kind, object_id, **fields):
+    SearchEntry.objects.update_or_create(kind=kind, object_id=object_id, defaults=fields)
+
+
+def remove(kind, obj_id):
+    SearchEntry.objects.filter(kind=kind, object_id=obj_id).delete()
+
+
+def _building_entry(b):
+    return dict(kind=SearchEntry.Kind.BUILDING, object_id=b.pk, title=b.name, body=b.description or "",
+                url=reverse("classroom_list_by_building", args=[b.slug]), published=True)
+
+
+def _classroom_entry(c, b):
+    return dict(kind=SearchEntry.Kind.ROOM, object_id=c.pk, title=f"{b.name} {c.room_number}",
+                body=" ".join(filter(None, [c.summary, c.room_type])),
+                url=reverse("classroom_detail", args=[b.slug, c.room_number]),
+                published=c.is_published)
+
+
+def _resource_entry(r, b):
+    return dict(kind=SearchEntry.Kind.RESOURCE, object_id=r.pk, title=r.title,
+                body=" ".join(filter(None, [r.summary, b.name])), url=r.url, published=r.published)
+
+
+def index_building(b):
+    _put(**_building_entry(b))
+
+
+def index_classroom(c, building=None):
+    _put(**_classroom_entry(c, building or c.building))
+
+
+def index_resource(r, building=None):
+    _put(**_resource_entry(r, building or r.building))
+
+
+def _put_many(entries):
+    SearchEntry.objects.bulk_create([SearchEntry(**e) for e in entries], update_conflicts=True,
+                                    unique_fields=["kind", "object_id"],
+                                    update_fields=["title", "body", "url", "published"])
+
+
+def index_classrooms(rooms):
+    """Upsert entries for many rooms at once (``building`` should be select_related)."""
+    _put_many(_classroom_entry(c, c.building) for c in rooms)
+
+
+def index_building_tree(b):
+    """Re-index a building plus its rooms and resources (their text includes its name)."""
+    index_building(b)
+    _put_many(_classroom_entry(c, b) for c in b.classrooms.all())
+    _put_many(_resource_entry(r, b) for r in b.resources.all())
+
+
+def rebuild(batch_size=2000):
+    """Drop and rebuild every entry; used after bulk imports that skip signals."""
+    SearchEntry.objects.all().delete()
+    entries = itertools.chain(
+        (_building_entry(b) for b in Building.objects.iterator(chunk_size=batch_size)),
+        (_classroom_entry(c, c.building) for c in
+         Classroom.objects.select_related("building").iterator(chunk_size=batch_size)),
+        (_resource_entry(r, r.building) for r in
+         BuildingResource.objects.select_related("building").iterator(chunk_size=batch_size)),
+    )
+    n = 0
+    while batch := [SearchEntry(**e) for e in itertools.islice(entries, batch_size)]:
+        SearchEntry.objects.bulk_create(batch)
+        n += len(batch)
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cur:  # re-derive FTS from the content table
+            cur.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return n
@@ -0,0 +1,465 @@
+# classrooms/services.py
+"""
+Bulk classroom import.
+
+    stats = import_classrooms(iter_records("rooms.jsonl"), batch_size=1000)
+
+``iter_records`` streams items out of a ``{"classrooms": [...]}`` document,
+a bare ``[...]`` array or JSON Lines (optionally gzipped) without loading the
+file, so memory stays flat however large the input is.  ``ClassroomImporter``
+resolves buildings once through an in-memory map and upserts each batch of
+rooms with a single ``bulk_create(update_conflicts=True)`` keyed on
+``external_id``.
+
+An item is a flat dict of Classroom fields plus a building reference:
+
+    {"external_id": "alter-110", "building": "Alter Hall", "campus": "MAIN",
+     "room_number": "110", "capacity": 60, "class_capture": true,
+     "wireless_presentation": ["kramer"]}
+
+``building`` may be a name or slug (or use ``building_slug``); unknown
+buildings are created unless ``create_buildings=False``.  Fields missing
+from an item are left untouched on update.  An item whose building and
+room number belong to another external_id is reported and skipped.
+bulk_create skips signals, so the importer maintains what they would
+have: feature masks, page-cache stamps and search entries.
+
+Incremental sync: each row stores ``content_hash``, a digest of the
+normalized payload it was last imported from.  Items whose digest matches
+are not written at all (no ``updated_at`` bump, no cache invalidation), so
+re-running a nightly full export only touches the rooms that changed.
+With ``prune`` the input is treated as a full snapshot and rooms missing
+from it are unpublished or deleted.
+"""
+import codecs
+import gzip
+import hashlib
+import io
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import search
+from .cache import bump, building_scope, catalog_scope, room_scope
+from .models import FEATURE_FLAGS, Building, Classroom, SearchEntry
+
+BATCH_SIZE = 1000
+READ_CHUNK = 1 << 16
+MAX_ERRORS = 100
+
+# payload keys that map straight onto Classroom columns
+_SKIP = {"id", "building", "feature_mask", "content_hash", "updated_at", "preview_image_file",
+         "renditions", "placeholders", "card_image"}
+PRUNE_MODES = ("unpublish", "delete")
+IMPORT_FIELDS = {
+    f.name: f for f in Classroom._meta.concrete_fields if f.name not in _SKIP
+}
+
+
+# --- reading ------------------------------------------------------------------
+def _sniff_encoding(head):
+    # dumpdata on Windows (PowerShell redirection) writes UTF-16 with a BOM
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if len(head) >= 2 and head[0] == 0:
+        return "utf-16-be"
+    if len(head) >= 2 and head[1] == 0:
+        return "utf-16-le"
+    return "utf-8"
+
+
+def open_text(path):
+    """Open a (possibly gzipped) JSON file as text, detecting UTF-8/UTF-16."""
+    if hasattr(path, "read"):
+        return path
+    path = str(path)
+    raw = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    return io.TextIOWrapper(raw, encoding=_sniff_encoding(raw.peek(4)[:4]))
+
+
+class _JSONStream:
+    """Pull successive JSON values out of a text file without reading it all."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.fh.read(READ_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > READ_CHUNK:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"expected ',' or ']' at offset {self.pos - 1}, got {sep!r}")
+
+
+def iter_records(path, fmt=None, key="classrooms"):
+    """Yield classroom dicts from JSON (``{key: [...]}`` or ``[...]``) or JSON Lines."""
+    fh = open_text(path)
+    name = str(getattr(fh, "name", path))
+    fmt = fmt or ("jsonl" if name.removesuffix(".gz").endswith((".jsonl", ".ndjson")) else "json")
+    try:
+        if fmt == "jsonl":
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        stream = _JSONStream(fh)
+        if stream.peek() == "[":
+            yield from stream.array()
+            return
+        stream.expect("{")
+        while stream.peek() != "}":
+            k = stream.value()
+            stream.expect(":")
+            if k == key:
+                yield from stream.array()
+            else:
+                stream.value()  # skip metadata
+            if stream.peek() == ",":
+                stream.pos += 1
+    finally:
+        if fh is not path:
+            fh.close()
+
+
+# --- writing ------------------------------------------------------------------
+def payload_hash(building_slug, values):
+    """Digest of a normalized item; equal digests mean nothing to write."""
+    doc = json.dumps([building_slug, values], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(doc.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    skipped: int = 0
+    buildings_created: int = 0
+    errors: list = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def error(self, index, item, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            ext = item.get("external_id") if isinstance(item, dict) else None
+            self.errors.append(f"item {index} ({ext or 'no external_id'}): {message}")
+
+
+class _DryRun(Exception):
+    pass
+
+
+class ClassroomImporter:
+    def __init__(self, batch_size=BATCH_SIZE, create_buildings=True, prune=None, progress=None):
+        if prune not in (None, *PRUNE_MODES):
+            raise ValueError(f"prune must be one of {PRUNE_MODES}")
+        self.batch_size = batch_size
+        self.create_buildings = create_buildings
+        self.prune = prune
+        self.progress = progress
+        self.stats = ImportStats()
+        self._buildings = {}   # casefolded name / slug -> Building(pk, name, slug)
+        self._scopes = set()
+        self._seen = set()     # every external_id in the input, valid or not
+
+    # buildings ----------------------------------------------------------------
+    def _load_buildings(self):
+        for b in Building.objects.only("pk", "name", "slug"):
+            self._buildings[b.name.casefold()] = self._buildings[b.slug] = b
+
+    def _building_ref(self, item):
+        ref = item.get("building_slug") or item.get("building")
+        if isinstance(ref, dict):
+            ref = ref.get("slug") or ref.get("name")
+        if not isinstance(ref, str) or not ref.strip():
+            raise ValidationError("missing building")
+        return ref.strip()
+
+    def _lookup(self, ref):
+        return (self._buildings.get(ref) or self._buildings.get(ref.casefold())
+                or self._buildings.get(slugify(ref)))
+
+    def _resolve_buildings(self, items):
+        missing = {}
+        for item in items:
+            ref = self._building_ref(item)
+            if self._lookup(ref) is None:
+                # "Alter Hall" and "alter-hall" in one batch are the same new building
+                missing.setdefault(slugify(ref), (ref, item.get("campus")))
+        if not missing or not self.create_buildings:
+            return
+        new = [
+            Building(name=name, slug=slugify(name),
+                     campus=campus if campus in Building.Campus.values else Building.Campus.MAIN)
+            for name, campus in missing.values()
+        ]
+        Building.objects.bulk_create(new)
+        for b in new:
+            self._buildings[b.name.casefold()] = self._buildings[b.slug] = b
+            search.index_building(b)
+        self.stats.buildings_created += len(new)
+        self._scopes.add(catalog_scope())
+
+    def _building_for(self, item):
+        ref = self._building_ref(item)
+        found = self._lookup(ref)
+        if found is None:
+            raise ValidationError(f"unknown building {ref!r}")
+        return found
+
+    # rooms --------------------------------------------------------------------
+    def _build(self, item):
+        if not isinstance(item, dict):
+            raise ValidationError("not an object")
+        if not str(item.get("external_id") or "").strip():
+            raise ValidationError("missing external_id")
+        building = self._building_for(item)
+        values = {}
+        for key, value in item.items():
+            f = IMPORT_FIELDS.get(key)
+            if f is None:
+                continue
+            if f.get_internal_type() == "BooleanField" and value is None:
+                value = False
+            values[key] = f.clean(value, None)
+        room = Classroom(building=building, **values)
+        room.feature_mask = room.compute_feature_mask()
+        for name in ("room_number", "external_id"):
+            setattr(room, name, str(getattr(room, name)).strip())
+        room.content_hash = payload_hash(building.slug, values)
+        return room, frozenset(values)
+
+    def _flush(self, items, offset):
+        self._resolve_buildings([i for i in items if isinstance(i, dict) and self._safe_ref(i)])
+        groups = {}
+        seen = {}
+        for n, item in enumerate(items, offset):
+            if isinstance(item, dict) and item.get("external_id"):
+                self._seen.add(str(item["external_id"]).strip())  # never prune a room over a typo
+            try:
+                room, keys = self._build(item)
+            except (ValidationError, ValueError, TypeError) as exc:
+                msg = "; ".join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+                self.stats.error(n, item, msg)
+                continue
+            if room.external_id in seen:  # last occurrence in a batch wins
+                self.stats.skipped += 1
+            seen[room.external_id] = (room, keys, n, item)
+        if not seen:
+            return
+
+        existing = {
+            ext: (bslug, number, digest) for ext, bslug, number, digest in
+            Classroom.objects.filter(external_id__in=list(seen))
+            .values_list("external_id", "building__slug", "room_number", "content_hash")
+        }
+        pending = []
+        for room, keys, n, item in seen.values():
+            if room.external_id in existing and existing[room.external_id][2] == room.content_hash:
+                self.stats.unchanged += 1
+                continue
+            if "room_number" not in keys and room.external_id in existing:
+                room.room_number = existing[room.external_id][1]  # left as stored
+            pending.append((room, keys, n, item))
+
+        taken = self._taken([room for room, *_ in pending])
+        changed = []
+        for room, keys, n, item in pending:
+            if room.external_id in taken:
+                self.stats.error(n, item, taken[room.external_id])
+                continue
+            changed.append((room, keys))
+            groups.setdefault(keys, []).append(room)
+            slug = room.building.slug
+            self._scopes.update((building_scope(slug), room_scope(slug, room.room_number)))
+            if room.external_id in existing:  # moved or renumbered: old URL too
+                old_slug, old_number, _ = existing[room.external_id]
+                self._scopes.update((building_scope(old_slug), room_scope(old_slug, old_number)))
+        if not changed:
+            return
+
+        for keys, rooms in groups.items():
+            update = sorted((keys - {"external_id"}) |
+                            {"building", "feature_mask", "content_hash", "updated_at"})
+            Classroom.objects.bulk_create(
+                rooms, update_conflicts=True, unique_fields=["external_id"], update_fields=update,
+            )
+        # an item without every flag computed its mask from model defaults;
+        # recompute those from the stored row
+        partial = [room.external_id for room, keys in changed if not keys.issuperset(FEATURE_FLAGS)]
+        if partial:
+            Classroom.objects.filter(external_id__in=partial).update_feature_masks()
+        # index the stored rows: a partial item is not the whole room
+        search.index_classrooms(Classroom.objects.select_related("building")
+                                .filter(external_id__in=[room.external_id for room, _ in changed]))
+        inserted = sum(1 for room, _ in changed if room.external_id not in existing)
+        self.stats.inserted += inserted
+        self.stats.updated += len(changed) - inserted
+
+    def _taken(self, rooms):
+        """
+        external_id -> error for rooms whose (building, room_number) belongs
+        to another room: the upsert would violate uniq_building_room_fk and
+        abort the whole import.  A room that is moving away in this batch
+        still counts as the holder; the claimant gets in on the next run.
+        """
+        places = {}
+        for room in rooms:
+            places.setdefault((room.building.pk, room.room_number), []).append(room)
+        holders = {
+            (building_id, number): ext for building_id, number, ext in
+            Classroom.objects.filter(building_id__in={b for b, _ in places}, room_number__in={n for _, n in places})
+            .values_list("building_id", "room_number", "external_id")
+            if (building_id, number) in places
+        }
+        taken = {}
+        for place, claimants in places.items():
+            holder = holders.get(place, claimants[0].external_id)
+            for room in claimants:
+                if room.external_id != holder:
+                    taken[room.external_id] = (f"room {room.room_number!r} in {room.building.name} "
+                                               f"already belongs to {holder}")
+        return taken
+
+    def _prune(self):
+        """Unpublish or delete rooms absent from the snapshot."""
+        if not self._seen:
+            raise ValueError("refusing to prune: the input contained no classrooms")
+        rows = (Classroom.objects.values_list("pk", "external_id", "building__slug", "room_number",
+                                              "is_published")
+                .iterator(chunk_size=self.batch_size))
+        gone = []
+        for pk, ext, slug, number, published in rows:
+            if ext not in self._seen and (published or self.prune == "delete"):
+                gone.append(pk)
+                self._scopes.update((building_scope(slug), room_scope(slug, number)))
+        for i in range(0, len(gone), self.batch_size):
+            chunk = gone[i:i + self.batch_size]
+            if self.prune == "delete":
+                Classroom.objects.filter(pk__in=chunk).delete()
+            else:
+                # clear the hash too, so the room's next appearance republishes it
+                Classroom.objects.filter(pk__in=chunk).update(
+                    is_published=False, content_hash="", updated_at=timezone.now())
+                SearchEntry.objects.filter(kind=SearchEntry.Kind.ROOM, object_id__in=chunk).update(
+                    published=False)
+        self.stats.removed = len(gone)
+
+    def _safe_ref(self, item):
+        try:
+            return self._building_ref(item)
+        except ValidationError:
+            return None
+
+    def run(self, records, dry_run=False):
+        self._load_buildings()
+        try:
+            with transaction.atomic():
+                batch = []
+                for item in records:
+                    batch.append(item)
+                    self.stats.read += 1
+                    if len(batch) >= self.batch_size:
+                        self._flush(batch, self.stats.read - len(batch))
+                        batch = []
+                        if self.progress:
+                            self.progress(self.stats)
+                if batch:
+                    self._flush(batch, self.stats.read - len(batch))
+                    if self.progress:
+                        self.progress(self.stats)
+                if self.prune:
+                    self._prune()
+                if dry_run:
+                    raise _DryRun
+                if self._scopes:
+                    self._scopes.add(catalog_scope())
+                    scopes = list(self._scopes)
+                    transaction.on_commit(lambda: bump(*scopes))
+        except _DryRun:
+            pass
+        return self.stats
+
+
+def import_classrooms(records, *, batch_size=BATCH_SIZE, dry_run=False, create_buildings=True,
+                      prune=None, progress=None):
+    """Upsert an iterable of classroom dicts; returns ImportStats."""
+    importer = ClassroomImporter(batch_size=batch_size, create_buildings=create_buildings,
+                                 prune=prune, progress=progress)
+    return importer.run(records, dry_run=dry_run)
+
+
+def upsert_classroom_payload(item):
+    """Import a single classroom dict (see module docstring for the format)."""
+    stats = import_classrooms([item])
+    if stats.errors:
+        raise ValidationError(stats.errors[0])
+    return stats
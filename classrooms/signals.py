@@ -0,0 +1,177 @@
+# classrooms/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache as page_cache
+from . import cards, jobs, placeholders, renditions, search, tasks, tiles
+from .models import Building, BuildingResource, Classroom, ClassroomPhoto, Panorama, SearchEntry
+
+
+def _bump_on_commit(scopes):
+    # under ATOMIC_REQUESTS the admin save is still uncommitted here; bumping
+    # now would let a concurrent reader re-cache the old rows under the new stamp
+    scopes = list(scopes)
+    transaction.on_commit(lambda: page_cache.bump(*scopes))
+
+
+def _room_scopes(classroom_id):
+    row = (Classroom.objects.filter(pk=classroom_id)
+           .values_list("building__slug", "room_number").first())
+    if row is None:  # classroom itself is being deleted; its own signal covers it
+        return []
+    slug, room_number = row
+    return [page_cache.building_scope(slug), page_cache.room_scope(slug, room_number)]
+
+
+# --- remember the old URL keys so renames invalidate both sides -----------
+@receiver(pre_save, sender=Building)
+def _remember_building_slug(sender, instance, **kwargs):
+    instance._cache_old_slug = (
+        Building.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(pre_save, sender=Classroom)
+def _remember_room_location(sender, instance, **kwargs):
+    instance._cache_old_location = (
+        Classroom.objects.filter(pk=instance.pk)
+        .values_list("building__slug", "room_number").first()
+        if instance.pk else None
+    )
+
+
+# --- invalidation -----------------------------------------------------------
+@receiver(post_save, sender=Building)
+@receiver(post_delete, sender=Building)
+def _invalidate_building(sender, instance, **kwargs):
+    # room pages show the building name, campus and tech contacts
+    room_numbers = list(instance.classrooms.values_list("room_number", flat=True))
+    scopes = [page_cache.catalog_scope()]
+    for slug in {instance.slug, getattr(instance, "_cache_old_slug", None)} - {None}:
+        scopes.append(page_cache.building_scope(slug))
+        scopes += [page_cache.room_scope(slug, n) for n in room_numbers]
+    _bump_on_commit(scopes)
+
+
+@receiver(post_save, sender=Classroom)
+@receiver(post_delete, sender=Classroom)
+def _invalidate_classroom(sender, instance, **kwargs):
+    slug = Building.objects.filter(pk=instance.building_id).values_list("slug", flat=True).first()
+    locations = {(slug, instance.room_number), getattr(instance, "_cache_old_location", None)} - {None}
+    scopes = [page_cache.catalog_scope()]
+    for slug, room_number in locations:
+        scopes += [page_cache.building_scope(slug), page_cache.room_scope(slug, room_number)]
+    _bump_on_commit(scopes)
+
+
+@receiver(post_save, sender=Panorama)
+@receiver(post_delete, sender=Panorama)
+@receiver(post_save, sender=ClassroomPhoto)
+@receiver(post_delete, sender=ClassroomPhoto)
+def _invalidate_room_media(sender, instance, **kwargs):
+    # media has no timestamp of its own; the room's updated_at feeds the ETag
+    Classroom.objects.filter(pk=instance.classroom_id).update(updated_at=timezone.now())
+    # tiles on the building list fall back to the first photo/panorama
+    _bump_on_commit(_room_scopes(instance.classroom_id))
+
+
+@receiver(post_save, sender=BuildingResource)
+@receiver(post_delete, sender=BuildingResource)
+def _invalidate_resource(sender, instance, **kwargs):
+    slug = Building.objects.filter(pk=instance.building_id).values_list("slug", flat=True).first()
+    if slug:
+        _bump_on_commit([page_cache.building_scope(slug)])
+
+
+# --- search index -------------------------------------------------------------
+# Fixture loads (raw=True) may save children before parents; rebuild afterwards
+# with `manage.py rebuild_search_index` instead.
+@receiver(post_save, sender=Building)
+def _index_building(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # room titles and resource bodies embed the building name
+        search.index_building_tree(instance)
+
+
+@receiver(post_save, sender=Classroom)
+def _index_classroom(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_classroom(instance)
+
+
+@receiver(post_save, sender=BuildingResource)
+def _index_resource(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_resource(instance)
+
+
+@receiver(post_delete, sender=Building)
+@receiver(post_delete, sender=Classroom)
+@receiver(post_delete, sender=BuildingResource)
+def _unindex(sender, instance, **kwargs):
+    kind = {Building: SearchEntry.Kind.BUILDING, Classroom: SearchEntry.Kind.ROOM,
+            BuildingResource: SearchEntry.Kind.RESOURCE}[sender]
+    search.remove(kind, instance.pk)
+
+
+# --- image placeholders ------------------------------------------------------------
+# Inline, even with the job queue on: a 1/8-scale decode is cheap and the
+# pages need the size and placeholder from the first render.
+@receiver(post_save, sender=Building)
+@receiver(post_save, sender=Classroom)
+@receiver(post_save, sender=ClassroomPhoto)
+@receiver(post_save, sender=Panorama)
+def _measure_images(sender, instance, raw=False, **kwargs):
+    if not raw and placeholders.needs_refresh(instance):
+        placeholders.refresh(instance)
+
+
+# --- image renditions and panorama tiles --------------------------------------
+# Queued for `manage.py run_worker` (see jobs.py); pages show the original file
+# until the job lands, then it bumps and re-warms them.  The checks read only
+# the row, so nothing is queued unless an image was replaced.
+@receiver(post_save, sender=Building)
+@receiver(post_save, sender=Classroom)
+@receiver(post_save, sender=ClassroomPhoto)
+@receiver(post_save, sender=Panorama)
+def _render_images(sender, instance, raw=False, **kwargs):
+    if raw or not renditions.needs_refresh(instance):
+        return
+    if settings.JOBS_EAGER:
+        renditions.refresh(instance)  # on the caller's object, as it will read it
+    else:
+        label = sender._meta.label
+        jobs.enqueue(tasks.render_images, model=label, pk=instance.pk,
+                     key=f"renditions:{label}:{instance.pk}")
+
+
+@receiver(post_save, sender=Panorama)
+def _tile_panorama(sender, instance, raw=False, **kwargs):
+    # the tile job renders a derived preview_file's renditions itself
+    if raw or not tiles.needs_refresh(instance):
+        return
+    if settings.JOBS_EAGER:
+        tiles.refresh(instance)
+    else:
+        jobs.enqueue(tasks.tile_panorama, pk=instance.pk, key=f"tiles:{instance.pk}")
+
+
+# --- room tile image ---------------------------------------------------------------
+# Last, so the source's placeholder (and, when eager, renditions) are current.
+@receiver(post_save, sender=Classroom)
+def _refresh_own_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cards.refresh(instance)
+
+
+@receiver(post_save, sender=ClassroomPhoto)
+@receiver(post_delete, sender=ClassroomPhoto)
+@receiver(post_save, sender=Panorama)
+@receiver(post_delete, sender=Panorama)
+def _refresh_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cards.refresh_room(instance.classroom_id)
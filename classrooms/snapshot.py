@@ -0,0 +1,255 @@
+# classrooms/snapshot.py
+"""
+Pre-rendered static snapshot of the public catalog.
+
+``build(out_dir)`` renders the building index, every building's room list
+and every published room's detail page through their views into
+
+    <out>/index.html                           /
+    <out>/buildings/index.html                 /buildings/
+    <out>/buildings/<slug>/index.html          /buildings/<slug>/
+    <out>/buildings/<slug>/<room>/index.html   /buildings/<slug>/<room>/
+
+plus ``manifest.json``, which records for each page the change stamps it
+was rendered from (the tuples the views hash into their ETags).  The next
+build reads the stamps of every page in a few grouped queries and only
+re-renders pages whose stamps moved; pages that no longer exist are
+deleted, and a change to the templates starts over.  Rendering is spread
+across a process pool.
+
+The directory needs nothing but a file server: sync it to any static host,
+or set CATALOG_SNAPSHOT_DIR and ``SnapshotFallbackMiddleware`` serves it
+whenever the database cannot be reached.  Only the first, unfiltered page
+of each room list is captured; images still load from MEDIA_URL.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import unquote
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError, connections
+from django.http import FileResponse
+from django.test import RequestFactory
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+
+from .models import Classroom
+from .replicas import primary
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 50  # pages per task handed to a worker process
+
+
+@dataclass
+class SnapshotStats:
+    rendered: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+    bytes: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+# --- rendering ---------------------------------------------------------------------
+def render(path):
+    """GET ``path`` through its view (no middleware) and return the response, or None if unrouted."""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    hosts = [h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")]
+    request = RequestFactory(**({"SERVER_NAME": hosts[0]} if hosts else {})).get(path)
+    request.user = AnonymousUser()
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    with primary():  # what was just committed, not what a replica has caught up to
+        return view(request, *match.args, **match.kwargs)
+
+
+def file_for(path):
+    """Relative file for URL ``path``, or None if it cannot be one."""
+    parts = [p for p in unquote(path).split("/") if p]
+    if any(p in (".", "..") or "\\" in p for p in parts):
+        return None
+    return "/".join([*parts, "index.html"])
+
+
+def _fingerprint(stamps):
+    return hashlib.md5(repr(stamps).encode("utf-8")).hexdigest()
+
+
+def page_stamps():
+    """URL path -> fingerprint of what the page shows, for every page in the snapshot."""
+    from .views import _index_stamps, _list_stamps_by_building
+
+    index = _fingerprint(_index_stamps())
+    pages = {reverse("home"): index, reverse("buildings_index"): index}
+    for slug, stamps in _list_stamps_by_building().items():
+        pages[reverse("classroom_list_by_building", args=[slug])] = _fingerprint(stamps)
+
+    published = (Classroom.objects.filter(is_published=True)
+                 .values_list("building__slug", "room_number", "updated_at", "building__updated_at"))
+    for slug, room_number, updated_at, building_updated_at in published.iterator(chunk_size=2000):
+        pages[reverse("classroom_detail", args=[slug, room_number])] = _fingerprint(
+            (updated_at, building_updated_at))
+    return {path: stamp for path, stamp in pages.items() if file_for(path)}
+
+
+def templates_fingerprint():
+    """Digest of the template sources: a change re-renders everything."""
+    h = hashlib.md5()
+    dirs = [Path(d) for t in settings.TEMPLATES for d in t.get("DIRS", ())]
+    dirs.append(Path(__file__).parent / "templatetags")
+    for path in sorted(p for d in dirs if d.is_dir() for p in d.rglob("*") if p.is_file()):
+        h.update(str(path).encode("utf-8"))
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _write(target, content):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, target)  # readers never see a half-written page
+
+
+def _render_chunk(out_dir, paths):
+    results = []
+    for path in paths:
+        try:
+            response = render(path)
+            if response is None or response.status_code != 200:
+                raise ValueError(f"HTTP {getattr(response, 'status_code', 404)}")
+            content = response.content
+            name = file_for(path)
+            _write(Path(out_dir) / name, content)
+            results.append((path, {"file": name, "bytes": len(content),
+                                   "sha256": hashlib.sha256(content).hexdigest()}, None))
+        except Exception as exc:  # one broken room must not sink the build
+            results.append((path, None, f"{type(exc).__name__}: {exc}"))
+    return results
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _results(out_dir, paths, workers):
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _render_chunk(out_dir, chunk)
+        return
+    connections.close_all()  # never share a DB socket with forked workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for results in pool.map(_render_chunk, [out_dir] * len(chunks), chunks):
+            yield from results
+
+
+# --- manifest ----------------------------------------------------------------------
+def read_manifest(out_dir):
+    try:
+        with open(Path(out_dir) / MANIFEST, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _remove(out_dir, name):
+    target = out_dir / name
+    target.unlink(missing_ok=True)
+    parent = target.parent
+    while parent != out_dir:
+        try:
+            parent.rmdir()  # only succeeds once empty
+        except OSError:
+            break
+        parent = parent.parent
+
+
+def build(out_dir, *, workers=None, force=False, progress=None):
+    """Bring the snapshot in ``out_dir`` up to date; returns SnapshotStats."""
+    out_dir = Path(out_dir).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stats = SnapshotStats()
+    previous = read_manifest(out_dir)
+    code = templates_fingerprint()
+    if previous.get("templates") != code:
+        force = True
+    old_pages = previous.get("pages", {})
+
+    stamps = page_stamps()
+    pages = {}
+    todo = []
+    for path, stamp in stamps.items():
+        entry = old_pages.get(path)
+        if (not force and entry and entry.get("stamp") == stamp
+                and (out_dir / entry["file"]).is_file()):
+            pages[path] = entry
+            stats.unchanged += 1
+        else:
+            todo.append(path)
+
+    for path, entry, error in _results(str(out_dir), todo, workers or os.cpu_count() or 1):
+        if error:
+            stats.failed += 1
+            logger.warning("snapshot: cannot render %s: %s", path, error)
+        else:
+            pages[path] = {"stamp": stamps[path], **entry}
+            stats.rendered += 1
+            stats.bytes += entry["bytes"]
+        if progress:
+            progress(path, stats)
+
+    for path in old_pages.keys() - stamps.keys():
+        _remove(out_dir, old_pages[path]["file"])
+        stats.removed += 1
+
+    manifest = {"generated_at": timezone.now().isoformat(), "templates": code, "pages": pages}
+    _write(out_dir / MANIFEST, json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+    return stats
+
+
+# --- zero-DB fallback ------------------------------------------------------------------
+class SnapshotFallbackMiddleware(MiddlewareMixin):
+    """
+    Serve the pre-rendered page when a GET fails because the database is
+    unreachable (no-op unless CATALOG_SNAPSHOT_DIR is set).  Requests with
+    a query string get the error: a filtered or later page of a room list
+    is not in the snapshot, and its first page would be the wrong answer.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.root = Path(settings.CATALOG_SNAPSHOT_DIR).resolve() if settings.CATALOG_SNAPSHOT_DIR else None
+
+    def process_exception(self, request, exception):
+        if self.root is None or request.method not in ("GET", "HEAD") or not isinstance(exception, DatabaseError):
+            return None
+        if request.META.get("QUERY_STRING"):
+            return None
+        name = file_for(request.path_info)
+        target = name and self.root / name
+        if not target or not target.is_file():
+            return None
+        logger.error("database unavailable, serving snapshot of %s", request.path_info, exc_info=exception)
+        response = FileResponse(open(target, "rb"), content_type="text/html; charset=utf-8")
+        response["X-Snapshot"] = "fallback"
+        response["Cache-Control"] = "no-cache"
+        return response
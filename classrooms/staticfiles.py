@@ -0,0 +1,38 @@
+# classrooms/staticfiles.py
+"""
+WhiteNoise for sync and async middleware stacks.
+
+``WhiteNoiseMiddleware`` is sync-only, and one sync-only middleware makes
+Django run the whole request below it through ``async_to_sync``/
+``sync_to_async`` under ASGI, which turns the async views back into
+thread-bound ones.  Finding a static file is an in-memory lookup (a stat
+with WHITENOISE_AUTOREFRESH in development), so the async path just does it
+inline and awaits the rest of the stack.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
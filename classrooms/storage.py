@@ -0,0 +1,248 @@
+# classrooms/storage.py
+"""
+Content-addressed storage for uploaded images.
+
+With date-partitioned ``upload_to`` paths and ``AWS_S3_FILE_OVERWRITE =
+False`` every re-upload of the same photo became a new object.  The image
+fields now store through ``ContentAddressedStorage``, a thin wrapper around
+the configured default storage (local media or S3) that names each upload
+after the SHA-256 of its bytes:
+
+    cas/3f/3f9a...c1.jpg
+
+so a blob is stored once however many rows (or uploads) use it, and the
+bytes behind a URL never change: the URL can be served with
+``Cache-Control: immutable`` (``s3.S3Storage`` sets it on S3; put the same
+header on ``/media/cas/`` in the web server for local media).  Renditions and
+panorama tiles keep writing through the default storage under their own
+prefixes.  ``manage.py hash_media`` moves existing files to this layout.
+
+Like Django's FileField, nothing deletes blobs when rows go away; with
+sharing that is now a requirement rather than a habit.
+"""
+import hashlib
+import posixpath
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import Storage, default_storage
+from django.db import models, transaction
+from django.utils import timezone
+
+PREFIX = "cas"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def digest(content):
+    """SHA-256 hex digest and size of a File, read in chunks."""
+    h = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks():
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+def hashed_name(hexdigest, name):
+    """The blob name for content ``hexdigest`` uploaded as ``name`` (only its extension is kept)."""
+    ext = posixpath.splitext(name)[1].lower()
+    return f"{PREFIX}/{hexdigest[:2]}/{hexdigest}{ext}"
+
+
+def is_hashed(name):
+    return bool(name) and name.startswith(PREFIX + "/")
+
+
+class ContentAddressedStorage(Storage):
+    """Stores each distinct upload once, under its digest; reads go straight to ``backend``."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or default_storage
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = hashed_name(digest(content)[0], name or content.name or "")
+        # same name, same bytes: an existing blob is the upload
+        if not self.backend.exists(name):
+            content.seek(0)
+            name = self.backend.save(name, content, max_length=max_length)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    # --- everything else is the backend's ------------------------------------------
+    def _open(self, name, mode="rb"):
+        return self.backend.open(name, mode)
+
+    def delete(self, name):
+        return self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def content_addressed():
+    """``storage=`` callable for the image fields (keeps settings out of migrations)."""
+    return content_addressed_storage
+
+
+# --- moving existing files to the hashed layout ---------------------------------
+@dataclass
+class RehashStats:
+    rows: int = 0           # rows whose paths were rewritten
+    files: int = 0          # distinct old files read
+    missing: int = 0        # referenced but not in storage (left as they are)
+    bytes_before: int = 0   # size of those old files
+    bytes_stored: int = 0   # size of the blobs that had to be written
+    deleted: int = 0        # old files removed (delete_originals)
+
+    @property
+    def reclaimed(self):
+        return self.bytes_before - self.bytes_stored
+
+
+def hashed_fields():
+    """model -> its file fields stored through ContentAddressedStorage."""
+    found = {}
+    for model in apps.get_models():
+        fields = [f for f in model._meta.concrete_fields
+                  if isinstance(f, models.FileField) and f.storage is content_addressed_storage]
+        if fields:
+            found[model] = fields
+    return found
+
+
+class _Rehasher:
+    def __init__(self, backend, stats, dry_run):
+        self.backend = backend
+        self.stats = stats
+        self.dry_run = dry_run
+        self.moved = {}      # old name -> blob name, or None if missing
+        self.blobs = set()   # blob names known to exist (or to be written)
+
+    def move(self, name):
+        if name not in self.moved:
+            self.moved[name] = self._move(name)
+        return self.moved[name]
+
+    def _move(self, name):
+        if not self.backend.exists(name):
+            self.stats.missing += 1
+            return None
+        with self.backend.open(name, "rb") as fh:
+            hexdigest, size = digest(fh)
+            new = hashed_name(hexdigest, name)
+            self.stats.files += 1
+            self.stats.bytes_before += size
+            if new not in self.blobs and not self.backend.exists(new):
+                if not self.dry_run:
+                    fh.seek(0)
+                    self.backend.save(new, fh)
+                self.stats.bytes_stored += size
+            self.blobs.add(new)
+        return new
+
+    def rewrite(self, obj, fields):
+        """Point ``obj``'s files at their blobs; derived data keeps matching them."""
+        changed = False
+        for f in fields:
+            old = getattr(obj, f.attname).name
+            if not old or is_hashed(old):
+                continue
+            new = self.move(old)
+            if new is None:
+                continue
+            setattr(obj, f.attname, new)
+            changed = True
+            # renditions, placeholders and tiles were made from the same bytes: keep them
+            for manifest in (getattr(obj, "renditions", None), getattr(obj, "placeholders", None)):
+                entry = (manifest or {}).get(f.name)
+                if entry and entry.get("src") == old:
+                    entry["src"] = new
+            tiles = getattr(obj, "tiles", None)
+            if tiles and tiles.get("src") == old:
+                tiles["src"] = new
+        return changed
+
+
+def rehash_media(*, dry_run=False, delete_originals=False, batch_size=500, backend=None, progress=None):
+    """
+    Copy every file referenced by a content-addressed field to its hashed
+    name and rewrite the rows (one bulk UPDATE per batch, no signals).
+    ``delete_originals`` removes the old files once the rows are committed.
+    Returns RehashStats.
+    """
+    from . import cache as page_cache
+    from .models import Classroom
+
+    stats = RehashStats()
+    rehasher = _Rehasher(backend or default_storage, stats, dry_run)
+    now = timezone.now()
+    with transaction.atomic():
+        touched_rooms = set()
+        for model, fields in hashed_fields().items():
+            names = {f.name for f in model._meta.concrete_fields}
+            update = [f.name for f in fields] + [n for n in ("renditions", "placeholders", "tiles", "updated_at")
+                                                if n in names]
+            pending = []
+
+            def flush():
+                if pending and not dry_run:
+                    model._base_manager.bulk_update(pending, update)
+                stats.rows += len(pending)
+                pending.clear()
+                if progress:
+                    progress(model, stats)
+
+            legacy = models.Q()
+            for f in fields:
+                legacy |= (models.Q(**{f"{f.name}__gt": ""})
+                           & ~models.Q(**{f"{f.name}__startswith": PREFIX + "/"}))
+            for obj in model._base_manager.filter(legacy).order_by("pk").iterator(chunk_size=batch_size):
+                if not rehasher.rewrite(obj, fields):
+                    continue
+                if "updated_at" in names:
+                    obj.updated_at = now  # ETags change with the image URLs
+                if getattr(obj, "classroom_id", None):
+                    touched_rooms.add(obj.classroom_id)
+                pending.append(obj)
+                if len(pending) >= batch_size:
+                    flush()
+            flush()
+
+        if dry_run:
+            transaction.set_rollback(True)
+            return stats
+        # photos and panoramas feed their room's ETag, as in signals.py
+        Classroom.objects.filter(pk__in=touched_rooms).update(updated_at=now)
+        if stats.rows:
+            scopes = page_cache.all_scopes()
+            transaction.on_commit(lambda: page_cache.bump(*scopes))
+
+    if delete_originals:
+        for old, new in rehasher.moved.items():
+            if new and new != old:
+                rehasher.backend.delete(old)
+                stats.deleted += 1
+    return stats
@@ -0,0 +1,186 @@
+# classrooms/synthetic.py
+"""
+Synthetic catalog for load testing and query-count guards.
+
+``generate()`` bulk-inserts buildings, rooms, photos and panoramas with
+realistic-looking feature distributions.  Images are a handful of tiny
+JPEGs written to storage once and shared by every row, so a 50k-room
+catalog costs a few KB of media.  Every synthetic row is tagged with
+``prefix`` (building names/slugs, room/panorama external ids) so
+``clear()`` can remove it again without touching real data.
+
+bulk_create skips signals, so ``generate()`` does the work they would
+have done: feature masks, image renditions and placeholders, room cards,
+page-cache stamps and the search index.
+"""
+import io
+import random
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import cards, placeholders, renditions, search
+from .cache import bump, building_scope, catalog_scope, room_scope
+from .models import (
+    FEATURE_FLAGS, Building, BuildingResource, Classroom, ClassroomPhoto, Panorama,
+)
+
+# typical room sizes and how often they occur
+CAPACITIES = (12, 20, 24, 30, 35, 40, 48, 60, 80, 120, 200, 300)
+CAPACITY_WEIGHTS = (4, 8, 10, 14, 12, 12, 8, 6, 4, 3, 2, 1)
+ROOM_TYPES = ("CLASS", "LAB", "SEMINAR", "LECTURE")
+# per-feature odds: a few features are common, most are rare
+FEATURE_ODDS = (0.05, 0.1, 0.3, 0.6, 0.85)
+COLORS = ("#9d2235", "#2d6a4f", "#1d3557", "#e9c46a", "#6c757d", "#f4a261")
+
+BATCH_SIZE = 2000
+
+
+def _jpeg(color, size):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, "JPEG", quality=60)
+    return buf.getvalue()
+
+
+def _images(prefix, kind, size, count):
+    """Store ``count`` tiny JPEGs once; returns their storage names."""
+    names = []
+    for i in range(count):
+        name = f"synthetic/{prefix}-{kind}-{i}.jpg"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(_jpeg(COLORS[i % len(COLORS)], size)))
+        names.append(name)
+    return names
+
+
+def _bulk(model, objs, batch_size):
+    created = []
+    for i in range(0, len(objs), batch_size):
+        created += model.objects.bulk_create(objs[i:i + batch_size])
+    return created
+
+
+def _multi(rng, choices, odds):
+    return [value for value, _ in choices if rng.random() < odds]
+
+
+def generate(*, buildings_per_campus=10, rooms_per_building=50, photos_per_room=2,
+             panoramas_per_room=1, resources_per_building=2, campuses=None,
+             prefix="synth", seed=42, images=True, batch_size=BATCH_SIZE):
+    """Create a synthetic catalog; returns a dict of row counts."""
+    rng = random.Random(seed)
+    campuses = campuses or list(Building.Campus.values)
+    odds = {f: rng.choice(FEATURE_ODDS) for f in FEATURE_FLAGS}
+
+    if images:
+        previews = _images(prefix, "preview", (64, 40), 4)
+        photos = _images(prefix, "photo", (96, 64), 4)
+        panos = _images(prefix, "pano", (256, 128), 2)
+        # rows share a handful of files, so their renditions are built once
+        rendered = {name: renditions.build(name) for name in {*previews, *photos, *panos}}
+        measured = {name: placeholders.build(name) for name in {*previews, *photos}}
+    else:
+        previews = photos = panos = [""]
+        rendered = measured = {}
+
+    def _rendered(**fields):
+        return {f: rendered[name] for f, name in fields.items() if name in rendered}
+
+    def _measured(**fields):
+        return {f: measured[name] for f, name in fields.items() if name in measured}
+
+    with transaction.atomic():
+        buildings = []
+        for campus in campuses:
+            for i in range(buildings_per_campus):
+                name = f"{prefix} {campus.lower()} hall {i:04d}"
+                preview = rng.choice(previews)
+                buildings.append(Building(
+                    name=name, slug=slugify(name), campus=campus,
+                    preview_file=preview, renditions=_rendered(preview_file=preview),
+                    placeholders=_measured(preview_file=preview),
+                    description=f"Synthetic building {i} on {campus.title()} campus.",
+                    tech_contact_name="Help Desk", tech_contact_email="help@example.edu",
+                ))
+        buildings = _bulk(Building, buildings, batch_size)
+
+        rooms = []
+        for b in buildings:
+            for n in range(rooms_per_building):
+                room = Classroom(
+                    external_id=f"{prefix}-{b.pk}-{n}", building=b,
+                    room_number=f"{100 + n // 20 * 100 + n % 20}",
+                    room_type=rng.choice(ROOM_TYPES),
+                    capacity=rng.choices(CAPACITIES, CAPACITY_WEIGHTS)[0],
+                    summary=f"{rng.choice(ROOM_TYPES).title()} room",
+                    is_published=rng.random() < 0.92,
+                    preview_image_file=rng.choice(previews),
+                    seating_type=_multi(rng, Classroom.SEATING_CHOICES, 0.5),
+                    wireless_presentation=_multi(rng, Classroom.WIRELESS_CHOICES, 0.35),
+                    pc_type=_multi(rng, Classroom.PC_TYPE, 0.6),
+                    whiteboards_count=rng.randint(0, 3),
+                    projectors=rng.randint(0, 2),
+                    **{f: rng.random() < p for f, p in odds.items()},
+                )
+                room.feature_mask = room.compute_feature_mask()
+                room.renditions = _rendered(preview_image_file=room.preview_image_file.name)
+                room.placeholders = _measured(preview_image_file=room.preview_image_file.name)
+                cards._apply(room, cards.resolve(room))  # every synthetic room has a preview
+                rooms.append(room)
+        rooms = _bulk(Classroom, rooms, batch_size)
+
+        _bulk(ClassroomPhoto, [
+            ClassroomPhoto(classroom=r, image_file=photo, renditions=_rendered(image_file=photo),
+                           placeholders=_measured(image_file=photo),
+                           caption=f"View {k + 1}", order=k)
+            for r in rooms for k in range(photos_per_room) for photo in [rng.choice(photos)]
+        ], batch_size)
+        _bulk(Panorama, [
+            Panorama(external_id=f"{r.external_id}-pano-{k}", classroom=r, name=f"Pano {k + 1}",
+                     image_file=pano, preview_file=preview, order=k,
+                     renditions=_rendered(image_file=pano, preview_file=preview),
+                     placeholders=_measured(preview_file=preview))
+            for r in rooms for k in range(panoramas_per_room)
+            for pano, preview in [(rng.choice(panos), rng.choice(previews))]
+        ], batch_size)
+        _bulk(BuildingResource, [
+            BuildingResource(building=b, title=f"{b.name} guide {k + 1}",
+                             url=f"https://example.edu/{b.slug}/{k}", order=k)
+            for b in buildings for k in range(resources_per_building)
+        ], batch_size)
+
+        transaction.on_commit(lambda: bump(catalog_scope(), *(building_scope(b.slug) for b in buildings)))
+        search.rebuild()
+
+    return {
+        "buildings": len(buildings),
+        "rooms": len(rooms),
+        "photos": len(rooms) * photos_per_room,
+        "panoramas": len(rooms) * panoramas_per_room,
+        "resources": len(buildings) * resources_per_building,
+    }
+
+
+def clear(prefix="synth"):
+    """Delete every row created by ``generate(prefix=...)``; returns the room count."""
+    with transaction.atomic():
+        buildings = Building.objects.filter(name__startswith=f"{prefix} ")
+        slugs = list(buildings.values_list("slug", flat=True))
+        rooms = Classroom.objects.filter(building__in=buildings)
+        scopes = [catalog_scope(), *(building_scope(s) for s in slugs),
+                  *(room_scope(s, rn) for s, rn in rooms.values_list("building__slug", "room_number"))]
+        n = len(scopes) - 1 - len(slugs)
+        # children first; raw deletes skip the per-row signal handlers, whose
+        # work (cache stamps, search entries) is done once below instead
+        ClassroomPhoto.objects.filter(classroom__in=rooms)._raw_delete(using="default")
+        Panorama.objects.filter(classroom__in=rooms)._raw_delete(using="default")
+        rooms._raw_delete(using="default")
+        BuildingResource.objects.filter(building__in=buildings)._raw_delete(using="default")
+        buildings._raw_delete(using="default")
+        transaction.on_commit(lambda: bump(*scopes))
+        search.rebuild()
+    return n
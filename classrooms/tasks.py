@@ -0,0 +1,80 @@
+# classrooms/tasks.py
+"""Background jobs queued by ``signals.py`` and run by ``manage.py run_worker``."""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as page_cache
+from . import cards, renditions, tiles
+from .jobs import enqueue, task
+from .models import Building, Classroom, Panorama
+from .snapshot import render
+
+logger = logging.getLogger(__name__)
+
+
+def _pages(instance):
+    """(scopes, paths) of the cached pages that show ``instance``'s images."""
+    if isinstance(instance, Building):
+        return [page_cache.catalog_scope()], [reverse("buildings_index")]
+    room = instance if isinstance(instance, Classroom) else instance.classroom
+    slug = room.building.slug
+    scopes = [page_cache.building_scope(slug), page_cache.room_scope(slug, room.room_number)]
+    paths = [reverse("classroom_list_by_building", args=[slug])]
+    if room.is_published:
+        paths.append(reverse("classroom_detail", args=[slug, room.room_number]))
+    return scopes, paths
+
+
+def _republish(instance):
+    if settings.JOBS_EAGER:
+        return  # ran inside the save, whose own bump already covers it
+    # the results were written with .update(); move the timestamp the pages'
+    # ETag / Last-Modified and the snapshot stamps are computed from
+    now = timezone.now()
+    if isinstance(instance, Building):
+        Building.objects.filter(pk=instance.pk).update(updated_at=now)
+    else:
+        room_id = instance.pk if isinstance(instance, Classroom) else instance.classroom_id
+        Classroom.objects.filter(pk=room_id).update(updated_at=now)
+    if not page_cache.is_shared():
+        # the web processes' own caches: the new updated_at already moves the
+        # ETag their cached pages are keyed on, and a warmed page would land here
+        return
+    scopes, paths = _pages(instance)
+
+    def publish():
+        page_cache.bump(*scopes)
+        enqueue(warm_pages, paths=paths)
+    transaction.on_commit(publish)
+
+
+@task
+def render_images(model, pk):
+    instance = apps.get_model(model)._base_manager.filter(pk=pk).first()
+    if instance is not None and renditions.refresh(instance):
+        if not isinstance(instance, Building):
+            # the room's card carries a copy of these renditions
+            cards.refresh_room(instance.pk if isinstance(instance, Classroom) else instance.classroom_id)
+        _republish(instance)
+
+
+@task
+def tile_panorama(pk):
+    pano = Panorama.objects.filter(pk=pk).first()
+    if pano is not None and tiles.refresh(pano):
+        cards.refresh_room(pano.classroom_id)  # a derived preview may be the card now
+        _republish(pano)
+
+
+@task
+def warm_pages(paths):
+    """Render ``paths`` through their views so the next visitor gets a page-cache hit."""
+    for path in paths:
+        response = render(path)
+        if response is not None and response.status_code != 200:
+            logger.info("not warming %s: HTTP %s", path, response.status_code)
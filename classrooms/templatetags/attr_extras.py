@@ -1,16 +1,25 @@
 # classrooms/templatetags/attr_extras.py
 from django import template
 
+from classrooms.features import BY_NAME
+
 register = template.Library()
 
 @register.filter
 def attr(obj, field_name):
     return getattr(obj, field_name)
 
+# room features come from the precomputed registry; anything else falls back to _meta
 @register.simple_tag
 def field_verbose(obj, field_name):
+    feature = BY_NAME.get(field_name)
+    if feature is not None:
+        return feature.verbose_name
     return obj._meta.get_field(field_name).verbose_name
 
 @register.simple_tag
 def field_type(obj, field_name):
+    feature = BY_NAME.get(field_name)
+    if feature is not None:
+        return feature.internal_type
     return obj._meta.get_field(field_name).get_internal_type()
@@ -0,0 +1,55 @@
+# classrooms/templatetags/images.py
+import json
+
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from classrooms import renditions, tiles
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(obj, field_name, sizes="100vw", **attrs):
+    """
+    ``{% picture room "preview_image_file" sizes="33vw" alt="..." class="img-cover" %}``
+
+    A <picture> with WebP and JPEG srcsets when renditions exist for the
+    field's current file, otherwise a plain <img> of the original.  Either
+    way a current placeholder adds the intrinsic size and a blurred
+    background that shows until the image has loaded.
+    """
+    fieldfile = getattr(obj, field_name)
+    if not fieldfile:
+        return ""
+    attrs = {"loading": "lazy", "decoding": "async", **attrs}
+    placeholder = (getattr(obj, "placeholders", None) or {}).get(field_name)
+    if renditions.is_current(placeholder, fieldfile):
+        attrs.update(width=placeholder["width"], height=placeholder["height"])
+        style = f"background:url({placeholder['lqip']}) center/cover no-repeat"
+        attrs["style"] = f"{style};{attrs['style']}" if attrs.get("style") else style
+    entry = (obj.renditions or {}).get(field_name)
+    if not renditions.is_current(entry, fieldfile):
+        return format_html("<img src=\"{}\"{}>", fieldfile.url, flatatt(attrs))
+
+    *sources, (fallback, _, _, _) = renditions.FORMATS
+    largest = entry[fallback][-1]
+    attrs.update(width=entry["width"], height=entry["height"])
+    html = format_html_join("", '<source type="{}" srcset="{}" sizes="{}">', (
+        (mime, renditions.srcset(entry, key), sizes) for key, _, mime, _ in sources
+    ))
+    img = format_html('<img src="{}" srcset="{}" sizes="{}"{}>',
+                      default_storage.url(largest[1]), renditions.srcset(entry, fallback), sizes, flatatt(attrs))
+    return format_html("<picture>{}{}</picture>", html, img)
+
+
+_JS_ESCAPES = {ord("<"): "\\u003C", ord(">"): "\\u003E", ord("&"): "\\u0026"}
+
+
+@register.filter
+def pannellum_source(pano):
+    """JS object literal with the scene's image keys: multires tiles or the equirectangular."""
+    return mark_safe(json.dumps(tiles.viewer_source(pano)).translate(_JS_ESCAPES))
@@ -1,14 +1,43 @@
 # classrooms/tests.py
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
 import io
+import json
 import shutil
 import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.db import OperationalError, connection, connections
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.template.defaultfilters import filesizeformat
+from django.test.utils import CaptureQueriesContext
+from django.http import Http404
 from django.urls import reverse
+from django.utils import timezone
 from PIL import Image
 
+from . import cache as page_cache
+from . import (
+    async_views, checks, exports, features, jobs, memory, memory_views, metrics, placeholders, renditions, replicas,
+    restore, search, services, snapshot, storage, synthetic, tasks, views,
+)
 from .models import (
-    Building, Classroom, Panorama, ClassroomPhoto, BuildingResource
+    Building, Classroom, Panorama, ClassroomPhoto, BuildingResource, SearchEntry, Job, feature_mask_for
 )
 
 # Use a temp MEDIA_ROOT and local storage so tests never hit S3
@@ -17,14 +46,29 @@ TEMP_MEDIA = tempfile.mkdtemp()
 @override_settings(
     MEDIA_ROOT=TEMP_MEDIA,
     DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+    # admin pages need static URLs without a collectstatic manifest
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+    # media work runs inline on save; JobQueueTests turn the queue back on
+    JOBS_EAGER=True,
 )
-class ClassroomAppTests(TestCase):
+class CatalogTestCase(TestCase):
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
 
+    def setUp(self):
+        # page cache lives in LocMem and would otherwise leak between tests
+        cache.clear()
+
     # ------------- helpers -----------------
+    def _reads(self, ctx):
+        """Queries captured by ``ctx`` minus ATOMIC_REQUESTS savepoints."""
+        return [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+
     def _img_file(self, name="test.jpg", size=(8, 8), color=(200, 50, 50)):
         """Make a tiny in-memory JPEG."""
         buf = io.BytesIO()
@@ -60,6 +104,8 @@ class ClassroomAppTests(TestCase):
         )
         return b, c
 
+
+class ClassroomAppTests(CatalogTestCase):
     # ------------- model tests -----------------
     def test_building_slug_autofilled(self):
         b = Building.objects.create(name="TECH Center", campus=Building.Campus.MAIN)
@@ -119,7 +165,7 @@ class ClassroomAppTests(TestCase):
     def test_detail_renders_pano_and_photos(self):
         _, room = self._seed()  # make a building, room, pano, photo
 
-        url = reverse('classroom_detail', args=[room.pk])
+        url = reverse('classroom_detail', args=[room.building.slug, room.room_number])
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 200)
 
@@ -130,4 +176,1549 @@ class ClassroomAppTests(TestCase):
         # thumbs exist
         self.assertContains(resp, 'class="sidebar-thumbs"', html=False)
         self.assertContains(resp, '<img', html=False)
-    
\ No newline at end of file
+    
+
+class PageCacheTests(CatalogTestCase):
+    def test_second_request_is_a_hit_with_only_the_validator_query(self):
+        b, room = self._seed()
+        urls = [
+            reverse("buildings_index"),
+            reverse("classroom_list_by_building", args=[b.slug]),
+            reverse("classroom_detail", args=[b.slug, room.room_number]),
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url)["X-Page-Cache"], "miss")
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            # the only read is the single aggregate behind ETag / Last-Modified
+            self.assertEqual(len(self._reads(ctx)), 1, self._reads(ctx))
+            self.assertEqual(resp["X-Page-Cache"], "hit")
+            self.assertEqual(resp.status_code, 200)
+
+    def test_classroom_edit_invalidates_list_and_detail(self):
+        b, room = self._seed()
+        list_url = reverse("classroom_list_by_building", args=[b.slug])
+        detail_url = reverse("classroom_detail", args=[b.slug, room.room_number])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.capacity = 123
+            room.save()
+
+        for url in (list_url, detail_url):
+            resp = self.client.get(url)
+            self.assertEqual(resp["X-Page-Cache"], "miss")
+            self.assertContains(resp, "123")
+
+    def test_building_edit_invalidates_index_and_room_pages(self):
+        b, room = self._seed()
+        detail_url = reverse("classroom_detail", args=[b.slug, room.room_number])
+        self.client.get(reverse("buildings_index"))
+        self.client.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            b.tech_contact_name = "Helpdesk Harper"
+            b.save()
+
+        self.assertContains(self.client.get(reverse("buildings_index")), b.name)
+        self.assertContains(self.client.get(detail_url), "Helpdesk Harper")
+
+    def test_media_and_resource_edits_invalidate_building_list(self):
+        b, room = self._seed()
+        list_url = reverse("classroom_list_by_building", args=[b.slug])
+        self.client.get(list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BuildingResource.objects.create(building=b, title="Projector how-to", url="https://example.com")
+        self.assertContains(self.client.get(list_url), "Projector how-to")
+        self.assertEqual(self.client.get(list_url)["X-Page-Cache"], "hit")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.photos.all().delete()
+        self.assertEqual(self.client.get(list_url)["X-Page-Cache"], "miss")
+
+    def test_unrelated_building_stays_cached(self):
+        b, room = self._seed()
+        other = Building.objects.create(name="Tuttleman")
+        list_url = reverse("classroom_list_by_building", args=[b.slug])
+        self.client.get(list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Classroom.objects.create(external_id="t-1", building=other, room_number="1", is_published=True)
+        self.assertEqual(self.client.get(list_url)["X-Page-Cache"], "hit")
+
+    def test_unpublished_room_is_not_cached_as_404(self):
+        b, room = self._seed()
+        Classroom.objects.filter(pk=room.pk).update(is_published=False)
+        url = reverse("classroom_detail", args=[b.slug, room.room_number])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.is_published = True
+            room.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_query_strings_do_not_multiply_entries(self):
+        b, room = self._seed()
+        detail_url = reverse("classroom_detail", args=[b.slug, room.room_number])
+        list_url = reverse("classroom_list_by_building", args=[b.slug])
+        self.client.get(detail_url)
+        self.assertEqual(self.client.get(detail_url, {"utm_source": "portal"})["X-Page-Cache"], "hit")
+
+        self.client.get(list_url, {"wireless": ["kramer", "apple_tv"]})
+        resp = self.client.get(list_url, {"wireless": ["apple_tv", "kramer"], "junk": "x", "page": "1"})
+        self.assertEqual(resp["X-Page-Cache"], "hit")
+        # past the last page Paginator renders the last page; that copy is not stored
+        self.client.get(list_url, {"page": 9999})
+        self.assertEqual(self.client.get(list_url, {"page": 9999})["X-Page-Cache"], "miss")
+
+    def test_evicted_version_stamp_does_not_serve_stale_page(self):
+        b, room = self._seed()
+        url = reverse("classroom_list_by_building", args=[b.slug])
+        self.client.get(url)
+        cache.delete(page_cache.VERSION_PREFIX + page_cache.building_scope(b.slug))
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "miss")
+
+
+class ConditionalGetTests(CatalogTestCase):
+    def _urls(self, b, room):
+        return [
+            reverse("buildings_index"),
+            reverse("classroom_list_by_building", args=[b.slug]),
+            reverse("classroom_detail", args=[b.slug, room.room_number]),
+        ]
+
+    def test_validators_emitted_and_304_skips_rendering(self):
+        b, room = self._seed()
+        for url in self._urls(b, room):
+            resp = self.client.get(url)
+            self.assertTrue(resp.has_header("ETag"))
+            self.assertTrue(resp.has_header("Last-Modified"))
+            self.assertIn("no-cache", resp["Cache-Control"])
+
+            with CaptureQueriesContext(connection) as ctx:
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+            self.assertEqual(len(self._reads(ctx)), 1)
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.content, b"")
+
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=resp["Last-Modified"])
+            self.assertEqual(since.status_code, 304)
+
+    def test_room_and_media_edits_change_etag(self):
+        b, room = self._seed()
+        list_url, detail_url = self._urls(b, room)[1:]
+        before = {u: self.client.get(u)["ETag"] for u in (list_url, detail_url)}
+
+        ClassroomPhoto.objects.create(classroom=room, caption="Back wall", order=2)
+        for url in (list_url, detail_url):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=before[url])
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotEqual(resp["ETag"], before[url])
+
+    def test_resource_delete_and_unpublish_change_list_etag(self):
+        b, room = self._seed()
+        res = BuildingResource.objects.create(building=b, title="Guide", url="https://example.com")
+        list_url = reverse("classroom_list_by_building", args=[b.slug])
+
+        etag = self.client.get(list_url)["ETag"]
+        res.delete()
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(list_url)["ETag"]
+        Classroom.objects.filter(pk=room.pk).delete()
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_pages_still_404(self):
+        self.assertEqual(self.client.get(reverse("classroom_list_by_building", args=["nope"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("classroom_detail", args=["nope", "1"])).status_code, 404)
+
+
+class RoomListFilterTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.b = Building.objects.create(name="Tuttleman Learning Center")
+        rows = [
+            ("101", 20, "kramer", dict(interactive_display=True)),
+            ("102", 60, "kramer,apple_tv", dict(web_conference_camera=True)),
+            ("103", 120, "screenbeam", dict(web_conference_camera=True, interactive_display=True)),
+            ("104", 45, "", {}),
+        ]
+        for number, capacity, wireless, flags in rows:
+            Classroom.objects.create(
+                external_id=f"tlc-{number}", building=self.b, room_number=number,
+                capacity=capacity, wireless_presentation=wireless, is_published=True, **flags,
+            )
+        self.url = reverse("classroom_list_by_building", args=[self.b.slug])
+
+    def _rooms(self, **params):
+        resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, 200)
+        return [r.room_number for r in resp.context["rooms"]]
+
+    def test_no_params_lists_everything_by_room_number(self):
+        self.assertEqual(self._rooms(), ["101", "102", "103", "104"])
+
+    def test_wireless_and_feature_filters_are_combined(self):
+        self.assertEqual(self._rooms(wireless="kramer"), ["101", "102"])
+        self.assertEqual(self._rooms(wireless=["kramer", "apple_tv"]), ["102"])
+        self.assertEqual(self._rooms(feature="web_conference_camera"), ["102", "103"])
+        self.assertEqual(self._rooms(feature=["web_conference_camera", "interactive_display"]), ["103"])
+
+    def test_capacity_range_and_sort(self):
+        self.assertEqual(self._rooms(min_capacity=40, max_capacity=100), ["102", "104"])
+        self.assertEqual(self._rooms(sort="cap-desc"), ["103", "102", "104", "101"])
+
+    def test_bad_params_are_ignored(self):
+        self.assertEqual(self._rooms(wireless="chromecast", feature="is_published",
+                                     min_capacity="lots", sort="drop table"),
+                         ["101", "102", "103", "104"])
+
+    def test_pills_are_toggle_links(self):
+        resp = self.client.get(self.url, {"wireless": "kramer"})
+        pills = {p["label"]: p for p in resp.context["pills"]}
+        self.assertTrue(pills["Kramer"]["active"])
+        self.assertEqual(pills["Kramer"]["url"], "?")
+        self.assertEqual(pills["Zoom Camera"]["url"], "?wireless=kramer&feature=web_conference_camera")
+        self.assertContains(resp, 'href="?wireless=kramer&amp;feature=web_conference_camera"')
+
+    def test_paginates_and_keeps_filters_in_page_links(self):
+        from . import views
+        for n in range(views.ROOMS_PER_PAGE + 1):
+            Classroom.objects.create(external_id=f"x-{n}", building=self.b, room_number=f"9{n:02d}",
+                                     is_published=True, wireless_presentation="kramer")
+        resp = self.client.get(self.url, {"wireless": "kramer"})
+        self.assertEqual(len(resp.context["rooms"]), views.ROOMS_PER_PAGE)
+        self.assertEqual(resp.context["next_url"], "?wireless=kramer&page=2")
+        second = self.client.get(self.url, {"wireless": "kramer", "page": 2})
+        self.assertEqual(len(second.context["rooms"]), 3)
+
+
+class FeatureMaskTests(CatalogTestCase):
+    def test_mask_maintained_on_save_and_update_fields(self):
+        b = Building.objects.create(name="Paley")
+        room = Classroom.objects.create(external_id="p-1", building=b, room_number="1",
+                                        class_capture=True, document_camera=True)
+        self.assertEqual(room.feature_mask, feature_mask_for("class_capture", "document_camera"))
+
+        room.class_capture = False
+        room.save(update_fields=["class_capture"])
+        room.refresh_from_db()
+        self.assertEqual(room.feature_mask, feature_mask_for("document_camera"))
+
+    def test_with_features_matches_per_column_filters(self):
+        b = Building.objects.create(name="Paley")
+        combos = [(), ("class_capture",), ("class_capture", "document_camera"),
+                  ("document_camera", "hdesk", "lecd")]
+        for i, combo in enumerate(combos):
+            Classroom.objects.create(external_id=f"p-{i}", building=b, room_number=str(i),
+                                     **{f: True for f in combo})
+        for combo in combos:
+            expected = set(Classroom.objects.filter(**{f: True for f in combo}).values_list("pk", flat=True))
+            got = set(Classroom.objects.with_features(*combo).values_list("pk", flat=True))
+            self.assertEqual(got, expected, combo)
+
+    def test_with_features_is_a_single_bitwise_predicate(self):
+        sql = str(Classroom.objects.with_features("class_capture", "hdesk").query)
+        self.assertIn("&", sql)
+        self.assertNotIn('"class_capture"', sql.split("WHERE", 1)[1])
+
+    def test_unknown_feature_raises(self):
+        with self.assertRaises(KeyError):
+            Classroom.objects.with_features("teleporter")
+
+
+class RoomFinderApiTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        main = Building.objects.create(name="Alter Hall", campus=Building.Campus.MAIN)
+        hsc = Building.objects.create(name="MERB", campus=Building.Campus.HSC)
+        self.rooms = [
+            Classroom.objects.create(external_id="a-1", building=main, room_number="101", capacity=30,
+                                     wireless_presentation="kramer", class_capture=True, is_published=True),
+            Classroom.objects.create(external_id="a-2", building=main, room_number="102", capacity=150,
+                                     seating_type="tablet armchairs", pc_type="windows", is_published=True),
+            Classroom.objects.create(external_id="m-1", building=hsc, room_number="201", capacity=60,
+                                     wireless_presentation="kramer,screenbeam", class_capture=True,
+                                     is_published=True),
+            Classroom.objects.create(external_id="m-2", building=hsc, room_number="202", capacity=10,
+                                     is_published=False),
+        ]
+        self.url = reverse("api_rooms")
+
+    def test_filters_across_buildings(self):
+        data = self.client.get(self.url, {"feature": "class_capture", "wireless": "kramer"}).json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual([r["external_id"] for r in data["results"]], ["a-1", "m-1"])
+        self.assertIn("class_capture", data["results"][0]["features"])
+
+        data = self.client.get(self.url, {"campus": "HSC", "min_capacity": 50}).json()
+        self.assertEqual([r["external_id"] for r in data["results"]], ["m-1"])
+
+    def test_facets_count_the_filtered_set(self):
+        data = self.client.get(self.url, {"campus": "MAIN"}).json()
+        facets = data["facets"]
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(facets["campus"]["MAIN"], 2)
+        self.assertEqual(facets["campus"]["HSC"], 0)
+        self.assertEqual(facets["wireless"]["kramer"], 1)
+        self.assertEqual(facets["seating"]["tablet armchairs"], 1)
+        self.assertEqual(facets["pc_type"]["windows"], 1)
+        self.assertEqual(facets["feature"]["class_capture"], 1)
+        self.assertEqual(facets["capacity"]["100-199"], 1)
+
+    def test_query_budget_is_constant(self):
+        for i in range(30):
+            Classroom.objects.create(external_id=f"x-{i}", building=self.rooms[0].building,
+                                     room_number=f"9{i:02d}", is_published=True, class_capture=True)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, {"feature": "class_capture", "page_size": 100})
+        self.assertEqual(resp.json()["count"], 32)
+        # the validator, one aggregate for count + all facets, one for the page of rows
+        self.assertEqual(len(self._reads(ctx)), 3, self._reads(ctx))
+
+    def test_cached_on_normalized_filters_and_invalidated_by_edits(self):
+        first = self.client.get(self.url + "?wireless=kramer&campus=MAIN&bogus=1")
+        self.assertEqual(first["X-Page-Cache"], "miss")
+        again = self.client.get(self.url + "?campus=MAIN&wireless=kramer")
+        self.assertEqual(again["X-Page-Cache"], "hit")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rooms[0].capacity = 99
+            self.rooms[0].save()
+        data = self.client.get(self.url + "?campus=MAIN&wireless=kramer")
+        self.assertEqual(data["X-Page-Cache"], "miss")
+        self.assertEqual(data.json()["results"][0]["capacity"], 99)
+
+    def test_edit_without_bump_is_not_served_from_cache(self):
+        # another worker's process-local cache saw the bump, this one didn't
+        self.client.get(self.url)
+        Classroom.objects.filter(pk=self.rooms[0].pk).update(capacity=77, updated_at=timezone.now())
+        data = self.client.get(self.url)
+        self.assertEqual(data["X-Page-Cache"], "miss")
+        self.assertEqual(data.json()["results"][0]["capacity"], 77)
+
+    def test_paging(self):
+        data = self.client.get(self.url, {"page_size": 1, "page": 2, "sort": "cap-desc"}).json()
+        self.assertEqual(data["count"], 3)
+        self.assertEqual([r["external_id"] for r in data["results"]], ["m-1"])
+
+
+class SearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alter = Building.objects.create(name="Alter Hall", description="Home of the Fox School of Business")
+        self.room = Classroom.objects.create(external_id="a-231", building=self.alter, room_number="231",
+                                             summary="Tiered lecture hall with lecture capture",
+                                             is_published=True)
+        self.hidden = Classroom.objects.create(external_id="a-999", building=self.alter, room_number="999",
+                                               summary="Storage", is_published=False)
+        BuildingResource.objects.create(building=self.alter, title="Using the Kramer VIA", url="https://example.com")
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(SearchEntry.objects.count(), 4)
+        self.assertEqual([e.title for e in search.search("tiered")], ["Alter Hall 231"])
+
+        self.alter.name = "Alter Hall East"
+        self.alter.save()
+        self.assertEqual([e.title for e in search.search("tiered")], ["Alter Hall East 231"])
+
+        self.room.delete()
+        self.assertEqual(search.search("tiered"), [])
+
+    def test_prefix_matching_and_unpublished_hidden(self):
+        titles = [e.title for e in search.search("alt")]
+        self.assertIn("Alter Hall", titles)
+        self.assertNotIn("Alter Hall 999", titles)
+        self.assertEqual([e.title for e in search.search("kram")], ["Using the Kramer VIA"])
+        self.assertEqual([e.title for e in search.search("fox busi")], ["Alter Hall"])
+
+    def test_search_page_and_suggest(self):
+        resp = self.client.get(reverse("search"), {"q": "lecture"})
+        self.assertContains(resp, "Alter Hall 231")
+        data = self.client.get(reverse("search_suggest"), {"q": "alter 23"}).json()
+        self.assertEqual([r["title"] for r in data["results"]], ["Alter Hall 231"])
+        self.assertEqual(self.client.get(reverse("search_suggest"), {"q": "  "}).json()["results"], [])
+
+    def test_admin_search_uses_index_and_sees_unpublished(self):
+        from django.contrib.auth import get_user_model
+        admin_user = get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+        resp = self.client.get(reverse("admin:classrooms_classroom_changelist"), {"q": "storage"})
+        self.assertEqual(list(resp.context["cl"].result_list), [self.hidden])
+
+    def test_building_rename_reindexes_in_bulk(self):
+        for n in range(30):
+            Classroom.objects.create(external_id=f"a-{n}", building=self.alter, room_number=str(n))
+        with CaptureQueriesContext(connection) as ctx:
+            self.alter.name = "Alter Hall East"
+            self.alter.save()
+        writes = [q for q in self._reads(ctx) if 'INTO "classrooms_searchentry"' in q]
+        self.assertEqual(len(writes), 2)  # one upsert for the rooms, one for the resources
+        self.assertEqual(len(search.search("east", published_only=False)), 34)
+
+    def test_admin_search_is_not_capped_by_ranking(self):
+        ids = search.object_ids(SearchEntry.Kind.ROOM, "alter")
+        self.assertEqual(set(Classroom.objects.filter(pk__in=ids)), {self.room, self.hidden})
+        self.assertNotIn("LIMIT", str(Classroom.objects.filter(pk__in=ids).query).upper())
+
+    def test_rebuild_recreates_entries(self):
+        SearchEntry.objects.all().delete()
+        self.assertEqual(search.rebuild(), 4)
+        self.assertEqual(len(search.search("alter")), 3)
+
+
+class FeatureRegistryTests(CatalogTestCase):
+    def test_registry_matches_model_metadata(self):
+        for f in features.FEATURES:
+            field = Classroom._meta.get_field(f.name)
+            self.assertEqual(f.verbose_name, field.verbose_name)
+            self.assertEqual(f.internal_type, field.get_internal_type())
+
+    def test_list_pills_come_from_registry(self):
+        from . import filters
+        self.assertEqual([(v, label) for p, v, label in filters.PILLS if p == "feature"], list(features.PILLS))
+
+    def test_detail_table_and_highlights_from_registry(self):
+        b, room = self._seed()
+        room.class_capture = True
+        room.wireless_presentation = ["kramer"]
+        room.whiteboards_count = 3
+        room.save()
+        self.assertEqual(features.highlights(room), ["Panopto capture", "Wireless: Kramer"])
+        table = dict(features.feature_table(room))
+        self.assertIn(("Class Capture (Panopto)", "Yes"), table["Presentation"])
+        self.assertIn(("Wireless Presentation", "Kramer"), table["Presentation"])
+        self.assertIn(("Whiteboards", 3), table["Boards"])
+
+        resp = self.client.get(reverse("classroom_detail", args=[b.slug, room.room_number]))
+        self.assertContains(resp, "Panopto capture")
+        self.assertContains(resp, "Class Capture (Panopto)")
+
+    def test_admin_change_form_covers_every_feature(self):
+        from django.contrib.auth import get_user_model
+        _, room = self._seed()
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "a@example.com", "pw"))
+        resp = self.client.get(reverse("admin:classrooms_classroom_change", args=[room.pk]))
+        self.assertEqual(resp.status_code, 200)
+        for f in features.FEATURES:
+            self.assertContains(resp, f'name="{f.name}"')
+
+
+class MetricsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.histograms.clear()
+        metrics.registry.counters.clear()
+
+    def test_server_timing_header(self):
+        b, room = self._seed()
+        url = reverse("classroom_detail", args=[b.slug, room.room_number])
+        miss = self.client.get(url)["Server-Timing"]
+        self.assertRegex(miss, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(miss, r"tpl;dur=[\d.]+")
+        self.assertIn('cache;desc="0 hit/1 miss"', miss)
+        self.assertRegex(miss, r"total;dur=[\d.]+")
+        self.assertIn('cache;desc="1 hit/0 miss"', self.client.get(url)["Server-Timing"])
+
+    async def test_queries_counted_under_async_handler(self):
+        # the ORM runs in sync_to_async's thread, not on the event loop with the middleware
+        b, room = await sync_to_async(self._seed)()
+        resp = await self.async_client.get(reverse("classroom_detail", args=[b.slug, room.room_number]))
+        queries = int(resp["Server-Timing"].split('desc="', 1)[1].split(" ", 1)[0])
+        self.assertGreater(queries, 0)
+
+    def test_prometheus_histograms_named_by_view(self):
+        b, room = self._seed()
+        self.client.get(reverse("classroom_list_by_building", args=[b.slug]))
+        self.client.get(reverse("classroom_list_by_building", args=[b.slug]))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn("# TYPE cphc_request_duration_seconds histogram", body)
+        self.assertIn('cphc_request_duration_seconds_count{view="classroom_list_by_building"} 2', body)
+        self.assertIn('cphc_db_queries_bucket{view="classroom_list_by_building",le="+Inf"} 2', body)
+        self.assertIn('cphc_page_cache_total{result="hit",view="classroom_list_by_building"} 1', body)
+        self.assertIn('cphc_requests_total{status="200",view="classroom_list_by_building"} 2', body)
+
+    def test_worker_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(METRICS_DIR=tmp):
+            # pretend another gunicorn worker already flushed its numbers
+            other = metrics.Registry()
+            other.observe("cphc_request_duration_seconds", "buildings_index", 0.2)
+            (Path(tmp) / "99999-1.json").write_text(json.dumps(other.dump()))
+
+            self.client.get(reverse("buildings_index"))
+            body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('cphc_request_duration_seconds_count{view="buildings_index"} 2', body)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_protects_endpoint(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        ok = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(ok.status_code, 200)
+
+
+class SyntheticCatalogTests(CatalogTestCase):
+    def test_generate_then_clear(self):
+        b, room = self._seed()
+        counts = synthetic.generate(buildings_per_campus=2, rooms_per_building=5,
+                                    campuses=["MAIN", "HSC"], seed=7)
+        self.assertEqual(counts["rooms"], 20)
+        self.assertEqual(Classroom.objects.filter(external_id__startswith="synth-").count(), 20)
+        sample = Classroom.objects.filter(external_id__startswith="synth-").first()
+        self.assertEqual(sample.feature_mask, sample.compute_feature_mask())
+        self.assertEqual(sample.photos.count(), 2)
+        self.assertTrue(sample.preview_image_file.storage.exists(sample.preview_image_file.name))
+        # bulk inserts skip signals, so the index was rebuilt explicitly
+        self.assertTrue(SearchEntry.objects.filter(kind="room", object_id=sample.pk).exists())
+
+        self.assertEqual(synthetic.clear(), 20)
+        self.assertEqual(list(Classroom.objects.all()), [room])
+        self.assertEqual(Building.objects.count(), 1)
+        self.assertFalse(ClassroomPhoto.objects.exclude(classroom=room).exists())
+
+    def test_bench_views_writes_report(self):
+        synthetic.generate(buildings_per_campus=1, rooms_per_building=3, campuses=["MAIN"],
+                           photos_per_room=0, panoramas_per_room=0, images=False)
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "bench.json"
+            call_command("bench_views", requests=3, output=str(out), stdout=io.StringIO())
+            report = json.loads(out.read_text())
+        self.assertEqual(report["meta"]["rooms"], 3)
+        detail = report["results"]["room_detail"]
+        self.assertEqual(detail["status"], {"200": 3})
+        self.assertLessEqual(detail["latency_ms"]["p50"], detail["latency_ms"]["p99"])
+        self.assertIn("p95", report["results"]["buildings_index"]["latency_ms"])
+
+
+class QueryBudgetTests(CatalogTestCase):
+    """
+    Query counts for the public pages and admin changelists must not grow
+    with the catalog: each page is measured against a synthetic catalog of
+    N rooms and again at 10*N, with an empty page cache both times.
+    """
+    SCALES = (1, 10)
+    BUDGETS = {
+        "buildings_index": 2,
+        "classroom_list_by_building": 5,
+        "classroom_detail": 4,
+        "admin_building_changelist": 5,
+        "admin_classroom_changelist": 5,
+        "admin_classroom_change": 12,  # incl. the photo/panorama counts behind the inlines' links
+    }
+
+    def _seed_scale(self, scale):
+        synthetic.clear("qb")
+        synthetic.generate(prefix="qb", buildings_per_campus=2 * scale, rooms_per_building=3 * scale,
+                           campuses=["MAIN", "HSC"], resources_per_building=2)
+        # every generated room is published or not at random; pin the one we request
+        Classroom.objects.filter(external_id__startswith="qb-", room_number="100").update(is_published=True)
+
+    def _paths(self):
+        return {
+            "buildings_index": reverse("buildings_index"),
+            "classroom_list_by_building": reverse("classroom_list_by_building", args=["qb-main-hall-0000"]),
+            "classroom_detail": reverse("classroom_detail", args=["qb-main-hall-0000", "100"]),
+            "admin_building_changelist": reverse("admin:classrooms_building_changelist"),
+            "admin_classroom_changelist": reverse("admin:classrooms_classroom_changelist"),
+            "admin_classroom_change": reverse(
+                "admin:classrooms_classroom_change",
+                args=[Classroom.objects.get(building__slug="qb-main-hall-0000", room_number="100").pk]),
+        }
+
+    def _measure(self, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return self._reads(ctx)
+
+    def assertQueryBudget(self, name, queries, budget, scale):
+        if len(queries) > budget:
+            listing = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(queries, 1))
+            self.fail(f"{name} ran {len(queries)} queries at {scale}x (budget {budget}):\n{listing}")
+
+    def test_query_counts_are_constant(self):
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "a@example.edu", "pw"))
+        counts = {}
+        for scale in self.SCALES:
+            self._seed_scale(scale)
+            for name, path in self._paths().items():
+                with self.subTest(view=name, scale=scale):
+                    queries = self._measure(path)
+                    self.assertQueryBudget(name, queries, self.BUDGETS[name], scale)
+                    counts.setdefault(name, []).append(len(queries))
+        for name, per_scale in counts.items():
+            with self.subTest(view=name):
+                self.assertEqual(len(set(per_scale)), 1, f"{name} grows with the catalog: {per_scale}")
+
+
+class AdminScalingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "a@example.edu", "pw"))
+        self.building, self.room = self._seed()
+        self.other = Building.objects.create(name="Anderson Hall")
+
+    def test_building_changelist_links_counts_to_room_filter(self):
+        resp = self.client.get(reverse("admin:classrooms_building_changelist"))
+        link = f'{reverse("admin:classrooms_classroom_changelist")}?building={self.building.pk}">1</a>'
+        self.assertContains(resp, link)
+
+    def test_room_changelist_building_filter_lists_only_selection(self):
+        url = reverse("admin:classrooms_classroom_changelist")
+        resp = self.client.get(url)
+        self.assertNotContains(resp, "Anderson Hall")  # no sidebar entry per building
+
+        resp = self.client.get(url, {"building": self.other.pk})
+        self.assertEqual(list(resp.context["cl"].result_list), [])
+        self.assertContains(resp, "Anderson Hall")
+        resp = self.client.get(url, {"building": self.building.pk})
+        self.assertEqual(list(resp.context["cl"].result_list), [self.room])
+
+    def test_room_change_form_uses_building_autocomplete(self):
+        resp = self.client.get(reverse("admin:classrooms_classroom_change", args=[self.room.pk]))
+        self.assertContains(resp, "admin-autocomplete")
+        # only the current building is rendered as an <option>, not the whole table
+        self.assertNotContains(resp, "Anderson Hall")
+
+    def test_room_change_form_edits_only_the_first_media_rows(self):
+        from .admin import INLINE_ROWS
+        ClassroomPhoto.objects.bulk_create(ClassroomPhoto(classroom=self.room, order=n) for n in range(2, 40))
+        resp = self.client.get(reverse("admin:classrooms_classroom_change", args=[self.room.pk]))
+        photos = next(f for f in resp.context["inline_admin_formsets"] if f.opts.model is ClassroomPhoto)
+        self.assertEqual(len(photos.formset.initial_forms), INLINE_ROWS)
+        changelist = reverse("admin:classrooms_classroomphoto_changelist")
+        self.assertContains(resp, f'{changelist}?classroom__id__exact={self.room.pk}">39 classroom photos</a>', html=False)
+        resp = self.client.get(changelist, {"classroom__id__exact": self.room.pk})
+        self.assertEqual(resp.context["cl"].result_count, 39)
+
+
+class ImportTests(CatalogTestCase):
+    ROOMS = [
+        {"external_id": "alter-110", "building": "Alter Hall", "campus": "MAIN", "room_number": "110",
+         "capacity": 60, "is_published": True, "class_capture": True, "wireless_presentation": ["kramer"]},
+        {"external_id": "alter-120", "building": "alter-hall", "room_number": "120", "capacity": 25,
+         "is_published": True, "summary": "Seminar with \"quotes\" and a [bracket]"},
+        {"external_id": "ritter-1", "building_slug": "ritter-hall", "room_number": "1", "is_published": True},
+    ]
+
+    def _write(self, tmp, name, text):
+        path = Path(tmp) / name
+        path.write_text(text)
+        return path
+
+    def test_streams_json_object_array_and_jsonl(self):
+        docs = {
+            "rooms.json": json.dumps({"generated": {"by": "sis"}, "classrooms": self.ROOMS, "count": 3}),
+            "bare.json": json.dumps(self.ROOMS),
+            "rooms.jsonl": "\n".join(json.dumps(r) for r in self.ROOMS) + "\n\n",
+        }
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(services, "READ_CHUNK", 7):
+            for name, text in docs.items():
+                with self.subTest(name):
+                    self.assertEqual(list(services.iter_records(self._write(tmp, name, text))), self.ROOMS)
+
+    def test_import_upserts_in_batches(self):
+        Building.objects.create(name="Ritter Hall")
+        stats = services.import_classrooms(self.ROOMS, batch_size=100)
+        self.assertEqual((stats.inserted, stats.updated, stats.skipped, stats.buildings_created), (3, 0, 0, 1))
+
+        feed = [{"external_id": f"ritter-{n}", "building": "Ritter Hall", "room_number": str(n),
+                 "capacity": n} for n in range(100, 140)]
+        with CaptureQueriesContext(connection) as ctx:
+            # small batches: SQLite caps one INSERT at 999 parameters (~22 rooms)
+            services.import_classrooms(feed, batch_size=20)
+        # one room INSERT per batch, not one per item
+        inserts = [q for q in self._reads(ctx) if q.startswith('INSERT INTO "classrooms_classroom"')]
+        self.assertEqual(len(inserts), 2)
+
+        room = Classroom.objects.get(external_id="alter-110")
+        self.assertEqual(room.building.slug, "alter-hall")
+        self.assertEqual(room.feature_mask, feature_mask_for("class_capture"))
+        self.assertEqual(list(room.wireless_presentation), ["kramer"])
+        self.assertEqual([e.title for e in search.search("alter 110")], ["Alter Hall 110"])
+
+        # second run updates in place; absent fields are left alone
+        stats = services.import_classrooms([{"external_id": "alter-110", "building": "Alter Hall",
+                                             "room_number": "110", "capacity": 80}])
+        self.assertEqual((stats.inserted, stats.updated), (0, 1))
+        room.refresh_from_db()
+        self.assertEqual((room.capacity, room.class_capture), (80, True))
+
+    def test_partial_update_keeps_stored_flags_and_indexes_stored_row(self):
+        services.import_classrooms(self.ROOMS[:1])
+        with CaptureQueriesContext(connection) as ctx:
+            stats = services.import_classrooms([{"external_id": "alter-110", "building": "Alter Hall",
+                                                 "interactive_display": True}])
+        self.assertEqual(stats.updated, 1)
+        self.assertEqual(len([q for q in self._reads(ctx) if q.startswith('UPDATE "classrooms_classroom"')]), 1)
+        room = Classroom.objects.get(external_id="alter-110")
+        self.assertEqual((room.room_number, room.class_capture), ("110", True))
+        self.assertEqual(room.feature_mask, feature_mask_for("class_capture", "interactive_display"))
+        self.assertEqual(Classroom.objects.with_features("class_capture").get(), room)
+        entry = SearchEntry.objects.get(kind=SearchEntry.Kind.ROOM, object_id=room.pk)
+        self.assertTrue(entry.published)
+        self.assertEqual(entry.url, reverse("classroom_detail", args=["alter-hall", "110"]))
+
+    def test_room_number_collisions_are_reported_not_fatal(self):
+        services.import_classrooms(self.ROOMS[:2])
+        stats = services.import_classrooms([
+            {"external_id": "alter-110b", "building": "Alter Hall", "room_number": "110"},
+            {"external_id": "alter-130", "building": "Alter Hall", "room_number": "130"},
+            {"external_id": "alter-130b", "building": "Alter Hall", "room_number": "130"},
+            {"external_id": "alter-120", "building": "Alter Hall", "room_number": "121"},
+        ])
+        self.assertEqual((stats.inserted, stats.updated, stats.skipped), (1, 1, 2))
+        self.assertIn("already belongs to alter-110", stats.errors[0])
+        self.assertIn("already belongs to alter-130", stats.errors[1])
+        self.assertEqual(sorted(Classroom.objects.values_list("room_number", flat=True)), ["110", "121", "130"])
+
+    def test_import_bumps_page_cache(self):
+        b, room = self._seed()
+        url = reverse("classroom_detail", args=[b.slug, "420"])
+        self.assertContains(self.client.get(url), "<div class=\"v\">40</div>", html=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.import_classrooms([{"external_id": "rm-420", "building": b.name,
+                                         "room_number": "420", "capacity": 75}])
+        self.assertContains(self.client.get(url), "<div class=\"v\">75</div>", html=False)
+
+    def test_bad_items_are_reported_not_fatal(self):
+        stats = services.import_classrooms([
+            {"external_id": "x-1", "building": "Alter Hall", "room_number": "1", "capacity": "lots"},
+            {"building": "Alter Hall", "room_number": "2"},
+            {"external_id": "x-3", "room_number": "3"},
+            {"external_id": "x-4", "building": "Alter Hall", "room_number": "4", "wireless_presentation": ["fax"]},
+            {"external_id": "x-5", "building": "Alter Hall", "room_number": "5"},
+        ])
+        self.assertEqual((stats.inserted, stats.skipped), (1, 4))
+        self.assertEqual(len(stats.errors), 4)
+        self.assertIn("item 1 (no external_id)", stats.errors[1])
+
+    def test_command_dry_run_rolls_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._write(tmp, "rooms.jsonl", "\n".join(json.dumps(r) for r in self.ROOMS))
+            out = io.StringIO()
+            call_command("import_classrooms", path=str(path), dry_run=True, stdout=out, stderr=io.StringIO())
+            self.assertIn("would have synced 3 classrooms: 3 inserted", out.getvalue())
+            self.assertFalse(Classroom.objects.exists())
+            call_command("import_classrooms", path=str(path), batch_size=2, stdout=out, stderr=io.StringIO())
+        self.assertEqual(Classroom.objects.count(), 3)
+
+
+class IncrementalSyncTests(CatalogTestCase):
+    FEED = [
+        {"external_id": f"gladfelter-{n}", "building": "Gladfelter Hall", "room_number": str(n),
+         "capacity": 30 + n, "is_published": True}
+        for n in range(5)
+    ]
+
+    def _import(self, feed, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return services.import_classrooms(feed, **kwargs)
+
+    def test_unchanged_payloads_are_not_written(self):
+        self._import(self.FEED)
+        before = dict(Classroom.objects.values_list("external_id", "updated_at"))
+        edited = [dict(item) for item in self.FEED]
+        edited[2]["capacity"] = 99
+
+        with CaptureQueriesContext(connection) as ctx:
+            stats = self._import(edited)
+        self.assertEqual((stats.inserted, stats.updated, stats.unchanged), (0, 1, 4))
+        after = dict(Classroom.objects.values_list("external_id", "updated_at"))
+        self.assertEqual({k for k in after if after[k] != before[k]}, {"gladfelter-2"})
+        upserts = [q for q in self._reads(ctx) if q.startswith('INSERT INTO "classrooms_classroom"')]
+        self.assertEqual(len(upserts), 1)
+
+        stats = self._import(edited)
+        self.assertEqual((stats.updated, stats.unchanged), (0, 5))
+
+    def test_admin_edit_is_overwritten_by_next_sync(self):
+        self._import(self.FEED)
+        room = Classroom.objects.get(external_id="gladfelter-0")
+        room.capacity = 1
+        room.save()
+        self.assertEqual(room.content_hash, "")
+        stats = self._import(self.FEED)
+        self.assertEqual((stats.updated, stats.unchanged), (1, 4))
+        room.refresh_from_db()
+        self.assertEqual(room.capacity, 30)
+
+    def test_prune_unpublishes_missing_rooms_and_republishes_on_return(self):
+        self._import(self.FEED)
+        stats = self._import(self.FEED[:3], prune="unpublish")
+        self.assertEqual((stats.unchanged, stats.removed), (3, 2))
+        self.assertEqual(Classroom.objects.filter(is_published=False).count(), 2)
+        self.assertFalse(search.search("gladfelter 4"))
+
+        stats = self._import(self.FEED, prune="unpublish")
+        self.assertEqual((stats.updated, stats.removed), (2, 0))
+        self.assertEqual(Classroom.objects.filter(is_published=True).count(), 5)
+
+    def test_prune_delete_and_empty_snapshot_guard(self):
+        self._import(self.FEED)
+        stats = self._import(self.FEED[1:], prune="delete")
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(Classroom.objects.filter(external_id="gladfelter-0").exists())
+        with self.assertRaises(ValueError):
+            self._import([], prune="delete")
+        self.assertEqual(Classroom.objects.count(), 4)
+
+    def test_invalid_items_are_never_pruned(self):
+        self._import(self.FEED)
+        broken = [dict(item) for item in self.FEED]
+        broken[0]["capacity"] = "many"
+        stats = self._import(broken, prune="delete")
+        self.assertEqual((stats.skipped, stats.removed), (1, 0))
+
+
+class ExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+        self.room.class_capture = True
+        self.room.wireless_presentation = ["kramer"]
+        self.room.save()
+        Classroom.objects.create(external_id="rm-hidden", building=self.building, room_number="999")
+        BuildingResource.objects.create(building=self.building, title="Guide", url="https://x.example")
+
+    def _body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_json_export_is_public_only_and_reimportable(self):
+        doc = json.loads("".join(exports.export_chunks("json")))
+        self.assertEqual(set(doc), set(exports.KINDS))
+        self.assertEqual([r["external_id"] for r in doc["classrooms"]], ["rm-420"])
+        room = doc["classrooms"][0]
+        self.assertEqual((room["building_slug"], room["class_capture"]), (self.building.slug, True))
+        self.assertEqual(room["wireless_presentation"], ["kramer"])
+        self.assertNotIn("lock", room)
+        self.assertEqual(len(doc["photos"]), 1)
+        self.assertEqual(doc["panoramas"][0]["classroom"], "rm-420")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "export.json"
+            path.write_text(json.dumps(doc))
+            stats = services.import_classrooms(services.iter_records(path))
+        self.assertEqual((stats.inserted, stats.skipped), (0, 0))
+        self.room.refresh_from_db()
+        self.assertEqual(list(self.room.wireless_presentation), ["kramer"])
+
+    def test_jsonl_endpoint_streams(self):
+        resp = self.client.get(reverse("export_catalog"), {"kind": ["buildings", "resources"]})
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson; charset=utf-8")
+        lines = [json.loads(line) for line in self._body(resp).decode().splitlines()]
+        self.assertEqual([(r["type"], r.get("name") or r["title"]) for r in lines],
+                         [("building", "1810 Liacouras Walk"), ("resource", "Guide")])
+
+    def test_gzipped_csv_endpoint(self):
+        resp = self.client.get(reverse("export_catalog"), {"format": "csv", "gzip": "1"})
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        self.assertIn('filename="cph-catalog.csv.gz"', resp["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(self._body(resp)).decode())))
+        self.assertEqual([(r["external_id"], r["wireless_presentation"]) for r in rows], [("rm-420", "kramer")])
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(reverse("export_catalog"), {"format": "xml"}).status_code, 400)
+        resp = self.client.get(reverse("export_catalog"), {"format": "csv", "kind": ["buildings", "photos"]})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "catalog.jsonl.gz"
+            call_command("export_catalog", format="jsonl", gzip=True, output=str(out), stdout=io.StringIO())
+            types = [json.loads(line)["type"] for line in gzip.decompress(out.read_bytes()).splitlines()]
+        self.assertEqual(types, ["building", "classroom", "photo", "panorama", "resource"])
+
+
+class RestoreTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+        self.room.class_capture = True
+        self.room.save()
+
+    def _dump(self, tmp, name):
+        path = Path(tmp) / name
+        call_command("dumpdata", "classrooms.Building", "classrooms.Classroom",
+                     "classrooms.ClassroomPhoto", "classrooms.Panorama", output=str(path))
+        return path
+
+    def test_round_trip_preserves_rows_and_rebuilds_derived_state(self):
+        stamp = timezone.now() - timedelta(days=30)
+        Classroom.objects.update(updated_at=stamp.replace(microsecond=0))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._dump(tmp, "snap.json.gz")
+            Classroom.objects.all().delete()
+            Building.objects.all().delete()
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                stats = restore.restore([path], batch_size=1)
+        self.assertEqual(stats.counts, {"classrooms.Building": 1, "classrooms.Classroom": 1,
+                                        "classrooms.ClassroomPhoto": 1, "classrooms.Panorama": 1})
+        self.assertEqual(len(callbacks), 1)
+        room = Classroom.objects.get(pk=self.room.pk)
+        self.assertEqual(room.updated_at, stamp.replace(microsecond=0))
+        self.assertEqual(room.feature_mask, feature_mask_for("class_capture"))
+        self.assertTrue(search.search("Liacouras"))
+        # sequences keep working after explicit pks were inserted
+        Classroom.objects.create(external_id="rm-new", building=room.building, room_number="1")
+
+    def test_overwrites_existing_pks_from_utf16_dump(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._dump(tmp, "snap.json")
+            doc = json.loads(path.read_text())
+            next(o for o in doc if o["model"] == "classrooms.classroom")["fields"]["capacity"] = 99
+            path.write_text(json.dumps(doc), encoding="utf-16")
+            restore.restore([path])
+        self.assertEqual(Classroom.objects.get().capacity, 99)
+
+    def test_command_restores_legacy_fixture(self):
+        # data.json is a UTF-16 dump with fields the models have since dropped
+        out = io.StringIO()
+        call_command("restore_fixture", str(Path(__file__).resolve().parent.parent / "data.json"),
+                     exclude=["contenttypes", "auth", "admin", "sessions"], stdout=out)
+        self.assertIn("Restored", out.getvalue())
+        self.assertGreater(Classroom.objects.filter(is_published=True).count(), 1)
+
+
+class RenditionTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+
+    def test_upload_renders_every_width_and_format(self):
+        photo = ClassroomPhoto.objects.create(
+            classroom=self.room, image_file=self._img_file("wide.jpg", size=(2000, 1000)))
+        entry = photo.renditions["image_file"]
+        self.assertEqual((entry["src"], entry["width"], entry["height"]), (photo.image_file.name, 2000, 1000))
+        self.assertEqual([w for w, _ in entry["webp"]], [320, 640, 1280])
+        self.assertEqual([w for w, _ in entry["jpeg"]], [320, 640, 1280])
+        with default_storage.open(entry["webp"][0][1]) as fh:
+            img = Image.open(fh)
+            self.assertEqual((img.format, img.size), ("WEBP", (320, 160)))
+        # small sources are never upscaled
+        self.assertEqual(self.room.photos.get(caption="Wide shot").renditions["image_file"]["webp"][0][0], 8)
+
+    def test_tile_uses_srcset_until_the_file_changes(self):
+        self.building.preview_file = self._img_file("front.jpg", size=(900, 500))
+        self.building.save()
+        html = self.client.get(reverse("buildings_index")).content.decode()
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('640w', html)
+        self.assertIn('height="500" loading="lazy"', html)
+        self.assertIn('width="900"', html)
+
+        # an entry made from another file is stale: fall back to the original
+        Building.objects.update(preview_file="buildings/other.jpg")
+        cache.clear()
+        html = self.client.get(reverse("buildings_index")).content.decode()
+        self.assertNotIn("<picture>", html)
+        self.assertIn('src="/media/buildings/other.jpg"', html)
+
+    def test_backfill_command(self):
+        Panorama.objects.update(renditions={})
+        out = io.StringIO()
+        call_command("build_renditions", model=["panorama"], stdout=out)
+        self.assertEqual(set(Panorama.objects.get().renditions), {"image_file", "preview_file"})
+        self.assertIn("Rendered images for 1 rows", out.getvalue())
+
+
+class PanoramaTileTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+
+    def _pano(self):
+        # red straight ahead (yaw 0), blue at yaw 90
+        img = Image.new("RGB", (2048, 1024), (128, 128, 128))
+        img.paste((255, 0, 0), (984, 472, 1064, 552))
+        img.paste((0, 0, 255), (1496, 472, 1576, 552))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG")
+        return SimpleUploadedFile("wide.jpg", buf.getvalue(), content_type="image/jpeg")
+
+    def test_upload_is_cut_into_a_cube_pyramid(self):
+        pano = Panorama.objects.create(external_id="p-wide", classroom=self.room, image_file=self._pano())
+        t = pano.tiles
+        self.assertEqual((t["src"], t["cubeResolution"], t["maxLevel"]), (pano.image_file.name, 648, 2))
+        for name in ("2/f0_0", "2/f1_1", "1/u0_0", "fallback/r"):
+            self.assertTrue(default_storage.exists(f"{t['base']}/{name}.jpg"), name)
+        with default_storage.open(f"{t['base']}/fallback/f.jpg") as fh:
+            front = Image.open(fh).convert("RGB")
+            r, g, b = front.getpixel((front.width // 2, front.height // 2))
+        self.assertGreater(r, 200)
+        with default_storage.open(f"{t['base']}/fallback/r.jpg") as fh:
+            right = Image.open(fh).convert("RGB")
+            r, g, b = right.getpixel((right.width // 2, right.height // 2))
+        self.assertGreater(b, 200)
+        # no preview was uploaded, so one was derived
+        preview = Panorama.objects.get(pk=pano.pk).preview_file.name
+        self.assertTrue(preview.startswith("cas/") and preview != pano.image_file.name)
+
+    def test_viewer_uses_multires_only_when_tiles_exist(self):
+        url = reverse("classroom_detail", args=[self.building.slug, "420"])
+        html = self.client.get(url).content.decode()
+        self.assertIn('"type": "equirectangular"', html)  # seeded pano is tiny
+
+        Panorama.objects.create(external_id="p-wide", classroom=self.room, image_file=self._pano(), order=0)
+        cache.clear()
+        html = self.client.get(url).content.decode()
+        self.assertIn('"type": "multires"', html)
+        self.assertIn('"path": "/%l/%s%y_%x"', html)
+
+
+@jobs.task
+def _explode():
+    raise RuntimeError("boom")
+
+
+def _work_until_stopped(name, *, burst, poll, stop):
+    # stands in for jobs.work() in the forked workers: (1, 0) if told to stop
+    return int(stop.wait(30)), 0
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+
+    def test_save_queues_renditions_and_worker_warms_pages(self):
+        photo = ClassroomPhoto.objects.create(classroom=self.room, image_file=self._img_file("new.jpg"))
+        photo.caption = "edited"
+        photo.save()
+        self.assertEqual(photo.renditions, {})
+        queued = Job.objects.filter(key=f"renditions:classrooms.ClassroomPhoto:{photo.pk}")
+        self.assertEqual(queued.count(), 1)  # the second save reused the pending job
+        detail_url = reverse("classroom_detail", args=[self.building.slug, "420"])
+        etag = self.client.get(detail_url)["ETag"]
+
+        # as with Redis: the worker's bumps and warmed pages reach the web processes
+        with mock.patch.object(page_cache, "is_shared", return_value=True), \
+                self.captureOnCommitCallbacks(execute=True):
+            done, failed = jobs.work(burst=True)
+        self.assertEqual(failed, 0)
+        self.assertEqual(queued.get().status, Job.Status.DONE)
+        self.assertIn("image_file", ClassroomPhoto.objects.get(pk=photo.pk).renditions)
+        # the copy a browser kept without the srcset is no longer revalidated
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # the job bumped the room's pages and queued a re-render of them
+        call_command("run_worker", burst=True, stdout=io.StringIO())
+        resp = self.client.get(reverse("classroom_detail", args=[self.building.slug, "420"]))
+        self.assertEqual(resp["X-Page-Cache"], "hit")
+        self.assertIn("new", resp.content.decode())
+
+    def test_worker_does_not_warm_a_process_local_cache(self):
+        self.assertFalse(page_cache.is_shared())  # LocMem, as without DJANGO_USE_REDIS
+        photo = ClassroomPhoto.objects.create(classroom=self.room, image_file=self._img_file("new.jpg"))
+        detail_url = reverse("classroom_detail", args=[self.building.slug, "420"])
+        self.client.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(jobs.work(burst=True)[1], 0)
+        self.assertFalse(Job.objects.filter(task=tasks.warm_pages.task_name).exists())
+        # the touched updated_at alone keeps the cached copy from being served
+        resp = self.client.get(detail_url)
+        self.assertEqual(resp["X-Page-Cache"], "miss")
+        self.assertIn(ClassroomPhoto.objects.get(pk=photo.pk).renditions["image_file"]["src"],
+                      resp.content.decode())
+
+    def test_failures_back_off_then_fail_and_show_in_admin(self):
+        Job.objects.all().delete()
+        job = jobs.enqueue(_explode, max_attempts=2)
+        self.assertEqual(jobs.work(burst=True), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertEqual(jobs.work(burst=True), (0, 0))  # not due yet
+
+        Job.objects.update(run_after=timezone.now())
+        jobs.work(burst=True)
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "a@example.edu", "pw"))
+        url = reverse("admin:classrooms_job_changelist")
+        self.assertContains(self.client.get(url, {"status__exact": "failed"}), "RuntimeError: boom")
+        self.client.post(url, {"action": "retry", "_selected_action": [job.pk]})
+        self.assertEqual(Job.objects.get().status, Job.Status.PENDING)
+
+    def test_claims_are_exclusive_and_lost_jobs_come_back(self):
+        Job.objects.all().delete()
+        jobs.enqueue(_explode)
+        job = jobs.claim("a")
+        self.assertEqual(job.locked_by, "a")
+        self.assertIsNone(jobs.claim("b"))
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim("b").attempts, 2)
+
+    def test_process_workers_stop_with_the_parent(self):
+        stop = threading.Event()
+        threading.Timer(0.2, stop.set).start()  # what run_worker's SIGTERM handler does
+        with mock.patch.object(jobs, "work", _work_until_stopped):
+            self.assertEqual(jobs.run(2, "processes", poll=0.05, stop=stop), (2, 0))
+
+
+class ContentAddressedStorageTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+
+    def _jpeg_bytes(self):
+        return self._img_file(size=(40, 30)).read()
+
+    def test_identical_uploads_share_one_immutable_blob(self):
+        data = self._jpeg_bytes()
+        a = ClassroomPhoto.objects.create(classroom=self.room, image_file=SimpleUploadedFile("a.JPG", data))
+        b = ClassroomPhoto.objects.create(classroom=self.room, image_file=SimpleUploadedFile("b.jpg", data))
+        self.assertEqual(a.image_file.name, b.image_file.name)
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(a.image_file.name, f"cas/{digest[:2]}/{digest}.jpg")
+        self.assertEqual(default_storage.listdir(f"cas/{digest[:2]}")[1], [f"{digest}.jpg"])
+        self.assertEqual(a.image_file.url, f"/media/cas/{digest[:2]}/{digest}.jpg")
+
+    def test_hash_media_moves_legacy_paths_and_reports_savings(self):
+        data = self._jpeg_bytes()
+        old = [default_storage.save(f"photos/2024/01/0{i}/shot.jpg", ContentFile(data)) for i in (1, 2)]
+        photos = [ClassroomPhoto.objects.create(classroom=self.room, caption=f"legacy {i}") for i in (1, 2)]
+        for photo, name in zip(photos, old):
+            ClassroomPhoto.objects.filter(pk=photo.pk).update(
+                image_file=name, renditions={"image_file": {"src": name, "webp": [], "jpeg": []}})
+
+        out = io.StringIO()
+        call_command("hash_media", dry_run=True, stdout=out)
+        self.assertIn("Would rewrite 2 rows", out.getvalue())
+        self.assertEqual(ClassroomPhoto.objects.get(pk=photos[0].pk).image_file.name, old[0])
+
+        out = io.StringIO()
+        call_command("hash_media", delete_originals=True, stdout=out)
+        rows = ClassroomPhoto.objects.filter(pk__in=[p.pk for p in photos])
+        names = {p.image_file.name for p in rows}
+        self.assertEqual(len(names), 1)
+        self.assertTrue(storage.is_hashed(names.pop()))
+        # renditions made from the same bytes stay current
+        self.assertTrue(all(p.renditions["image_file"]["src"] == p.image_file.name for p in rows))
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        self.assertIn(f"{filesizeformat(len(data))} reclaimed, 2 originals deleted", out.getvalue())
+
+
+class PlaceholderTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+
+    @override_settings(JOBS_EAGER=False)
+    def test_upload_is_measured_before_its_renditions_exist(self):
+        photo = ClassroomPhoto.objects.create(
+            classroom=self.room, image_file=self._img_file("tall.jpg", size=(300, 600)))
+        self.assertEqual(photo.renditions, {})  # queued
+        entry = ClassroomPhoto.objects.get(pk=photo.pk).placeholders["image_file"]
+        self.assertEqual((entry["src"], entry["width"], entry["height"]), (photo.image_file.name, 300, 600))
+        data = base64.b64decode(entry["lqip"].removeprefix("data:image/webp;base64,"))
+        self.assertLess(len(data), 300)
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (8, 16))
+
+        html = self.client.get(reverse("classroom_detail", args=[self.building.slug, "420"])).content.decode()
+        self.assertIn(f'<img src="{photo.image_file.url}"', html)
+        self.assertIn(f'height="600" loading="lazy" style="background:url({entry["lqip"]}) '
+                      f'center/cover no-repeat" width="300"', html)
+
+    def test_backfill_command(self):
+        ClassroomPhoto.objects.update(placeholders={})
+        Panorama.objects.update(placeholders={"preview_file": {"src": "replaced.jpg"}})
+        out = io.StringIO()
+        call_command("build_placeholders", stdout=out)
+        self.assertEqual(ClassroomPhoto.objects.get().placeholders["image_file"]["width"], 8)
+        pano = Panorama.objects.get()
+        self.assertEqual(pano.placeholders["preview_file"]["src"], pano.preview_file.name)
+        self.assertIn("Measured images for 2 rows", out.getvalue())
+
+
+class CardImageTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+
+    def _card(self):
+        room = Classroom.objects.get(pk=self.room.pk)
+        return room.card_image.name, room.renditions.get("card_image"), room.placeholders.get("card_image")
+
+    def test_card_follows_preview_then_photos_then_panoramas(self):
+        photo = self.room.photos.get()
+        self.assertEqual(self._card(), (photo.image_file.name, photo.renditions["image_file"],
+                                        photo.placeholders["image_file"]))
+
+        photo.delete()
+        pano = self.room.panoramas.get()
+        self.assertEqual(self._card()[0], pano.preview_file.name)
+
+        self.room.preview_image_file = self._img_file("front.jpg", size=(32, 18), color=(0, 90, 0))
+        self.room.save()
+        name, rendition, placeholder = self._card()
+        self.assertEqual(name, self.room.preview_image_file.name)
+        self.assertEqual((rendition["src"], placeholder["width"]), (name, 32))
+
+        # the room's own manifest entries survive a refresh of its renditions
+        renditions.refresh(Classroom.objects.get(pk=self.room.pk), force=True)
+        self.assertEqual(self._card()[0], name)
+
+    def test_list_view_reads_no_media_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            html = self.client.get(reverse("classroom_list_by_building", args=[self.building.slug])).content.decode()
+        self.assertFalse([q for q in self._reads(ctx) if "classroomphoto" in q or "panorama" in q])
+        photo = self.room.photos.get()
+        self.assertIn(photo.renditions["image_file"]["webp"][0][1], html)
+
+    def test_backfill_command(self):
+        Classroom.objects.update(card_image=None, renditions={}, placeholders={})
+        out = io.StringIO()
+        call_command("build_cards", stdout=out)
+        self.assertEqual(self._card()[0], self.room.photos.get().image_file.name)
+        self.assertIn("Updated the card image of 1 rooms", out.getvalue())
+
+    def test_backfill_touches_only_the_rooms_it_changed(self):
+        Classroom.objects.create(external_id="rm-421", building=self.building, room_number="421",
+                                 capacity=10, is_published=True)
+        Classroom.objects.filter(pk=self.room.pk).update(card_image=None, renditions={}, placeholders={})
+        other_url = reverse("classroom_detail", args=[self.building.slug, "421"])
+        self.client.get(other_url)
+
+        def stamps():
+            return (dict(Classroom.objects.values_list("pk", "updated_at")),
+                    dict(Building.objects.values_list("pk", "updated_at")))
+        rooms, buildings = stamps()
+        call_command("build_cards", stdout=io.StringIO())
+        rooms_after, buildings_after = stamps()
+        self.assertEqual({pk for pk in rooms if rooms[pk] != rooms_after[pk]}, {self.room.pk})
+        self.assertEqual(buildings, buildings_after)
+        # the other room's page is neither bumped nor given a new ETag
+        self.assertEqual(self.client.get(other_url)["X-Page-Cache"], "hit")
+
+
+class SnapshotTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+        self.out = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.out, ignore_errors=True)
+
+    def _build(self, **kwargs):
+        return snapshot.build(self.out, workers=1, **kwargs)
+
+    def test_builds_every_public_page_then_only_what_changed(self):
+        stats = self._build()
+        self.assertEqual((stats.rendered, stats.failed), (4, 0))
+        detail = self.out / "buildings" / self.building.slug / "420" / "index.html"
+        self.assertIn("420", detail.read_text())
+        self.assertTrue((self.out / "index.html").is_file())
+        manifest = snapshot.read_manifest(self.out)
+        self.assertEqual(manifest["pages"][reverse("classroom_detail", args=[self.building.slug, "420"])]["file"],
+                         f"buildings/{self.building.slug}/420/index.html")
+
+        self.assertEqual((self._build().rendered, self._build().unchanged), (0, 4))
+
+        other = Classroom.objects.create(external_id="rm-421", building=self.building, room_number="421",
+                                         is_published=True)
+        stats = self._build()
+        # "/", "/buildings/", the building's list and the new room; nothing else
+        self.assertEqual((stats.rendered, stats.unchanged), (4, 1))
+
+        other.is_published = False
+        other.save()
+        stats = self._build()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse((self.out / "buildings" / self.building.slug / "421").exists())
+        self.assertEqual(self._build(force=True).rendered, 4)
+
+    def test_fallback_serves_snapshot_when_database_is_down(self):
+        self._build()
+        url = reverse("classroom_detail", args=[self.building.slug, "420"])
+        cache.clear()
+        with override_settings(CATALOG_SNAPSHOT_DIR=str(self.out)), \
+                mock.patch("django.db.backends.utils.CursorWrapper.execute", side_effect=OperationalError("down")), \
+                self.assertLogs("classrooms.snapshot", "ERROR"):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["X-Snapshot"], "fallback")
+        self.assertIn(b"420", b"".join(resp.streaming_content))
+
+    def test_fallback_skips_filtered_requests(self):
+        self._build()
+        url = reverse("classroom_list_by_building", args=[self.building.slug])
+        cache.clear()
+        self.client.raise_request_exception = False
+        with override_settings(CATALOG_SNAPSHOT_DIR=str(self.out)), \
+                mock.patch("django.db.backends.utils.CursorWrapper.execute", side_effect=OperationalError("down")), \
+                self.assertLogs("django.request", "ERROR"):
+            resp = self.client.get(url, {"wireless": "kramer", "page": 2})
+        self.assertEqual(resp.status_code, 500)
+        self.assertFalse(resp.has_header("X-Snapshot"))
+
+
+class AsyncViewTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+        for n in range(30):
+            Classroom.objects.create(external_id=f"rm-5{n:02d}", building=self.building,
+                                     room_number=f"5{n:02d}", capacity=n, is_published=True)
+
+    def _get(self, view, path, *args, **headers):
+        request = RequestFactory().get(path, **headers)
+        request.user = AnonymousUser()
+        return view(request, *args)
+
+    def _pages(self):
+        slug = self.building.slug
+        return [
+            ("buildings_index", reverse("buildings_index"), ()),
+            ("classroom_list_by_building", reverse("classroom_list_by_building", args=[slug]) + "?page=2", (slug,)),
+            ("classroom_list_by_building",
+             reverse("classroom_list_by_building", args=[slug]) + "?min_capacity=10&sort=cap-desc", (slug,)),
+            ("classroom_detail", reverse("classroom_detail", args=[slug, "420"]), (slug, "420")),
+        ]
+
+    @override_settings(CLASSROOMS_PAGE_CACHE=False)
+    def test_async_pages_match_sync_pages(self):
+        for name, path, args in self._pages():
+            expected = self._get(getattr(views, name), path, *args)
+            got = self._get(async_to_sync(getattr(async_views, name)), path, *args)
+            self.assertEqual(got.status_code, 200, path)
+            self.assertEqual(got.content, expected.content, path)
+            self.assertEqual((got["ETag"], got["Last-Modified"]), (expected["ETag"], expected["Last-Modified"]))
+
+    def test_async_page_cache_and_conditional_get(self):
+        name, path, args = self._pages()[3]
+        view = async_to_sync(getattr(async_views, name))
+        first = self._get(view, path, *args)
+        self.assertEqual(first["X-Page-Cache"], "miss")
+        self.assertEqual(self._get(view, path, *args)["X-Page-Cache"], "hit")
+        self.assertEqual(self._get(view, path, *args, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        with self.assertRaises(Http404):
+            self._get(view, path, self.building.slug, "nope")
+
+    def test_middleware_stack_is_async_end_to_end(self):
+        # a sync-only middleware would be adapted (and logged) and put every request back on a thread
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    def test_bench_client_reads_length_and_chunked_bodies(self):
+        from .management.commands.bench_concurrency import _read_response
+
+        async def read(raw):
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return await _read_response(reader), await reader.read()
+
+        self.assertEqual(async_to_sync(read)(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nhiNEXT"),
+                         ((200, True), b"NEXT"))
+        self.assertEqual(async_to_sync(read)(b"HTTP/1.1 304 Not Modified\r\nConnection: close\r\n"
+                                             b"Transfer-Encoding: chunked\r\n\r\n2\r\nhi\r\n0\r\n\r\n"),
+                         ((304, False), b""))
+
+
+class ReplicaRoutingTests(CatalogTestCase):
+    """A second SQLite file stands in for the replica; it holds its own (lagging) copy of the room."""
+    databases = "__all__"  # "replica" only joins DATABASES in setUpClass
+
+    @classmethod
+    def setUpClass(cls):
+        tmp = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        default = connections.settings["default"]
+        connections.settings["replica"] = {**default, "NAME": str(Path(tmp) / "replica.sqlite3"),
+                                           "ATOMIC_REQUESTS": False, "TEST": {**default["TEST"], "NAME": None}}
+        cls.addClassCleanup(connections.settings.pop, "replica")
+        cls.addClassCleanup(connections.__delitem__, "replica")
+        cls.addClassCleanup(lambda: connections["replica"].close())
+        call_command("migrate", database="replica", verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        building = Building(name="1810 Liacouras Walk", slug="1810-liacouras-walk", campus=Building.Campus.MAIN)
+        Building.objects.using("replica").bulk_create([building])
+        Classroom.objects.using("replica").bulk_create([Classroom(
+            external_id="rm-420", building=building, room_number="420", capacity=77, is_published=True)])
+
+    def setUp(self):
+        super().setUp()
+        self.building, self.room = self._seed()
+        replicas._down.clear()
+        self.url = reverse("classroom_detail", args=[self.building.slug, "420"])
+
+    def _capacity(self):
+        html = self.client.get(self.url).content.decode()
+        return next(c for c in ("77", "40") if f'<div class="v">{c}</div>' in html)
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_anonymous_reads_go_to_the_replica_editors_to_the_primary(self):
+        with CaptureQueriesContext(connections["replica"]) as ctx:
+            self.assertEqual(self._capacity(), "77")
+        self.assertTrue(ctx.captured_queries)
+
+        cache.clear()
+        self.client.cookies[replicas.PIN_COOKIE] = "1"
+        self.assertEqual(self._capacity(), "40")
+        del self.client.cookies[replicas.PIN_COOKIE]
+
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "a@example.com", "pw"))
+        self.assertEqual(self._capacity(), "40")
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_writes_pin_the_client_to_the_primary(self):
+        resp = self.client.post(reverse("admin:login"), {"username": "nobody", "password": "x"})
+        self.assertEqual(resp.cookies[replicas.PIN_COOKIE]["max-age"], settings.DATABASE_PIN_SECONDS)
+        self.assertNotIn(replicas.PIN_COOKIE, self.client.get(self.url).cookies)
+
+    @override_settings(DATABASE_REPLICAS=["r1", "r2", "r3"])
+    def test_round_robin_over_healthy_replicas(self):
+        with mock.patch.object(replicas, "healthy", side_effect=lambda alias: alias != "r2"):
+            self.assertEqual({replicas.pick() for _ in range(6)}, {"r1", "r3"})
+        with mock.patch.object(replicas, "healthy", return_value=False):
+            self.assertIsNone(replicas.pick())
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        replica = connections["replica"]
+        with mock.patch.object(replica, "ensure_connection", side_effect=OperationalError("refused")), \
+                mock.patch.object(replica, "connection", None), \
+                self.assertLogs("classrooms.replicas", "WARNING"):
+            self.assertEqual(self._capacity(), "40")
+        self.assertIsNone(replicas.pick())  # skipped until REPLICA_RETRY_SECONDS pass
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_page_failing_on_its_replica_is_rendered_from_the_primary(self):
+        with mock.patch.object(connections["replica"], "cursor", side_effect=OperationalError("gone")), \
+                self.assertLogs("classrooms.replicas", "WARNING"):
+            self.assertEqual(self._capacity(), "40")
+
+    def test_read_only_views_skip_the_request_transaction(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertFalse([q for q in ctx.captured_queries if "SAVEPOINT" in q["sql"]])
+
+
+class MemoryCatalogTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        memory.clear()
+        self.addCleanup(memory.clear)
+        self.building, self.room = self._seed()
+        self.room.seating_type = ["tables and chairs"]
+        self.room.pc_type = ["windows", "MacOs"]
+        self.room.book_url = "https://25live.example/420"
+        self.room.save()
+        wireless = ["kramer", "apple_tv,kramer", "screenbeam", ""]
+        for n in range(30):
+            Classroom.objects.create(external_id=f"rm-5{n:02d}", building=self.building, room_number=f"5{n:02d}",
+                                     capacity=n % 7 * 10, wireless_presentation=wireless[n % 4],
+                                     interactive_display=n % 3 == 0, is_published=n != 29)
+        BuildingResource.objects.create(building=self.building, kind="youtube", title="Using the podium",
+                                        url="https://youtu.be/abc123")
+        Building.objects.create(name="Annenberg Hall", campus=Building.Campus.AMBLER)
+
+    def _get(self, view, path, *args, **headers):
+        request = RequestFactory().get(path, **headers)
+        request.user = AnonymousUser()
+        return view(request, *args)
+
+    def _pages(self):
+        slug = self.building.slug
+        rooms = reverse("classroom_list_by_building", args=[slug])
+        return [
+            ("buildings_index", reverse("buildings_index"), ()),
+            ("classroom_list_by_building", rooms, (slug,)),
+            ("classroom_list_by_building", rooms + "?page=2", (slug,)),
+            ("classroom_list_by_building", rooms + "?min_capacity=20&max_capacity=50&sort=cap-desc", (slug,)),
+            ("classroom_list_by_building", rooms + "?wireless=kramer&feature=interactive_display&sort=cap-asc",
+             (slug,)),
+            ("classroom_list_by_building", rooms + "?campus=HSC", (slug,)),
+            ("classroom_detail", reverse("classroom_detail", args=[slug, "420"]), (slug, "420")),
+            ("classroom_detail", reverse("classroom_detail", args=[slug, "503"]), (slug, "503")),
+        ]
+
+    @override_settings(CLASSROOMS_PAGE_CACHE=False)
+    def test_memory_pages_match_database_pages(self):
+        for name, path, args in self._pages():
+            expected = self._get(getattr(views, name), path, *args)
+            got = self._get(getattr(memory_views, name), path, *args)
+            self.assertEqual(got.status_code, 200, path)
+            self.assertEqual(got.content.decode(), expected.content.decode(), path)
+            self.assertEqual((got["ETag"], got["Last-Modified"]), (expected["ETag"], expected["Last-Modified"]))
+
+    def test_steady_state_pages_issue_no_queries(self):
+        pages = self._pages()
+        self._get(memory_views.buildings_index, *pages[0][1:2])  # builds the catalog
+        for cached in (False, True, True):
+            with override_settings(CLASSROOMS_PAGE_CACHE=cached), CaptureQueriesContext(connection) as ctx:
+                for name, path, args in pages:
+                    self.assertEqual(self._get(getattr(memory_views, name), path, *args).status_code, 200)
+                resp = self._get(memory_views.classroom_detail_pk, "/", self.room.pk)
+            self.assertEqual(ctx.captured_queries, [])
+        self.assertEqual(resp["Location"], reverse("classroom_detail", args=[self.building.slug, "420"]))
+        for view, args in ((memory_views.classroom_detail, (self.building.slug, "529")),  # unpublished
+                           (memory_views.classroom_list_by_building, ("nope",)),
+                           (memory_views.classroom_detail_pk, (10 ** 6,))):
+            with self.assertRaises(Http404):
+                self._get(view, "/", *args)
+
+    def test_a_change_swaps_in_a_new_catalog(self):
+        url = reverse("classroom_detail", args=[self.building.slug, "420"])
+        self.assertEqual(self._get(memory_views.classroom_detail, url, self.building.slug, "420")["X-Page-Cache"],
+                         "miss")
+        before = memory.current()
+        self.assertIs(memory.current(), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.capacity = 64
+            self.room.save()
+        resp = self._get(memory_views.classroom_detail, url, self.building.slug, "420")
+        self.assertEqual(resp["X-Page-Cache"], "miss")
+        self.assertIn(b'<div class="v">64</div>', resp.content)
+        self.assertIsNot(memory.current(), before)
+        self.assertEqual(before.rooms[(self.building.slug, "420")].capacity, 40)  # never modified
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.is_published = False
+            self.room.save()
+        with self.assertRaises(Http404):
+            self._get(memory_views.classroom_detail, url, self.building.slug, "420")
+
+    def test_rebuild_in_progress_serves_the_previous_catalog(self):
+        before = memory.current()
+        page_cache.bump(page_cache.catalog_scope())
+        with memory._rebuilding:  # another thread is rebuilding
+            self.assertIs(memory.current(), before)
+        self.assertIsNot(memory.current(), before)
+
+    def test_page_rendered_during_rebuild_is_not_cached_for_the_new_catalog(self):
+        slug = self.building.slug
+        url = reverse("classroom_detail", args=[slug, "420"])
+        memory.current()
+        # a change the stamps don't show (a job's .update()): the ETag stays the same
+        Classroom.objects.filter(pk=self.room.pk).update(capacity=64)
+        page_cache.bump(page_cache.room_scope(slug, "420"))
+        with memory._rebuilding:
+            stale = self._get(memory_views.classroom_detail, url, slug, "420")
+        self.assertIn(b'<div class="v">40</div>', stale.content)
+        resp = self._get(memory_views.classroom_detail, url, slug, "420")
+        self.assertEqual(resp["X-Page-Cache"], "miss")
+        self.assertIn(b'<div class="v">64</div>', resp.content)
+
+    def test_refuses_a_per_process_cache(self):
+        with override_settings(CATALOG_IN_MEMORY=True, DEBUG=False):
+            self.assertEqual([e.id for e in checks.catalog_in_memory_cache(None)], ["classrooms.E001"])
+            with mock.patch.object(page_cache, "is_shared", return_value=True):
+                self.assertEqual(checks.catalog_in_memory_cache(None), [])
+        with override_settings(CATALOG_IN_MEMORY=True, DEBUG=True):
+            self.assertEqual([e.id for e in checks.catalog_in_memory_cache(None)], ["classrooms.W001"])
+
@@ -0,0 +1,302 @@
+# classrooms/tiles.py
+"""
+Multiresolution cube tiles for 360° panoramas.
+
+An uploaded equirectangular is often 20-50 MB and Pannellum shows nothing
+until the whole file has downloaded.  ``build()`` reprojects it onto the six
+faces of a cube and cuts each face into a pyramid of 512 px JPEG tiles, the
+layout of Pannellum's ``multires`` type (the same output as its
+``generate.py``, without the Hugin dependency):
+
+    <base>/<level>/<face><row>_<col>.jpg      level 1 = one tile per face
+    <base>/fallback/<face>.jpg                for browsers without WebGL
+
+so the viewer only fetches the handful of tiles in view, at the level the
+zoom needs.  The result is stored on ``Panorama.tiles`` and ``detail.html``
+switches to ``multires`` when it is current for ``image_file``.
+
+Reprojection uses Pillow's MESH transform: each face is split into small
+cells and every cell is mapped bilinearly onto its footprint in the
+equirectangular, which keeps the per-pixel work in C (numpy isn't a
+dependency).  ``build_many()`` spreads a backfill across a process pool.
+"""
+import io
+import logging
+import math
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 512
+FALLBACK_SIZE = 1024
+MAX_CUBE = 4096
+# below this the equirectangular is small enough to load in one go
+MIN_WIDTH = 2048
+QUALITY = 80
+PREVIEW_SIZE = (1024, 512)
+MESH_STEP = 32
+PREFIX = "panoramas/tiles"
+PATH = "/%l/%s%y_%x"
+FALLBACK_PATH = "/fallback/%s"
+
+# Pannellum's face letters with the (yaw, pitch) each face looks at
+FACES = (("f", 0, 0), ("b", 180, 0), ("l", -90, 0), ("r", 90, 0), ("u", 0, 90), ("d", 0, -90))
+
+
+def cube_size(width):
+    return min(MAX_CUBE, 8 * int(width / math.pi / 8))
+
+
+def level_count(cube, tile=TILE_SIZE):
+    tile = min(tile, cube)
+    levels = int(math.ceil(math.log(cube / tile, 2))) + 1
+    if levels > 1 and round(cube / 2 ** (levels - 2)) == tile:
+        levels -= 1  # same edge case as Pannellum's generate.py
+    return levels
+
+
+def _basis(yaw, pitch):
+    """(forward, right, up) unit vectors; x right, y up, z ahead at yaw 0."""
+    y, p = math.radians(yaw), math.radians(pitch)
+    forward = (math.sin(y) * math.cos(p), math.sin(p), math.cos(y) * math.cos(p))
+    right = (math.cos(y), 0.0, -math.sin(y))
+    up = (-math.sin(y) * math.sin(p), math.cos(p), -math.cos(y) * math.sin(p))
+    return forward, right, up
+
+
+def _face_mesh(yaw, pitch, size, width, height, step=MESH_STEP):
+    """MESH transform data mapping a ``size`` px face onto the equirectangular."""
+    forward, right, up = _basis(yaw, pitch)
+    # even, so the pole at the centre of the top/bottom faces is a grid point
+    cells = max(2, size // step)
+    cells += cells % 2
+    edges = [round(i * size / cells) for i in range(cells + 1)]
+
+    grid = []
+    for gy in edges:
+        row = []
+        v = 1 - 2 * gy / size
+        for gx in edges:
+            u = 2 * gx / size - 1
+            d = [forward[k] + u * right[k] + v * up[k] for k in range(3)]
+            horizontal = math.hypot(d[0], d[2])
+            lat = math.atan2(d[1], horizontal)
+            # longitude is undefined at the poles; filled in per cell below
+            x = (math.atan2(d[0], d[2]) / (2 * math.pi) + 0.5) * width if horizontal > 1e-12 else None
+            row.append((x, (0.5 - lat / math.pi) * height))
+        grid.append(row)
+
+    mesh = []
+    for j in range(cells):
+        for i in range(cells):
+            corners = [grid[j][i], grid[j + 1][i], grid[j + 1][i + 1], grid[j][i + 1]]  # nw sw se ne
+            xs = [x for x, _ in corners if x is not None]
+            if max(xs) - min(xs) > width / 2:
+                # cell straddles the ±180° seam: continue past the right edge,
+                # into the strip _extend() appends
+                xs = [x + width if x < width / 2 else x for x in xs]
+                corners = [(x + width if x is not None and x < width / 2 else x, y) for x, y in corners]
+            pole_x = sum(xs) / len(xs)
+            quad = []
+            for x, y in corners:
+                quad += [pole_x if x is None else x, y]
+            mesh.append(((edges[i], edges[j], edges[i + 1], edges[j + 1]), quad))
+    return mesh
+
+
+def _extend(img):
+    # room for seam cells: repeat the left quarter after the right edge
+    from PIL import Image
+
+    extra = img.width // 4 + 2
+    out = Image.new("RGB", (img.width + extra, img.height))
+    out.paste(img, (0, 0))
+    out.paste(img.crop((0, 0, extra, img.height)), (img.width, 0))
+    return out
+
+
+def render_face(src, width, height, yaw, pitch, size):
+    """One cube face from the extended equirectangular ``src``."""
+    from PIL import Image
+
+    return src.transform((size, size), Image.MESH, _face_mesh(yaw, pitch, size, width, height),
+                         resample=Image.BILINEAR)
+
+
+def _jpeg(img):
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=QUALITY, optimize=True)
+    return ContentFile(buf.getvalue())
+
+
+def _load(source, storage, cube):
+    from PIL import Image
+
+    with storage.open(source, "rb") as fh:
+        img = Image.open(fh)
+        # nothing finer than the cube resolution survives the reprojection
+        img.draft("RGB", (int(cube * math.pi), int(cube * math.pi / 2)))
+        img.load()
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def build(source, storage=None, preview=False):
+    """
+    Tile storage file ``source``; returns ``(config, preview_file)`` where
+    config is the Pannellum ``multiRes`` dict plus ``src``/``base``.  Below
+    MIN_WIDTH nothing is cut and config is just ``{"src": source}``, which
+    records that the file was looked at.  ``preview_file`` is a small
+    equirectangular JPEG if ``preview`` was asked for.
+    """
+    from PIL import Image
+
+    storage = storage or default_storage
+    with storage.open(source, "rb") as fh:
+        width = Image.open(fh).width
+    if width < MIN_WIDTH:
+        return {"src": source}, None
+    cube = cube_size(width)
+    img = _load(source, storage, cube)
+    preview_file = _jpeg(img.resize(PREVIEW_SIZE, Image.LANCZOS, reducing_gap=3.0)) if preview else None
+
+    levels = level_count(cube)
+    tile = min(TILE_SIZE, cube)
+    # a fresh directory per build: no overwrite/exists round-trips on S3
+    base = f"{PREFIX}/{uuid.uuid4().hex[:12]}"
+    # draft() may have decoded at a reduced scale
+    width = img.width
+    src = _extend(img)
+    del img
+    for letter, yaw, pitch in FACES:
+        face = render_face(src, width, src.height, yaw, pitch, cube)
+        storage.save(f"{base}/fallback/{letter}.jpg",
+                     _jpeg(face.resize((FALLBACK_SIZE, FALLBACK_SIZE), Image.LANCZOS, reducing_gap=2.0)
+                           if cube > FALLBACK_SIZE else face))
+        size = cube
+        for level in range(levels, 0, -1):
+            if size != face.width:
+                # reducing_gap: box-reduce first, Lanczos only for the last step
+                face = face.resize((size, size), Image.LANCZOS, reducing_gap=2.0)
+            count = int(math.ceil(size / tile))
+            for row in range(count):
+                for col in range(count):
+                    box = (col * tile, row * tile, min((col + 1) * tile, size), min((row + 1) * tile, size))
+                    storage.save(f"{base}/{level}/{letter}{row}_{col}.jpg", _jpeg(face.crop(box)))
+            size = int(size / 2)
+
+    config = {
+        "src": source,
+        "base": base,
+        "path": PATH,
+        "fallbackPath": FALLBACK_PATH,
+        "extension": "jpg",
+        "tileResolution": tile,
+        "maxLevel": levels,
+        "cubeResolution": cube,
+    }
+    return config, preview_file
+
+
+def is_current(pano):
+    return bool(pano.tiles) and bool(pano.image_file) and pano.tiles.get("src") == pano.image_file.name
+
+
+def needs_refresh(pano):
+    """True if ``refresh()`` has work to do; no storage access."""
+    return not is_current(pano) if pano.image_file else bool(pano.tiles)
+
+
+def viewer_source(pano):
+    """Pannellum scene keys for ``pano``: multires when tiles are current."""
+    if not is_current(pano) or "base" not in pano.tiles:
+        return {"type": "equirectangular", "panorama": pano.image_file.url}
+    t = pano.tiles
+    return {"type": "multires", "multiRes": {
+        "basePath": default_storage.url(t["base"]),
+        "path": t["path"], "fallbackPath": t["fallbackPath"], "extension": t["extension"],
+        "tileResolution": t["tileResolution"], "maxLevel": t["maxLevel"],
+        "cubeResolution": t["cubeResolution"],
+    }}
+
+
+# --- writing results back -------------------------------------------------------
+def _apply(pano, config, preview_file):
+    from . import placeholders, renditions
+    from .models import Panorama
+
+    fields = {}
+    if (config or {}) != (pano.tiles or {}):
+        fields["tiles"] = pano.tiles = config or {}
+    if preview_file is not None and not pano.preview_file:
+        name = os.path.splitext(os.path.basename(pano.image_file.name))[0] + "-preview.jpg"
+        pano.preview_file.save(name, preview_file, save=False)
+        fields["preview_file"] = pano.preview_file.name
+    if fields:
+        Panorama.objects.filter(pk=pano.pk).update(**fields)
+    if "preview_file" in fields:
+        placeholders.refresh(pano)
+        renditions.refresh(pano)
+
+
+def _build_job(source, preview):
+    try:
+        config, preview_file = build(source, preview=preview)
+        return config, preview_file and preview_file.read(), None
+    except Exception as exc:  # Pillow raises a zoo of types for corrupt files
+        return None, None, f"{type(exc).__name__}: {exc}"
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _results(panos, workers):
+    jobs = [(p, p.image_file.name, not p.preview_file) for p in panos]
+    if workers == 1 or len(jobs) <= 1:
+        for pano, *args in jobs:
+            yield pano, _build_job(*args)
+        return
+    connections.close_all()  # never share a DB socket with forked workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_build_job, *args): pano for pano, *args in jobs}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def refresh(pano, force=False):
+    """Tile ``pano`` in-process if its tiles are missing or stale; returns True if rebuilt."""
+    if not force and not needs_refresh(pano):
+        return False
+    if not pano.image_file:
+        _apply(pano, None, None)
+        return False
+    built, _ = build_many([pano], workers=1)
+    return bool(built)
+
+
+def build_many(panos, workers=None, progress=None):
+    """
+    Tile ``panos`` across ``workers`` processes (default: CPU count).  Workers
+    only read and write storage; rows are updated here, in the parent.
+    Returns ``(built, failed)``: the panoramas that got tiles, and a count.
+    """
+    built, failed = [], 0
+    for pano, (config, preview, error) in _results([p for p in panos if p.image_file], workers):
+        if error:
+            failed += 1
+            logger.warning("cannot tile %s: %s", pano.image_file.name, error)
+        else:
+            _apply(pano, config, preview and ContentFile(preview))
+            if "base" in config:
+                built.append(pano)
+        if progress:
+            progress(pano, len(built), failed)
+    return built, failed
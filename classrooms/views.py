@@ -1,100 +1,194 @@
 # classrooms/views.py
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
-from .models import Building, Classroom
-from django.views.decorators.cache import cache_page
+from .models import Building, BuildingResource, Classroom
+from .cache import (
+    conditional_page, versioned_cache_page, catalog_scope, building_scope, room_scope,
+)
+from .filters import RoomFilters, facet_counts
+from .models import FEATURE_BITS, SearchEntry
+from . import search as catalog_search
+from . import exports, features
+from .replicas import read_only
 # classrooms/views.py
-from django.db.models import Count, Q
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
 
+ROOMS_PER_PAGE = 24
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+API_SORTS = {
+    "": ("building__name", "room_number"),
+    "room-asc": ("building__name", "room_number"),
+    "cap-asc": ("capacity", "building__name", "room_number"),
+    "cap-desc": ("-capacity", "building__name", "room_number"),
+}
 
-#@cache_page(300) # Cache for 5 minutes
-def buildings_index(request):
-    buildings = (
+
+# --- conditional GET validators (one aggregate query per page) -----------
+# The queries are shared with async_views.py, which runs them with the
+# async ORM (aaggregate/afirst).
+def _index_aggregates():
+    return {
+        "building_count": Count("id", distinct=True),
+        "building_max": Max("updated_at"),
+        "room_count": Count("classrooms", filter=Q(classrooms__is_published=True)),
+        # unpublishing a room bumps its updated_at, so include unpublished rows
+        "room_max": Max("classrooms__updated_at"),
+    }
+
+
+def _index_row(agg):
+    return (agg["building_max"], agg["room_max"], agg["building_count"], agg["room_count"])
+
+
+def _index_stamps():
+    return _index_row(Building.objects.aggregate(**_index_aggregates()))
+
+
+def _list_aggregates():
+    return {
+        "building_max": Max("updated_at"),
+        "room_count": Count("classrooms", filter=Q(classrooms__is_published=True), distinct=True),
+        "room_max": Max("classrooms__updated_at"),
+        "resource_count": Count("resources", distinct=True),
+        "resource_max": Max("resources__updated_at"),
+    }
+
+
+def _list_row(agg):
+    return (agg["building_max"], agg["room_max"], agg["resource_max"],
+            agg["room_count"], agg["resource_count"])
+
+
+def _list_stamps(slug):
+    return _list_row(Building.objects.filter(slug=slug).aggregate(**_list_aggregates()))
+
+
+def _list_stamps_by_building():
+    """slug -> _list_stamps(slug) for every building, in three grouped queries."""
+    rooms = {row["building"]: row for row in Classroom.objects.order_by().values("building").annotate(
+        n=Count("pk", filter=Q(is_published=True)), latest=Max("updated_at"))}
+    resources = {row["building"]: row for row in BuildingResource.objects.order_by().values("building").annotate(
+        n=Count("pk"), latest=Max("updated_at"))}
+    stamps = {}
+    for pk, slug, updated_at in Building.objects.values_list("pk", "slug", "updated_at"):
+        r = rooms.get(pk, {"n": 0, "latest": None})
+        s = resources.get(pk, {"n": 0, "latest": None})
+        stamps[slug] = (updated_at, r["latest"], s["latest"], r["n"], s["n"])
+    return stamps
+
+
+def _detail_stamps_query(slug, room_number):
+    # Classroom.updated_at is also touched when its photos/panoramas change
+    return (Classroom.objects
+            .filter(building__slug=slug, room_number=room_number, is_published=True)
+            .values_list("updated_at", "building__updated_at"))
+
+
+def _detail_stamps(slug, room_number):
+    return _detail_stamps_query(slug, room_number).first()
+
+
+# --- page queries and contexts (also used by async_views.py) --------------
+def _buildings():
+    return (
         Building.objects
         .annotate(published_room_count=Count('classrooms', filter=Q(classrooms__is_published=True)))
         .order_by("name")
     )
-    return render(request, "classrooms/buildings.html", {"buildings": buildings})
 
 
-#@cache_page(300)
-def classroom_list_by_building(request, slug):
-    building = get_object_or_404(Building, slug=slug)
-    rooms = (Classroom.objects
-             .filter(building=building, is_published=True)
-             .select_related("building")
-             .prefetch_related("panoramas", "photos")
-             .order_by("room_number"))
-    resources = building.resources.filter(published=True)
-
-    return render(request, "classrooms/list.html", {"building": building, "rooms": rooms,  "resources": list(resources)})
+def _rooms(building, filters):
+    return filters.apply(
+        Classroom.objects
+        .filter(building=building, is_published=True)
+        .select_related("building")
+    )
 
 
-#@cache_page(300)
-def classroom_detail(request, slug, room_number):
-    room = get_object_or_404(
-        Classroom.objects.select_related("building").prefetch_related("panoramas", "photos"),
-        building__slug = slug, room_number = room_number, is_published=True
-    )
-    feature_fields = [
-        # Microhpones/Speakers and cameras 
-        "voice_amplification",
-            #Microphones
-        'podium_microhpone',
-        "handheld_microphone",
-        "ceiling_microphone",
-        'lavalier_microphone',
-
-            #Cameras
-        "web_conference_camera",
-        "ceiling_camera",
-        "document_camera",
-
-        # Presentation/ desk features
-                #Presentation Features 
-        "wireless_presentation",
-        #"instructor_pc_equipped",
-        "instructor_monitor",
-        "interactive_display",
-        "class_capture",
-        "env_light",
-        "assistive_listening_device",
-        'hdesk',
-
-        # eniroment
-        "chalk_board",
-        "whiteboards_count",
-        "projectors",
-        "stage",
-        "privacy_panel",
-        "windows",
-        "door_windows",
-        
-        "pc_type",
-    ]
-    feature_groups = {
-        "Accessibility & Environment": ["assistive_listening_device","env_light","hdesk","stage","privacy_panel","windows","door_windows"],
-        "Audio": ["voice_amplification","podium_microhpone","handheld_microphone","ceiling_microphone","lavalier_microphone"],
-        "Video": ["web_conference_camera","ceiling_camera","document_camera","projectors",'lecd'],
-        "Presentation": ["wireless_presentation","interactive_display","instructor_monitor","class_capture", "pc_type", "touchscreen_presentation"], #"instructor_pc_equipped"
-        "Boards": ["chalk_board","whiteboards_count"],
+def _list_context(building, filters, page, resources):
+    return {
+        "building": building,
+        "rooms": page.object_list,
+        "page": page,
+        "filters": filters,
+        "pills": filters.pills(),
+        "prev_url": page.has_previous() and filters.querystring(page=page.previous_page_number()),
+        "next_url": page.has_next() and filters.querystring(page=page.next_page_number()),
+        "resources": resources,
     }
-    highlights = []
-    if room.class_capture: highlights.append("Panopto capture")
-    if room.web_conference_camera: highlights.append("Web conferencing")
-    if room.interactive_display: highlights.append("Interactive display")
-    if room.wireless_presentation: highlights.append("Wireless: " + room.get_wireless_presentation_display())
-    return render(request, "classrooms/detail.html", {
+
+
+def _list_page(request):
+    # read like Paginator.get_page() does: anything but an integer is page 1
+    try:
+        return int(request.GET.get("page", 1))
+    except ValueError:
+        return 1
+
+
+def _list_variant(request):
+    # cache on the normalized filters and page (see _api_variant), not the raw query string
+    return RoomFilters.from_query(request.GET).querystring(page=_list_page(request))
+
+
+def _render_list(request, building, filters, page, resources):
+    response = render(request, "classrooms/list.html", _list_context(building, filters, page, resources))
+    if page.number != _list_page(request):
+        # an out-of-range number renders the last page; don't cache one copy per number
+        patch_cache_control(response, no_store=True)
+    return response
+
+
+def _detail_room():
+    return Classroom.objects.select_related("building").prefetch_related("panoramas", "photos")
+
+
+def _detail_context(room):
+    return {
         "room": room,
-        "features": feature_fields,
-        "feature_groups": feature_groups,
-        "highlights": highlights,
+        "feature_table": features.feature_table(room),
+        "highlights": features.highlights(room),
         "panos": room.panoramas.all(),
         "photos": room.photos.all(),
-    })
-    return render(request, "classrooms/detail.html", {"room": room})
-    
+    }
+
+
+# Cached until a signal bumps the scope's version (see classrooms/cache.py);
+# @read_only: no per-request transaction, anonymous reads from a replica
+@read_only
+@conditional_page(_index_stamps)
+@versioned_cache_page(lambda: [catalog_scope()])
+def buildings_index(request):
+    return render(request, "classrooms/buildings.html", {"buildings": _buildings()})
+
+
+@read_only
+@conditional_page(_list_stamps)
+@versioned_cache_page(lambda slug: [building_scope(slug)], variant=_list_variant)
+def classroom_list_by_building(request, slug):
+    building = get_object_or_404(Building, slug=slug)
+    filters = RoomFilters.from_query(request.GET)
+    # tiles use the denormalized card image (classrooms/cards.py): no media queries
+    page = Paginator(_rooms(building, filters), ROOMS_PER_PAGE).get_page(_list_page(request))
+    resources = list(building.resources.filter(published=True))
+    return _render_list(request, building, filters, page, resources)
+
+
+@read_only
+@conditional_page(_detail_stamps)
+@versioned_cache_page(lambda slug, room_number: [room_scope(slug, room_number)])
+def classroom_detail(request, slug, room_number):
+    room = get_object_or_404(_detail_room(), building__slug=slug, room_number=room_number, is_published=True)
+    return render(request, "classrooms/detail.html", _detail_context(room))
+
 #@cache_page(300)
+@read_only
 def classroom_detail_pk(request, pk):
     room = get_object_or_404(
         Classroom.objects.select_related("building"),
@@ -103,4 +197,133 @@ def classroom_detail_pk(request, pk):
     return redirect(
         reverse("classroom_detail", args=[room.building.slug, room.room_number]),
         permanent=True
-    )
\ No newline at end of file
+    )
+
+# --- campus-wide room finder API ------------------------------------------
+def _api_paging(request):
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+    try:
+        size = min(API_MAX_PAGE_SIZE, max(1, int(request.GET.get("page_size", API_PAGE_SIZE))))
+    except ValueError:
+        size = API_PAGE_SIZE
+    return page, size
+
+
+def _api_variant(request):
+    # cache on the normalized filter set so ?a=1&b=2 and ?b=2&a=1&junk=x share an entry
+    page, size = _api_paging(request)
+    return RoomFilters.from_query(request.GET).querystring(page=page, page_size=size)
+
+
+# Keyed on the index page's validator like the HTML views: a worker whose
+# cache missed the bump, or a lagging replica, can't keep serving old JSON
+@read_only
+@conditional_page(_index_stamps)
+@versioned_cache_page(lambda: [catalog_scope()], variant=_api_variant)
+def api_rooms(request):
+    """
+    GET /api/rooms/?campus=MAIN&min_capacity=30&wireless=kramer&feature=class_capture
+
+    Three queries regardless of filters: the validator aggregate, one grouped
+    aggregate for the total and every facet count, one for the page of rooms.
+    A page-cache hit costs only the first.
+    """
+    filters = RoomFilters.from_query(request.GET)
+    page, size = _api_paging(request)
+    qs = filters.apply(Classroom.objects.filter(is_published=True))
+    total, facets = facet_counts(qs)
+
+    offset = (page - 1) * size
+    rows = (qs.order_by(*API_SORTS[filters.sort])
+            .values("id", "external_id", "room_number", "capacity", "room_type",
+                    "seating_type", "wireless_presentation", "pc_type", "feature_mask",
+                    "building__name", "building__slug", "building__campus")
+            [offset:offset + size])
+    results = [{
+        "id": r["id"],
+        "external_id": r["external_id"],
+        "building": r["building__name"],
+        "building_slug": r["building__slug"],
+        "campus": r["building__campus"],
+        "room_number": r["room_number"],
+        "room_type": r["room_type"],
+        "capacity": r["capacity"],
+        "seating_type": list(r["seating_type"] or []),
+        "wireless_presentation": list(r["wireless_presentation"] or []),
+        "pc_type": list(r["pc_type"] or []),
+        "features": [f for f, bit in FEATURE_BITS.items() if r["feature_mask"] & bit],
+        "url": reverse("classroom_detail", args=[r["building__slug"], r["room_number"]]),
+    } for r in rows]
+
+    return JsonResponse({
+        "count": total,
+        "page": page,
+        "page_size": size,
+        "filters": _group(filters.query_items()),
+        "facets": facets,
+        "results": results,
+    })
+
+
+def _group(items):
+    grouped = {}
+    for key, value in items:
+        grouped.setdefault(key, []).append(value)
+    return grouped
+
+
+# --- search -------------------------------------------------------------------
+@read_only
+def search_page(request):
+    q = request.GET.get("q", "").strip()[:100]
+    results = catalog_search.search(q) if q else []
+    groups = [
+        (label, [r for r in results if r.kind == kind])
+        for kind, label in (
+            (SearchEntry.Kind.BUILDING, "Buildings"),
+            (SearchEntry.Kind.ROOM, "Classrooms"),
+            (SearchEntry.Kind.RESOURCE, "Resources"),
+        )
+    ]
+    return render(request, "classrooms/search.html", {
+        "q": q, "count": len(results), "groups": [g for g in groups if g[1]],
+    })
+
+
+@read_only
+@cache_control(public=True, max_age=60)
+def search_suggest(request):
+    q = request.GET.get("q", "").strip()[:100]
+    return JsonResponse({"q": q, "results": [
+        {"title": e.title, "kind": e.kind, "url": e.url} for e in catalog_search.suggest(q)
+    ]})
+
+
+# --- catalog export (TUportal and other consumers) ------------------------------
+@transaction.non_atomic_requests  # streams after the view returns, from the primary
+def export_catalog(request):
+    """
+    GET /api/export/?format=jsonl|json|csv&kind=classrooms&gzip=1
+
+    Streamed straight from database cursors; nothing is buffered or cached.
+    """
+    fmt = request.GET.get("format", "jsonl")
+    try:
+        chunks = exports.export_chunks(fmt, request.GET.getlist("kind"))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    data = exports.encode_chunks(chunks)
+    filename = f"cph-catalog.{fmt}"
+    if request.GET.get("gzip") in ("1", "true"):
+        data = exports.gzip_chunks(data)
+        filename += ".gz"
+        content_type = "application/gzip"
+    else:
+        content_type = exports.CONTENT_TYPES[fmt] + "; charset=utf-8"
+    response = StreamingHttpResponse(data, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["Cache-Control"] = "no-store"
+    return response
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# tells settings.ASYNC_VIEWS it defaults to on (an explicit ASYNC_VIEWS still wins)
+os.environ['DJANGO_ASGI'] = 'true'
 
 application = get_asgi_application()
@@ -52,6 +52,10 @@ else:
     }
     SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
+# Public catalog pages are cached without a TTL and invalidated by signals
+# (see classrooms/cache.py). Turn off to debug templates against live data.
+CLASSROOMS_PAGE_CACHE = os.getenv("DJANGO_PAGE_CACHE", "True").lower() == "true"
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -85,8 +89,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'classrooms.metrics.MetricsMiddleware',  # outermost, so "total" covers everything below
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'classrooms.staticfiles.StaticFilesMiddleware',  # WhiteNoise, async-capable
     'django.middleware.gzip.GZipMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +99,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'classrooms.replicas.PrimaryPinMiddleware',  # read-your-writes with DATABASE_REPLICA_URLS
+    'classrooms.snapshot.SnapshotFallbackMiddleware',  # no-op unless CATALOG_SNAPSHOT_DIR is set
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -129,6 +136,21 @@ DATABASES = {
 DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
 DATABASES["default"]["ATOMIC_REQUESTS"] = True 
 
+# Read replicas (classrooms/replicas.py): comma-separated URLs in
+# DATABASE_REPLICA_URLS (or one in DATABASE_REPLICA_URL) become the aliases
+# replica1, replica2, ...  Anonymous GETs of the catalog read from them
+# round-robin; admin traffic, writes and, for DATABASE_PIN_SECONDS after a
+# write, that client's reads stay on the primary.
+DATABASE_REPLICAS = []
+for _n, _url in enumerate(filter(None, (u.strip() for u in (
+        os.getenv("DATABASE_REPLICA_URLS") or os.getenv("DATABASE_REPLICA_URL", "")).split(","))), 1):
+    DATABASES[f"replica{_n}"] = dj_database_url.parse(_url, conn_max_age=300, ssl_require=ssl_require)
+    DATABASES[f"replica{_n}"]["CONN_HEALTH_CHECKS"] = True
+    DATABASES[f"replica{_n}"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(f"replica{_n}")
+DATABASE_ROUTERS = ["classrooms.replicas.ReplicaRouter"]
+DATABASE_PIN_SECONDS = int(os.getenv("DATABASE_PIN_SECONDS", "15"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -152,6 +174,36 @@ STORAGES = {
     "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
 }
 
+# Performance metrics (Server-Timing header + Prometheus /metrics)
+# With several gunicorn workers set METRICS_DIR to a directory shared by all of
+# them (e.g. /tmp/cphc-metrics, cleared on deploy) so /metrics sums every worker.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # if set, scrapers send "Authorization: Bearer <token>"
+
+# Background jobs (classrooms/jobs.py): image renditions, panorama tiles and
+# page-cache warming run in `python manage.py run_worker`.  With JOBS_EAGER
+# they run inline during the save instead, so no worker is needed in dev.
+# Warming is skipped unless the cache is shared (USE_REDIS): a LocMem cache
+# filled by the worker is not the one the web processes read.
+JOBS_EAGER = (os.getenv("JOBS_EAGER") or str(DEBUG)).lower() == "true"
+
+# Serve the public catalog pages with the async views in classrooms/async_views.py.
+# Defaults to on under core.asgi (uvicorn) and off under core.wsgi (gunicorn sync
+# workers), where async views would only add an event-loop hop per request.
+ASYNC_VIEWS = (os.getenv("ASYNC_VIEWS") or os.getenv("DJANGO_ASGI", "False")).lower() == "true"
+
+# Serve the public catalog pages from an in-process copy of the catalog
+# (classrooms/memory.py, memory_views.py): no SQL per request, one rebuild per
+# worker after each change.  Takes precedence over ASYNC_VIEWS for those pages.
+# Needs USE_REDIS: the workers learn of changes through the shared cache.
+CATALOG_IN_MEMORY = os.getenv("CATALOG_IN_MEMORY", "False").lower() == "true"
+
+# Static snapshot of the public catalog (`python manage.py build_snapshot`).
+# When set, public pages are served from this directory while the database
+# is unreachable; the directory can also be synced to any static host.
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", "")
+
 # Logging
 LOGGING = {
     "version": 1,
@@ -181,7 +233,7 @@ if STORAGE_BACKEND == "s3":
     AWS_DEFAULT_ACL = "public-read"     # make new uploads public   
     AWS_S3_OBJECT_PARAMETERS = {"CacheControl": "max-age=31536000, public"}
     MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/" if AWS_S3_CUSTOM_DOMAIN else f"{AWS_S3_ENDPOINT_URL.rstrip('/')}/{AWS_STORAGE_BUCKET_NAME}/"
-    STORAGES["default"] = {"BACKEND": "storages.backends.s3boto3.S3Boto3Storage"}
+    STORAGES["default"] = {"BACKEND": "classrooms.s3.S3Storage"}  # S3Boto3Storage + immutable blobs
 else:
     MEDIA_ROOT = os.getenv("MEDIA_ROOT", str(BASE_DIR / "media"))
     MEDIA_URL = "/media/"
@@ -23,21 +23,32 @@ from classrooms.views import buildings_index, classroom_list_by_building, classr
 from django.http import HttpResponse
 
 
-from classrooms import views as cviews
+from classrooms import async_views, memory_views, views as cviews
+from classrooms.metrics import metrics_view
+
+# page views from the in-memory catalog (settings.CATALOG_IN_MEMORY), else async
+# under ASGI (settings.ASYNC_VIEWS); API/search stay sync
+pages = memory_views if settings.CATALOG_IN_MEMORY else async_views if settings.ASYNC_VIEWS else cviews
 
 
 urlpatterns = [
    # Home now shows buildings:
-    path("", cviews.buildings_index, name="home"),
+    path("", pages.buildings_index, name="home"),
     
-    path("buildings/", cviews.buildings_index, name="buildings_index"),     # Buildings:
+    path("buildings/", pages.buildings_index, name="buildings_index"),     # Buildings:
+
+    path("buildings/<slug:slug>/", pages.classroom_list_by_building, name="classroom_list_by_building"),
+    path("buildings/<slug:slug>/<str:room_number>/", pages.classroom_detail, name="classroom_detail"),
+    path("classrooms/<int:pk>/", pages.classroom_detail_pk, name="classroom_detail_pk"), 
 
-    path("buildings/<slug:slug>/", cviews.classroom_list_by_building, name="classroom_list_by_building"),
-    path("buildings/<slug:slug>/<str:room_number>/", cviews.classroom_detail, name="classroom_detail"),
-    path("classrooms/<int:pk>/", cviews.classroom_detail_pk, name="classroom_detail_pk"), 
+    path("api/rooms/", cviews.api_rooms, name="api_rooms"),
+    path("api/export/", cviews.export_catalog, name="export_catalog"),
+    path("search/", cviews.search_page, name="search"),
+    path("search/suggest/", cviews.search_suggest, name="search_suggest"),
     
     path(settings.ADMIN_URL, admin.site.urls),
-    path("healthz/", lambda r: HttpResponse("ok"), name="healthz")
+    path("healthz/", lambda r: HttpResponse("ok"), name="healthz"),
+    path("metrics", metrics_view, name="metrics"),
 
 ]
 